@@ -0,0 +1,4 @@
+"""
+Offline performance benchmarks, run from the repository root with
+python -m benchmarks.<name> --help
+"""
@@ -0,0 +1,159 @@
+"""
+Block validation throughput, on a synthetic regnet chain
+
+    python -m benchmarks.blocks --blocks 20 --txns 10 --inputs 2
+    python -m benchmarks.blocks --mongo mongodb://localhost:27017 --output blocks.json
+
+A funding chain pays coinbases to one wallet, a fan out block splits them
+into inputs for one spender wallet per benchmark transaction, then the
+benchmark blocks are generated without being inserted and timed through
+Block.verify, get_target_10min, Blockchain.test_block and
+Consensus.integrate_blocks_with_existing_chain.
+Heights from RANDOMX_FORK on need pyrx, heights from PAY_MASTER_NODES_FORK
+on would contact the masternodes so they are refused.
+"""
+
+import argparse
+import asyncio
+import logging
+
+from benchmarks.common import (
+    Stopwatch,
+    Wallet,
+    generate_block,
+    generate_chain,
+    init_config,
+    write_results,
+)
+from yadacoin.core.blockchain import Blockchain
+from yadacoin.core.chain import CHAIN
+
+
+async def build_chain(config, height, blocks, txns, inputs):
+    """Inserts the funding chain and returns its tip with the benchmark blocks"""
+    from yadacoin.core.transaction import Transaction
+
+    miner = Wallet()
+    spenders = [Wallet() for _ in range(blocks * txns)]
+
+    # enough history behind the benchmark blocks for get_target_10min
+    funding = await generate_chain(miner, height, max(inputs, 31))
+    index = funding[-1].index + 1
+
+    reward = CHAIN.get_block_reward(height)
+    value = int(reward / (len(spenders) + 1) * 10000) / 10000
+    fan_out = []
+    for block in funding[:inputs]:
+        fan_out.append(
+            await Transaction.generate(
+                public_key=miner.public_key,
+                private_key=miner.private_key,
+                inputs=[{"id": block.transactions[-1].transaction_signature}],
+                outputs=[{"to": x.address, "value": value} for x in spenders],
+            )
+        )
+    tip = await generate_block(miner, index, funding[-1].hash, fan_out)
+    await config.mongo.async_db.blocks.insert_one(tip.to_dict())
+    await config.LatestBlock.block_checker()
+
+    benchmark_blocks = []
+    prev_hash = tip.hash
+    for i in range(blocks):
+        index += 1
+        transactions = []
+        for spender in spenders[i * txns : (i + 1) * txns]:
+            transaction = await Transaction.generate(
+                public_key=spender.public_key,
+                private_key=spender.private_key,
+                inputs=[{"id": x.transaction_signature} for x in fan_out],
+                outputs=[{"to": miner.address, "value": round(value * inputs, 4)}],
+            )
+            if len(transaction.inputs) != inputs:
+                raise Exception("Spender did not use every input")
+            transactions.append(transaction)
+        block = await generate_block(miner, index, prev_hash, transactions)
+        benchmark_blocks.append(block)
+        prev_hash = block.hash
+    return tip, benchmark_blocks
+
+
+def stage(watch, blocks, txns, failed=0):
+    return {
+        "seconds": round(watch.seconds, 4),
+        "blocks_per_sec": round(blocks / watch.seconds, 2),
+        "txns_per_sec": round(txns / watch.seconds, 2),
+        "queries": watch.queries,
+        "queries_per_block": round(watch.queries / blocks, 2),
+        "failed": failed,
+    }
+
+
+async def run(args):
+    config = init_config(args.mongo)
+    if args.height + args.blocks + max(args.inputs, 31) >= CHAIN.PAY_MASTER_NODES_FORK:
+        raise SystemExit("The chain must stay below PAY_MASTER_NODES_FORK")
+    tip, blocks = await build_chain(
+        config, args.height, args.blocks, args.txns, args.inputs
+    )
+    txns = sum(len(block.transactions) for block in blocks)
+    results = {}
+
+    with Stopwatch(config.mongo) as watch:
+        for block in blocks:
+            await block.verify()
+    results["verify"] = stage(watch, len(blocks), txns)
+
+    if blocks[0].index >= CHAIN.FORK_10_MIN_BLOCK:
+        with Stopwatch(config.mongo) as watch:
+            last_block = tip
+            for block in blocks:
+                await CHAIN.get_target_10min(last_block, block, blocks)
+                last_block = block
+        results["get_target_10min"] = stage(watch, len(blocks), txns)
+
+    failed = 0
+    with Stopwatch(config.mongo) as watch:
+        last_block = tip
+        for block in blocks:
+            if not await Blockchain.test_block(
+                block, extra_blocks=blocks, simulate_last_block=last_block
+            ):
+                failed += 1
+            last_block = block
+    results["test_block"] = stage(watch, len(blocks), txns, failed)
+
+    from yadacoin.core.consensus import Consensus
+
+    consensus = await Consensus.init_async(prevent_genesis=True)
+    with Stopwatch(config.mongo) as watch:
+        await consensus.integrate_blocks_with_existing_chain(Blockchain(blocks), None)
+    await config.LatestBlock.update_latest_block()
+    failed = blocks[-1].index - config.LatestBlock.block.index
+    results["integrate"] = stage(watch, len(blocks), txns, failed)
+
+    write_results("blocks", vars(args), results, args.output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--blocks", type=int, default=20, help="blocks to validate")
+    parser.add_argument("--txns", type=int, default=10, help="transactions per block")
+    parser.add_argument("--inputs", type=int, default=2, help="inputs per transaction")
+    parser.add_argument(
+        "--height",
+        type=int,
+        default=400000,
+        help="height of the first funding block",
+    )
+    parser.add_argument(
+        "--mongo", default="memory", help="memory or a mongodb url to a local mongod"
+    )
+    parser.add_argument("--output", help="json file, defaults to stdout")
+    parser.add_argument("--log-level", default="ERROR")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Shared benchmark plumbing: a regnet config, an in process mongo stand-in
+and json results that can be compared between commits
+"""
+
+import json
+import logging
+import platform
+import subprocess
+import sys
+from collections import Counter
+from time import perf_counter, time
+
+from bitcoin.wallet import P2PKHBitcoinAddress
+from coincurve import PrivateKey
+
+import yadacoin.core.blockchainutils
+import yadacoin.core.config
+from yadacoin.core.config import Config
+from yadacoin.core.latestblock import LatestBlock
+from yadacoin.core.transactionutils import TU
+
+
+class MemoryCursor:
+    """Motor style cursor over a mongomock cursor"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self.cursor = self.cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, *args):
+        self.cursor = self.cursor.limit(*args)
+        return self
+
+    def skip(self, *args):
+        self.cursor = self.cursor.skip(*args)
+        return self
+
+    def clone(self):
+        return MemoryCursor(self.cursor.clone())
+
+    async def to_list(self, length=None):
+        items = []
+        for item in self.cursor:
+            items.append(item)
+            if length and len(items) >= length:
+                break
+        return items
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.cursor)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class MemoryCollection:
+    """Counts every call, async_mode returns coroutines and motor style cursors"""
+
+    cursors = ("find", "aggregate")
+
+    def __init__(self, collection, queries, async_mode):
+        self.collection = collection
+        self.queries = queries
+        self.async_mode = async_mode
+
+    def __getattr__(self, name):
+        method = getattr(self.collection, name)
+        if not callable(method):
+            return method
+        key = f"{self.collection.name}.{name}"
+
+        if not self.async_mode:
+
+            def call(*args, **kwargs):
+                self.queries[key] += 1
+                return method(*args, **kwargs)
+
+        elif name in self.cursors:
+
+            def call(*args, **kwargs):
+                self.queries[key] += 1
+                return MemoryCursor(iter(method(*args, **kwargs)))
+
+        else:
+
+            async def call(*args, **kwargs):
+                self.queries[key] += 1
+                return method(*args, **kwargs)
+
+        return call
+
+
+class MemoryDatabase:
+    def __init__(self, database, queries, async_mode):
+        self.database = database
+        self.queries = queries
+        self.async_mode = async_mode
+
+    def __getitem__(self, name):
+        return MemoryCollection(self.database[name], self.queries, self.async_mode)
+
+    def __getattr__(self, name):
+        if hasattr(type(self.database), name):
+            return getattr(self.database, name)
+        return self[name]
+
+
+class MemoryMongo:
+    """Stands in for Mongo with mongomock, so a benchmark needs no mongod.
+    Timings include no network or disk, query counts are exact"""
+
+    def __init__(self):
+        from mongomock import MongoClient
+
+        config = Config()
+        self.queries = Counter()
+        self.client = MongoClient()
+        self.db = MemoryDatabase(self.client[config.database], self.queries, False)
+        self.site_db = MemoryDatabase(
+            self.client[config.site_database], self.queries, False
+        )
+        self.async_db = MemoryDatabase(self.client[config.database], self.queries, True)
+        self.async_site_db = MemoryDatabase(
+            self.client[config.site_database], self.queries, True
+        )
+
+    def query_count(self):
+        return sum(self.queries.values())
+
+
+def connect_mongo(mongo):
+    """memory for the stand-in, otherwise a mongodb url whose benchmark
+    database is dropped first"""
+    if mongo == "memory":
+        return MemoryMongo()
+    from pymongo import MongoClient
+
+    from yadacoin.core.mongo import Mongo
+
+    config = Config()
+    config.mongodb_host = mongo
+    client = MongoClient(mongo)
+    client.drop_database(config.database)
+    client.drop_database(config.site_database)
+    mongo = Mongo()
+    # only the async client is monitored, which is what validation uses
+    mongo.query_count = lambda: sum(
+        histogram.count for histogram in mongo.telemetry.shapes.values()
+    )
+    return mongo
+
+
+def init_config(mongo="memory", network="regnet", database="yadacoin_benchmark"):
+    config = Config.generate()
+    yadacoin.core.config.CONFIG = config
+    config.network = network
+    config.database = database
+    config.site_database = f"{database}_site"
+    config.app_log = logging.getLogger("tornado.application")
+    config.mongo = connect_mongo(mongo)
+    config.BU = yadacoin.core.blockchainutils.BlockChainUtils()
+    yadacoin.core.blockchainutils.set_BU(config.BU)
+    config.TU = TU
+    config.LatestBlock = LatestBlock
+    LatestBlock.config = config
+    LatestBlock.block = None
+    return config
+
+
+class Wallet:
+    def __init__(self):
+        key = PrivateKey()
+        self.private_key = key.to_hex()
+        self.public_key = key.public_key.format().hex()
+        self.address = str(
+            P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(self.public_key))
+        )
+
+
+async def generate_block(wallet, index, prev_hash, transactions=None):
+    """A block paying its coinbase to wallet, with a nonce but not mined"""
+    from yadacoin.core.block import Block
+    from yadacoin.core.chain import CHAIN
+
+    block = await Block.generate(
+        transactions=transactions,
+        public_key=wallet.public_key,
+        private_key=wallet.private_key,
+        index=index,
+        prev_hash=prev_hash,
+        nonce="%08x" % index,
+        target=CHAIN.MAX_TARGET,
+    )
+    if len(block.transactions) != len(transactions or []) + 1:
+        raise Exception(f"Transactions were rejected from block {index}")
+    return block
+
+
+async def generate_chain(wallet, height, count, prev_hash="0" * 64):
+    """Inserts count empty blocks from height on and returns them"""
+    config = Config()
+    blocks = []
+    for index in range(height, height + count):
+        block = await generate_block(wallet, index, prev_hash)
+        await config.mongo.async_db.blocks.insert_one(block.to_dict())
+        blocks.append(block)
+        prev_hash = block.hash
+    await config.LatestBlock.block_checker()
+    return blocks
+
+
+class Stopwatch:
+    """Times a stage and the queries it made"""
+
+    def __init__(self, mongo):
+        self.mongo = mongo
+
+    def __enter__(self):
+        self.queries = self.mongo.query_count()
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.seconds = perf_counter() - self.start
+        self.queries = self.mongo.query_count() - self.queries
+
+
+def percentiles(values):
+    """Seconds at the usual latency percentiles"""
+    values = sorted(values)
+    if not values:
+        return {}
+    return {
+        **{
+            f"p{p}": round(values[min(int(len(values) * p / 100), len(values) - 1)], 4)
+            for p in (50, 90, 99)
+        },
+        "max": round(values[-1], 4),
+        "count": len(values),
+    }
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def write_results(name, params, results, output=None):
+    """Writes one json document, output defaults to stdout"""
+    document = json.dumps(
+        {
+            "benchmark": name,
+            "commit": commit(),
+            "time": int(time()),
+            "python": platform.python_version(),
+            "params": params,
+            "results": results,
+        },
+        indent=4,
+    )
+    if output:
+        with open(output, "w") as f:
+            f.write(document + "\n")
+    else:
+        sys.stdout.write(document + "\n")
@@ -0,0 +1,134 @@
+"""
+Memory held by transactions, as in sync batches, extra_blocks and pool templates
+
+    python -m benchmarks.memory --txns 10000 --inputs 2 --outputs 2
+
+Builds --txns transaction dicts up front, then runs Transaction.from_dict,
+generate_hash and to_dict on them under one tracemalloc session. For each
+stage it reports the bytes per transaction still held once the stage is
+done, and retained_bytes_per_txn is what the transactions hold after all
+three. The strings come from the dicts and are shared, so from_dict
+measures the objects themselves. Run it on two commits to compare.
+"""
+
+import argparse
+import asyncio
+import base64
+import gc
+import logging
+import os
+import sys
+import tracemalloc
+from time import perf_counter
+
+from benchmarks.common import Wallet, init_config, write_results
+
+
+def build_dicts(count, inputs, outputs):
+    from yadacoin.core.transaction import Transaction
+
+    wallet = Wallet()
+    recipients = [Wallet().address for _ in range(outputs)]
+    dicts = []
+    for i in range(count):
+        txn = Transaction(
+            txn_time=1700000000 + i,
+            public_key=wallet.public_key,
+            fee=0.0001,
+            inputs=[
+                {"id": base64.b64encode(os.urandom(71)).decode()} for _ in range(inputs)
+            ],
+            outputs=[{"to": to, "value": 1.5} for to in recipients],
+            transaction_signature=base64.b64encode(os.urandom(71)).decode(),
+            version=5,
+        )
+        txn.hash = os.urandom(32).hex()
+        dicts.append(txn.to_dict())
+    return dicts
+
+
+def measure(stages, count):
+    """Bytes per transaction each stage adds to what is held, with its
+    duration and peak, and the bytes held after the last one"""
+    results = {}
+    gc.collect()
+    tracemalloc.start()
+    held = 0
+    for name, stage in stages:
+        tracemalloc.reset_peak()
+        start = perf_counter()
+        stage()
+        seconds = perf_counter() - start
+        gc.collect()
+        size, peak = tracemalloc.get_traced_memory()
+        results[name] = {
+            "bytes_per_txn": round((size - held) / count, 1),
+            "peak_bytes_per_txn": round((peak - held) / count, 1),
+            "seconds": round(seconds, 4),
+        }
+        held = size
+    tracemalloc.stop()
+    results["retained_bytes_per_txn"] = round(held / count, 1)
+    return results
+
+
+def shallow_size(obj):
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def run(args):
+    from yadacoin.core.transaction import Transaction
+
+    init_config()
+    dicts = build_dicts(args.txns, args.inputs, args.outputs)
+
+    txns = []
+
+    def from_dicts():
+        txns.extend(Transaction.from_dict(x) for x in dicts)
+
+    def generate_hashes():
+        loop = asyncio.new_event_loop()
+        for txn in txns:
+            loop.run_until_complete(txn.generate_hash())
+        loop.close()
+
+    def to_dicts():
+        for txn in txns:
+            txn.to_dict()
+
+    results = measure(
+        [
+            ("from_dict", from_dicts),
+            ("generate_hash", generate_hashes),
+            ("to_dict", to_dicts),
+        ],
+        args.txns,
+    )
+    results["shallow_bytes"] = {
+        "transaction": shallow_size(txns[0]),
+        "input": shallow_size(txns[0].inputs[0]) if txns[0].inputs else None,
+        "output": shallow_size(txns[0].outputs[0]) if txns[0].outputs else None,
+    }
+    write_results("memory", vars(args), results, args.output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--txns", type=int, default=10000, help="transactions")
+    parser.add_argument("--inputs", type=int, default=2, help="inputs per transaction")
+    parser.add_argument(
+        "--outputs", type=int, default=2, help="outputs per transaction"
+    )
+    parser.add_argument("--output", help="json file, defaults to stdout")
+    parser.add_argument("--log-level", default="ERROR")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level)
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Stratum pool load test, simulated miners against a local StratumServer
+
+    python -m benchmarks.stratum --miners 200 --rate 1 --difficulty 100000 --duration 30
+
+The pool runs in a child process on a synthetic local chain and never
+connects out, so its cpu is measured apart from the load generator.
+Miners log in, follow the jobs they are sent and submit random nonces at
+--rate shares per second each, the pool checks them against --difficulty.
+The network is testnet, not regnet, which skips the target checks and
+takes every nonce as a block. Testnet mines at MAX_TARGET, so the pool
+template gets NETWORK_TARGET instead, which random nonces do not meet, and
+the share path is what is measured. A block found anyway is counted in
+blocks_found rather than accepted. The run exits non-zero when a share
+was never acknowledged or the pool logged an error.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import random
+from time import perf_counter, process_time
+from traceback import format_exc
+
+from benchmarks.common import (
+    Wallet,
+    generate_chain,
+    init_config,
+    percentiles,
+    write_results,
+)
+
+
+# about one random hash in 2**48 meets it, far below any --difficulty
+NETWORK_TARGET = (2**256 - 1) >> 48
+
+
+class ErrorCounter(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(self.format(record))
+
+
+async def serve_pool(params, conn):
+    from tornado.ioloop import PeriodicCallback
+
+    from yadacoin.core.health import Health
+    from yadacoin.core.metrics import Histogram
+    from yadacoin.core.miner import Miner
+    from yadacoin.core.miningpool import MiningPool
+    from yadacoin.core.peer import (
+        Group,
+        Peer,
+        Pool,
+        Seed,
+        SeedGateway,
+        ServiceProvider,
+        User,
+    )
+    from yadacoin.core.processingqueue import ProcessingQueues
+    from yadacoin.core.scheduler import Scheduler, SchedulerEvents
+    from yadacoin.enums.modes import MODES
+    from yadacoin.tcpsocket.node import NodeSocketClient, NodeSocketServer
+    from yadacoin.tcpsocket.pool import StratumServer
+
+    class BenchmarkPool(MiningPool):
+        blocks_found = 0
+
+        async def create_block(self, *args, **kwargs):
+            block = await super().create_block(*args, **kwargs)
+            block.target = NETWORK_TARGET
+            return block
+
+        async def accept_block(self, block):
+            self.blocks_found += 1
+
+    errors = ErrorCounter()
+    logging.getLogger().addHandler(errors)
+    config = init_config(params["mongo"], network="testnet")
+    config.modes = [MODES.POOL.value]
+    config.pool_diff = params["difficulty"]
+    config.max_miners = params["miners"]
+    config.processing_queues = ProcessingQueues()
+    config.health = Health()
+    await generate_chain(Wallet(), params["height"], 31)
+
+    config.nodeServer = NodeSocketServer
+    config.nodeClient = NodeSocketClient()
+    for x in [Seed, SeedGateway, ServiceProvider, User, Group, Miner, Pool]:
+        config.nodeClient.outbound_streams.setdefault(x.__name__, {})
+        config.nodeClient.outbound_pending.setdefault(x.__name__, {})
+        config.nodeServer.inbound_streams.setdefault(x.__name__, {})
+        config.nodeServer.inbound_pending.setdefault(x.__name__, {})
+    config.peer = Peer.my_peer()
+
+    StratumServer.config = config
+    config.mp = await BenchmarkPool.init_async()
+    config.scheduler = Scheduler()
+    config.scheduler.add(
+        config.mp.process_nonce_queue, 1, events=(SchedulerEvents.NONCE_QUEUED,)
+    )
+    StratumServer().listen(params["port"], "127.0.0.1")
+
+    nonce_queue = config.processing_queues.nonce_queue
+    depths = []
+    sampler = PeriodicCallback(lambda: depths.append(len(nonce_queue.queue)), 100)
+
+    async def new_job():
+        # a new template, as a new block or a new transaction would make
+        config.mp.block_factory = None
+        await config.mp.refresh()
+        await StratumServer.block_checker()
+
+    broadcaster = PeriodicCallback(new_job, params["job_interval"] * 1000)
+
+    loop = asyncio.get_running_loop()
+    conn.send("ready")
+    await loop.run_in_executor(None, conn.recv)
+    StratumServer.job_broadcasts = Histogram()
+    start, cpu = perf_counter(), process_time()
+    sampler.start()
+    broadcaster.start()
+    await loop.run_in_executor(None, conn.recv)
+    sampler.stop()
+    broadcaster.stop()
+    seconds, cpu = perf_counter() - start, process_time() - cpu
+
+    conn.send(
+        {
+            "cpu_seconds": round(cpu, 3),
+            "cpu_percent": round(cpu / seconds * 100, 1),
+            "nonce_queue_depth": {
+                "max": max(depths, default=0),
+                "avg": round(sum(depths) / (len(depths) or 1), 2),
+            },
+            "nonce_queue_processed": nonce_queue.num_items_processed,
+            "shares_recorded": await config.mongo.async_db.shares.count_documents({}),
+            "job_broadcasts": StratumServer.job_broadcasts.to_dict(),
+            "nonce_processor": config.scheduler.tasks["process_nonce_queue"].to_dict(),
+            "blocks_found": config.mp.blocks_found,
+            "errors": errors.records,
+        }
+    )
+
+
+def run_pool(params, conn):
+    logging.basicConfig(level=params["log_level"])
+    try:
+        asyncio.run(serve_pool(params, conn))
+    except Exception:
+        conn.send({"error": format_exc()})
+
+
+class SimulatedMiner:
+    agent = "XMRig/6.21.0"
+
+    def __init__(self, rate, stats):
+        self.address = f"{Wallet().address}.bench"
+        self.rate = rate
+        self.stats = stats
+        self.pending = {}
+        self.login_id = None
+        self.job = None
+        self.message_id = 0
+
+    async def send(self, method, params):
+        self.message_id += 1
+        self.pending[self.message_id] = (method, perf_counter())
+        self.writer.write(
+            json.dumps(
+                {
+                    "id": self.message_id,
+                    "jsonrpc": "2.0",
+                    "method": method,
+                    "params": params,
+                }
+            ).encode()
+            + b"\n"
+        )
+        await self.writer.drain()
+
+    async def read(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                return
+            message = json.loads(line)
+            if message.get("method") == "job":
+                self.job = message["params"]
+                self.stats["jobs"] += 1
+                continue
+            method, sent = self.pending.pop(message.get("id"), (None, None))
+            if method == "login":
+                self.stats["login_latency"].append(perf_counter() - sent)
+                self.login_id = message["result"]["id"]
+                self.job = message["result"]["job"]
+            elif method == "submit":
+                self.stats["ack_latency"].append(perf_counter() - sent)
+                self.stats["rejected" if "error" in message else "accepted"] += 1
+
+    async def run(self, port, stop):
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", port)
+        reader = asyncio.ensure_future(self.read())
+        await self.send(
+            "login", {"login": self.address, "pass": "x", "agent": self.agent}
+        )
+        while not stop.is_set():
+            await asyncio.sleep(random.expovariate(self.rate))
+            if not self.job or not self.login_id:
+                continue
+            await self.send(
+                "submit",
+                {
+                    "id": self.login_id,
+                    "job_id": self.job["job_id"],
+                    "nonce": "%08x" % random.getrandbits(32),
+                    "result": "",
+                },
+            )
+            self.stats["submitted"] += 1
+        return reader
+
+    def close(self):
+        self.writer.close()
+
+
+async def load(args):
+    context = multiprocessing.get_context("spawn")
+    conn, child_conn = context.Pipe()
+    pool = context.Process(target=run_pool, args=(vars(args), child_conn))
+    pool.start()
+    loop = asyncio.get_running_loop()
+    ready = await loop.run_in_executor(None, conn.recv)
+    if "error" in ready:
+        raise SystemExit(ready["error"])
+
+    stats = {
+        "jobs": 0,
+        "submitted": 0,
+        "accepted": 0,
+        "rejected": 0,
+        "login_latency": [],
+        "ack_latency": [],
+    }
+    stop = asyncio.Event()
+    miners = [SimulatedMiner(args.rate, stats) for _ in range(args.miners)]
+    conn.send("start")
+    runs = [asyncio.ensure_future(miner.run(args.port, stop)) for miner in miners]
+    await asyncio.sleep(args.duration)
+    stop.set()
+    readers = await asyncio.gather(*runs)
+    # give the pool time to acknowledge what is still queued
+    for _ in range(50):
+        if not any(miner.pending for miner in miners):
+            break
+        await asyncio.sleep(0.1)
+    conn.send("stop")
+    pool_results = await loop.run_in_executor(None, conn.recv)
+    for miner, reader in zip(miners, readers):
+        miner.close()
+        reader.cancel()
+    pool.join()
+
+    results = {
+        "miners": args.miners,
+        "submitted": stats["submitted"],
+        "shares_per_sec": round(stats["submitted"] / args.duration, 2),
+        "accepted": stats["accepted"],
+        "rejected": stats["rejected"],
+        "unacknowledged": sum(len(miner.pending) for miner in miners),
+        "jobs_received": stats["jobs"],
+        "login_latency": percentiles(stats["login_latency"]),
+        "ack_latency": percentiles(stats["ack_latency"]),
+        "pool": pool_results,
+    }
+    write_results("stratum", vars(args), results, args.output)
+    errors = pool_results.get("errors", [])
+    if results["unacknowledged"] or errors or "error" in pool_results:
+        raise SystemExit(
+            f"{results['unacknowledged']} shares unacknowledged, "
+            f"{len(errors)} pool errors"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--miners", type=int, default=100, help="connections")
+    parser.add_argument(
+        "--rate", type=float, default=1, help="shares per second per miner"
+    )
+    parser.add_argument("--difficulty", type=int, default=100000, help="pool_diff")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    parser.add_argument(
+        "--job-interval", type=float, default=10, help="seconds between new jobs"
+    )
+    parser.add_argument("--port", type=int, default=3334)
+    parser.add_argument("--height", type=int, default=400000)
+    parser.add_argument(
+        "--mongo", default="memory", help="memory or a mongodb url to a local mongod"
+    )
+    parser.add_argument("--output", help="json file, defaults to stdout")
+    parser.add_argument("--log-level", default="ERROR")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level)
+    asyncio.run(load(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Two node sync over loopback, on regnet
+
+    python -m benchmarks.sync --mongo mongodb://localhost:27017 --blocks 500
+
+Needs a local mongod: both nodes are NodeApplication processes with their
+own database, seeding each other. Node a is preloaded with --blocks
+synthetic blocks on top of genesis, then node b starts empty and syncs
+from it through search_network_for_new, getblocks/blocksresponse and the
+block queue. Reports the time until b reaches the height of a, the rpc
+traffic both nodes count in /metrics and their peak memory.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+from time import perf_counter, sleep
+from urllib.request import urlopen
+
+from benchmarks.common import Wallet, generate_chain, init_config, write_results
+from yadacoin.core.config import Config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def node_config(name, mongo, peer_port, serve_port):
+    config = Config.generate().to_dict()
+    config.update(
+        network="regnet",
+        modes=["node", "web"],
+        database=f"yadacoin_sync_{name}",
+        site_database=f"yadacoin_sync_{name}_site",
+        mongodb_host=mongo,
+        peer_host="127.0.0.1",
+        peer_port=peer_port,
+        serve_host="127.0.0.1",
+        serve_port=serve_port,
+        peer_type="seed",
+    )
+    return config
+
+
+def seed_entry(config):
+    return {
+        "host": config["peer_host"],
+        "port": config["peer_port"],
+        "identity": {
+            "username": config["username"],
+            "username_signature": config["username_signature"],
+            "public_key": config["public_key"],
+        },
+        "peer_type": "seed",
+        "http_host": config["serve_host"],
+        "http_port": config["serve_port"],
+        "secure": False,
+        "protocol_version": 3,
+    }
+
+
+async def preload(args, config):
+    """Drops both databases and fills the one of node a"""
+    benchmark_config = init_config(args.mongo, database=config["database"])
+    benchmark_config.mongo.client.drop_database("yadacoin_sync_b")
+    benchmark_config.mongo.client.drop_database("yadacoin_sync_b_site")
+    await benchmark_config.LatestBlock.block_checker()
+    genesis = benchmark_config.LatestBlock.block
+    await generate_chain(Wallet(), 1, args.blocks, prev_hash=genesis.hash)
+
+
+def start_node(config, workdir):
+    os.makedirs(workdir)
+    with open(os.path.join(workdir, "config.json"), "w") as f:
+        json.dump(config, f)
+    return subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(ROOT, "yadacoin", "app.py"),
+            "--config=config.json",
+        ],
+        cwd=workdir,
+        env={**os.environ, "PYTHONPATH": ROOT},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_for_port(port, process, timeout):
+    start = perf_counter()
+    while perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise SystemExit(f"Node on port {port} exited with {process.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.5).close()
+            return
+        except OSError:
+            sleep(0.1)
+    raise SystemExit(f"Node on port {port} did not start")
+
+
+def memory(process):
+    """Peak and current resident memory in kB, read from /proc on linux"""
+    usage = {}
+    try:
+        with open(f"/proc/{process.pid}/status") as f:
+            for line in f:
+                if line.startswith(("VmHWM", "VmRSS")):
+                    key, value = line.split(":")
+                    usage[key] = int(value.split()[0])
+    except OSError:
+        pass
+    return {"peak_kb": usage.get("VmHWM"), "rss_kb": usage.get("VmRSS")}
+
+
+def rpc_totals(serve_port):
+    """Sums the rpc counters of a node's /metrics by counter and by method"""
+    try:
+        text = urlopen(f"http://127.0.0.1:{serve_port}/metrics", timeout=5).read()
+    except OSError:
+        return None
+    totals = {}
+    methods = {}
+    for line in text.decode().splitlines():
+        match = re.match(r"yadacoin_rpc_(\w+_total)\{(.*)\} (\S+)$", line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        method = re.search(r'method="([^"]*)"', labels).group(1)
+        totals[name] = totals.get(name, 0) + float(value)
+        if float(value):
+            methods.setdefault(method, {})
+            methods[method][name] = methods[method].get(name, 0) + float(value)
+    return {**totals, "methods": methods}
+
+
+def synced_height(client, database):
+    block = client[database].blocks.find_one({}, {"index": 1}, sort=[("index", -1)])
+    return block["index"] if block else -1
+
+
+def run(args):
+    from pymongo import MongoClient
+
+    node_a = node_config("a", args.mongo, args.port, args.port + 1)
+    node_b = node_config("b", args.mongo, args.port + 2, args.port + 3)
+    seeds = [seed_entry(node_a), seed_entry(node_b)]
+    node_a["network_seeds"] = node_b["network_seeds"] = seeds
+    asyncio.run(preload(args, node_a))
+
+    client = MongoClient(args.mongo)
+    workdir = tempfile.mkdtemp(prefix="yadacoin-sync-")
+    a = start_node(node_a, os.path.join(workdir, "a"))
+    b = None
+    try:
+        wait_for_port(node_a["serve_port"], a, args.timeout)
+        start = perf_counter()
+        b = start_node(node_b, os.path.join(workdir, "b"))
+        wait_for_port(node_b["serve_port"], b, args.timeout)
+        startup = perf_counter() - start
+        height = -1
+        peak_rss = 0
+        while perf_counter() - start < args.timeout:
+            height = synced_height(client, node_b["database"])
+            peak_rss = max(peak_rss, memory(b)["rss_kb"] or 0)
+            if height >= args.blocks:
+                break
+            sleep(0.1)
+        seconds = perf_counter() - start
+        results = {
+            "synced": height >= args.blocks,
+            "height": height,
+            "startup_seconds": round(startup, 3),
+            "sync_seconds": round(seconds - startup, 3),
+            "total_seconds": round(seconds, 3),
+            "blocks_per_sec": round(max(height, 0) / (seconds - startup), 2),
+            "node_a": {"memory": memory(a), "rpc": rpc_totals(node_a["serve_port"])},
+            "node_b": {
+                "memory": {**memory(b), "sampled_peak_kb": peak_rss},
+                "rpc": rpc_totals(node_b["serve_port"]),
+            },
+            "workdir": workdir,
+        }
+    finally:
+        for process in (a, b):
+            if process:
+                process.terminate()
+                process.wait()
+    write_results("sync", vars(args), results, args.output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--blocks", type=int, default=500, help="blocks to sync")
+    parser.add_argument(
+        "--mongo", default="mongodb://localhost:27017", help="mongodb url"
+    )
+    parser.add_argument(
+        "--port", type=int, default=18000, help="first of the four ports used"
+    )
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--output", help="json file, defaults to stdout")
+    parser.add_argument("--log-level", default="ERROR")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level)
+    if args.mongo == "memory":
+        raise SystemExit("Each node needs its own mongod database, pass a mongodb url")
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
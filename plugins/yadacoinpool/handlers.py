@@ -64,6 +64,9 @@ class MarketInfoHandler(BaseWebHandler):
 
 
 class PoolInfoHandler(BaseWebHandler):
+    # pool hashrate and health move between blocks
+    cache_ttl = 10
+
     async def get(self):
         await self.config.LatestBlock.block_checker()
         pool_public_key = (
@@ -86,15 +89,18 @@ class PoolInfoHandler(BaseWebHandler):
         )
         expected_blocks = 144
         mining_time_interval = 600
-        shares_count = await self.config.mongo.async_db.shares.count_documents(
-            {"time": {"$gte": time.time() - mining_time_interval}}
-        )
-        if shares_count > 0:
-            pool_hash_rate = (
-                shares_count * self.config.pool_diff
-            ) / mining_time_interval
+        if self.config.mp:
+            pool_hash_rate = self.config.mp.share_windows.pool_hash_rate()
         else:
-            pool_hash_rate = 0
+            shares_count = await self.config.mongo.async_db.shares.count_documents(
+                {"time": {"$gte": time.time() - mining_time_interval}}
+            )
+            if shares_count > 0:
+                pool_hash_rate = (
+                    shares_count * self.config.pool_diff
+                ) / mining_time_interval
+            else:
+                pool_hash_rate = 0
 
         daily_blocks_found = await self.config.mongo.async_db.blocks.count_documents(
             {"time": {"$gte": time.time() - (600 * 144)}}
@@ -1,3 +1,4 @@
+import hashlib
 import unittest
 from unittest import mock
 from unittest.mock import AsyncMock, Mock
@@ -5,7 +6,7 @@ from unittest.mock import AsyncMock, Mock
 from mongomock import MongoClient
 
 import yadacoin.core.config
-from yadacoin.core.block import Block, quantize_eight
+from yadacoin.core.block import Block, BlockCandidate, quantize_eight
 from yadacoin.core.config import Config
 from yadacoin.core.nodes import Nodes
 from yadacoin.core.transaction import TotalValueMismatchException
@@ -141,6 +142,21 @@ class TestBlock(AsyncTestCase):
         block_copy = await block.copy()
         self.assertIsInstance(block_copy, Block)
 
+    async def test_candidate_materialize(self):
+        block = await Block.init_async(block_index=1, target=1234, header="{nonce}")
+        candidate = BlockCandidate(block, "00ff", "abcd")
+        self.assertEqual(candidate.index, block.index)
+        self.assertIs(candidate.transactions, block.transactions)
+
+        candidate.signature = "sig"
+        materialized = candidate.materialize()
+        self.assertIsInstance(materialized, Block)
+        self.assertEqual(materialized.nonce, "00ff")
+        self.assertEqual(materialized.hash, "abcd")
+        self.assertEqual(materialized.signature, "sig")
+        self.assertEqual(materialized.target, 1234)
+        self.assertEqual(block.hash, "")  # template untouched
+
     async def test_to_dict(self):
         block = await Block.init_async()
         self.assertIsInstance(block.to_dict(), dict)
@@ -260,6 +276,16 @@ class TestBlock(AsyncTestCase):
         self.assertIsInstance(block_hash, str)
         self.assertTrue(len(block_hash), 64)
 
+    async def test_generate_hash_from_header_without_pyrx(self):
+        # heights before the randomx fork hash with sha256 and never load pyrx
+        with mock.patch.object(Block, "get_pyrx", side_effect=ImportError) as get_pyrx:
+            block_hash = Block.generate_hash_from_header(None, 40000, "{nonce}", "01")
+        get_pyrx.assert_not_called()
+        self.assertEqual(
+            block_hash,
+            hashlib.sha256(hashlib.sha256(b"01").digest()).digest()[::-1].hex(),
+        )
+
     @mock.patch("yadacoin.core.config.CONFIG.mongo.async_db.blocks")
     async def test_verify(self, mock_blocks):
         mock_blocks.find_one = AsyncMock(return_value={"transactions": []})
@@ -297,6 +323,39 @@ class TestBlock(AsyncTestCase):
         block.set_merkle_root(block.get_transaction_hashes())
         self.assertEqual(len(block.merkle_root), 64)
 
+    async def test_get_merkle_root(self):
+        def recursive_merkle_root(txn_hashes):
+            hashes = []
+            for i in range(0, len(txn_hashes), 2):
+                pair = txn_hashes[i] + "".join(txn_hashes[i + 1 : i + 2])
+                hashes.append(hashlib.sha256(pair.encode("utf-8")).digest().hex())
+            if len(hashes) > 1:
+                return recursive_merkle_root(hashes)
+            return hashes[0]
+
+        hashes = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(9)]
+        for count in range(1, len(hashes) + 1):
+            block = Block()
+            self.assertEqual(
+                block.get_merkle_root(hashes[:count]),
+                recursive_merkle_root(hashes[:count]),
+            )
+
+        block = Block()
+        root = block.get_merkle_root(hashes)
+        with mock.patch("yadacoin.core.block.hashlib.sha256") as sha256:
+            self.assertEqual(block.get_merkle_root(hashes), root)
+            sha256.assert_not_called()
+
+        # only the pairs and levels above the new last hash are hashed again
+        added = hashes + [hashlib.sha256(b"9").hexdigest()]
+        expected = recursive_merkle_root(added)
+        with mock.patch(
+            "yadacoin.core.block.hashlib.sha256", wraps=hashlib.sha256
+        ) as sha256:
+            self.assertEqual(block.get_merkle_root(added), expected)
+            self.assertEqual(sha256.call_count, 4)
+
     @mock.patch("yadacoin.core.config.CONFIG.mongo.async_db.blocks")
     async def test_to_json(self, mock_blocks):
         mock_blocks.find_one = AsyncMock(return_value={"transactions": []})
@@ -861,6 +861,17 @@ class TestBlockchainUtils(AsyncTestCase):
         )
         self.assertTrue(total_spent_balance > 0)
 
+        addresses = [
+            "1iNw3QHVs45woB9TmXL1XWHyKniTJhzC4",
+            "16bcSsSiZLdb5VDZnoCYj3DRLh5Ea9Usp1",
+            "12Aa9hfgnapHgd6KhRu2HPvMLfWXDprwAQ",
+        ]
+        balances = await config.BU.get_wallet_balances(addresses)
+        for address in addresses:
+            self.assertAlmostEqual(
+                balances[address], await config.BU.get_final_balance(address)
+            )
+
 
 if __name__ == "__main__":
     unittest.main(argv=["first-arg-is-ignored"], exit=False)
@@ -0,0 +1,114 @@
+import base64
+import json
+import unittest
+from unittest import mock
+from unittest.mock import AsyncMock, Mock
+
+import yadacoin.core.config
+from yadacoin.core.config import Config
+from yadacoin.core.crypt import Crypt
+from yadacoin.core.graphutils import GraphUtils
+
+from ..test_setup import AsyncTestCase
+
+
+def encrypt(username_signature, data):
+    return Crypt(username_signature).encrypt(
+        base64.b64encode(json.dumps(data).encode())
+    )
+
+
+class TestGraphUtils(AsyncTestCase):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.config = Config()
+        yadacoin.core.config.CONFIG = self.config
+        self.config.graph_views = None
+        self.config.LatestBlock = Mock()
+        self.config.LatestBlock.block.index = 100
+        self.gu = GraphUtils()
+        self.db = self.gu.mongo.async_db
+        for name in (
+            "reacts_cache",
+            "comments_cache",
+            "transactions_by_rid_cache",
+            "blocks",
+        ):
+            await self.db[name].delete_many({})
+
+    async def cache(self, cache, data_key, transactions, username_signatures):
+        async def relationship_transactions(block_height):
+            self.block_height = block_height
+            for x in transactions:
+                yield x
+
+        async def friends(*args, **kwargs):
+            yield {"relationship": {"their_username_signature": "friend"}}
+
+        with mock.patch.object(
+            self.gu,
+            "get_mutual_username_signatures",
+            new=AsyncMock(return_value=list(username_signatures)),
+        ), mock.patch.object(
+            self.gu, "get_transactions_by_rid", new=friends
+        ), mock.patch.object(
+            self.gu, "get_relationship_transactions", new=relationship_transactions
+        ):
+            return await self.gu.cache_relationship_transactions(
+                cache, ["rid"], data_key
+            )
+
+    async def test_reacts_and_comments_cached_by_rid(self):
+        for cache, data_key in (
+            (self.db.reacts_cache, "react"),
+            (self.db.comments_cache, "comment"),
+        ):
+            await cache.insert_one({"rid": "rid", "height": 42, "success": False})
+            # the height is looked up by rid, so only transactions above it are read
+            self.assertEqual(await self.cache(cache, data_key, [], []), 42)
+            self.assertEqual(self.block_height, 42)
+
+    async def test_decrypt_stops_at_first_success(self):
+        txn = {
+            "height": 50,
+            "txn": {"id": "react", "relationship": encrypt("right", {"react": "+1"})},
+        }
+        with mock.patch("yadacoin.core.graphutils.Crypt", wraps=Crypt) as crypt:
+            await self.cache(self.db.reacts_cache, "react", [txn], ["wrong", "right"])
+        # the friend signature after the one that decrypted is never tried
+        self.assertEqual([x.args[0] for x in crypt.call_args_list], ["wrong", "right"])
+        cached = {
+            x["username_signature"]: x["success"]
+            async for x in self.db.reacts_cache.find({"rid": "rid"})
+        }
+        self.assertEqual(cached, {"wrong": False, "right": True})
+
+    async def test_node_cipher(self):
+        await self.db.blocks.insert_one(
+            {
+                "index": 10,
+                "hash": "hash10",
+                "transactions": [
+                    {"id": "txn", "rid": "selector", "relationship": "encrypted"}
+                ],
+            }
+        )
+        with mock.patch.object(
+            self.config, "cipher", create=True
+        ) as cipher, mock.patch(
+            "yadacoin.core.graphutils.Crypt", side_effect=AssertionError
+        ):
+            cipher.decrypt.return_value = b'{"postText": "hi"}'
+            transactions = [
+                x
+                async for x in self.gu.get_transactions_by_rid_worker(
+                    "selector", "username_signature", wif=self.config.wif, rid=True
+                )
+            ]
+        cipher.decrypt.assert_called_once_with("encrypted")
+        self.assertEqual(transactions[0]["relationship"], {"postText": "hi"})
+        await self.db.blocks.delete_many({})
+
+
+if __name__ == "__main__":
+    unittest.main(argv=["first-arg-is-ignored"], exit=False)
@@ -0,0 +1,115 @@
+import unittest
+from unittest import mock
+from unittest.mock import Mock
+
+from yadacoin.core.graphviews import GraphViews
+
+from ..test_setup import AsyncTestCase
+
+
+class TestGraphViews(AsyncTestCase):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.views = GraphViews()
+        for name in GraphViews.views + ("graph_views",):
+            await self.views.mongo.async_db[name].delete_many({})
+
+    def txn(self, txn_id, **kwargs):
+        txn = {
+            "id": txn_id,
+            "rid": "",
+            "requester_rid": "",
+            "requested_rid": "",
+            "dh_public_key": "",
+            "relationship": "",
+        }
+        txn.update(kwargs)
+        return txn
+
+    async def test_route_and_rollback(self):
+        db = self.views.mongo.async_db
+        block = {
+            "index": 0,
+            "hash": "hash0",
+            "transactions": [
+                self.txn(
+                    "friend_request",
+                    rid="rid",
+                    requester_rid="requester",
+                    requested_rid="requested",
+                    dh_public_key="dh",
+                    relationship="encrypted",
+                ),
+                self.txn("post", relationship="encrypted"),
+                self.txn("payment"),
+            ],
+        }
+        await self.views.on_block_inserted(block)
+        self.assertEqual(await self.views.get_height(), 0)
+        self.assertEqual(
+            await db.friend_requests_cache.count_documents(
+                {"requested_rid": "requested"}
+            ),
+            1,
+        )
+        self.assertEqual(
+            await db.sent_friend_requests_cache.count_documents(
+                {"requester_rid": "requester"}
+            ),
+            1,
+        )
+        self.assertEqual(await db.messages_cache.count_documents({"rid": "rid"}), 1)
+        self.assertEqual(
+            await db.relationship_transactions_cache.count_documents({"id": "post"}), 1
+        )
+
+        # a block replacing height 0 drops what the old one routed
+        await self.views.on_block_inserted(
+            {"index": 0, "hash": "hash0b", "transactions": [self.txn("payment")]}
+        )
+        self.assertEqual(await self.views.get_height(), 0)
+        for name in GraphViews.views:
+            self.assertEqual(await db[name].count_documents({}), 0)
+
+        # blocks past a gap are left to catch_up
+        await self.views.on_block_inserted(
+            {"index": 5, "hash": "hash5", "transactions": []}
+        )
+        self.assertEqual(await self.views.get_height(), 0)
+
+    async def test_insert_above_height_keeps_views(self):
+        await self.views.on_block_inserted(
+            {"index": 0, "hash": "hash0", "transactions": [self.txn("post")]}
+        )
+        with mock.patch.object(self.views, "rollback") as rollback:
+            await self.views.on_block_inserted(
+                {"index": 1, "hash": "hash1", "transactions": []}
+            )
+        rollback.assert_not_called()
+        self.assertEqual(await self.views.get_height(), 1)
+
+    async def test_catch_up_gap(self):
+        db = self.views.mongo.async_db
+        await db.blocks.delete_many({})
+        for index in (0, 1, 3):
+            await db.blocks.insert_one(
+                {"index": index, "hash": f"hash{index}", "transactions": []}
+            )
+        self.views.config.LatestBlock = Mock()
+        self.views.config.LatestBlock.block.index = 3
+        with mock.patch.object(self.views, "app_log") as app_log:
+            await self.views.catch_up()
+        self.assertEqual(await self.views.get_height(), 1)
+        self.assertIn("block 2 is missing", app_log.warning.call_args.args[0])
+
+        # resumes once the missing block is stored
+        await db.blocks.insert_one({"index": 2, "hash": "hash2", "transactions": []})
+        with mock.patch.object(self.views, "app_log") as app_log:
+            await self.views.catch_up()
+        self.assertEqual(await self.views.get_height(), 3)
+        app_log.warning.assert_not_called()
+        await db.blocks.delete_many({})
+
+
+if __name__ == "__main__":
+    unittest.main(argv=["first-arg-is-ignored"], exit=False)
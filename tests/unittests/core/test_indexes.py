@@ -0,0 +1,73 @@
+import unittest
+
+from mongomock import MongoClient
+from pymongo import ASCENDING, DESCENDING
+
+import yadacoin.core.config
+from yadacoin.core.config import Config
+from yadacoin.core.indexes import Indexes
+
+from ..test_setup import AsyncTestCase
+
+
+class AppLog:
+    def __init__(self):
+        self.warnings = []
+
+    def warning(self, message):
+        self.warnings.append(message)
+
+
+class TestIndexes(AsyncTestCase):
+    async def asyncSetUp(self):
+        yadacoin.core.config.CONFIG = Config.generate()
+        yadacoin.core.config.CONFIG.app_log = AppLog()
+        self.db = MongoClient().db
+        self.db.blocks.create_index([("hash", DESCENDING)], name="__hash")
+        self.db.blocks.create_index([("nonce", ASCENDING)], name="__nonce")
+
+    async def test_drift(self):
+        indexes = Indexes(self.db)
+        report = indexes.drift()
+        self.assertNotIn("__hash", report["missing"]["blocks"])
+        self.assertIn("__time", report["missing"]["blocks"])
+        self.assertEqual(report["mismatched"], {"blocks": ["__hash"]})
+        self.assertEqual(report["undeclared"], {"blocks": ["__nonce"]})
+        # declared but not built yet
+        shape = (
+            "BlockChainUtils.get_transaction_heights",
+            "blocks",
+            ["transactions.id"],
+        )
+        self.assertIn(shape, report["unindexed_query_shapes"])
+        self.assertIn(shape, report["unbuilt_query_shapes"])
+
+        self.db.blocks.drop_index("__hash")
+        indexes.provision()
+        self.assertEqual(indexes.status, "done")
+        self.assertIn("__hash", indexes.startup_report["missing"]["blocks"])
+        self.assertEqual(indexes.report["missing"], {})
+        self.assertEqual(indexes.report["mismatched"], {})
+        self.assertEqual(indexes.report["unindexed_query_shapes"], [])
+        self.assertEqual(indexes.report["unbuilt_query_shapes"], [])
+
+    async def test_unindexed_query_shape(self):
+        self.db.blocks.create_index([("index", ASCENDING)], name="__index")
+        indexes = Indexes(self.db)
+        indexes.declared = {"blocks": []}
+        report = indexes.drift()
+        shape = (
+            "BlockChainUtils.get_transaction_heights",
+            "blocks",
+            ["transactions.id"],
+        )
+        self.assertIn(shape, report["unindexed_query_shapes"])
+        self.assertNotIn(shape, report["unbuilt_query_shapes"])
+        self.assertNotIn(
+            ("BlockChainUtils.get_block_by_index", "blocks", ["index"]),
+            report["unindexed_query_shapes"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main(argv=["first-arg-is-ignored"], exit=False)
@@ -0,0 +1,40 @@
+import asyncio
+import time
+import unittest
+
+import yadacoin.core.config
+from yadacoin.core.config import Config
+from yadacoin.core.loopmonitor import LoopMonitor
+
+from ..test_setup import AsyncTestCase
+
+
+class TestLoopMonitor(AsyncTestCase):
+    async def asyncSetUp(self):
+        yadacoin.core.config.CONFIG = Config.generate()
+        self.monitor = LoopMonitor()
+        self.monitor.interval = 0.05
+        self.monitor.threshold = 0.1
+        self.monitor.start()
+
+    async def asyncTearDown(self):
+        self.monitor.stop()
+
+    async def blocking_coroutine(self):
+        time.sleep(0.5)
+
+    async def test_stall_records_coroutine(self):
+        await asyncio.sleep(0.1)
+        await self.blocking_coroutine()
+        await asyncio.sleep(0.1)
+
+        status = self.monitor.to_dict()
+        self.assertEqual(len(status["stalls"]), 1)
+        stall = status["stalls"][0]
+        self.assertIn("TestLoopMonitor.blocking_coroutine", stall["coroutines"])
+        self.assertGreater(float(stall["duration"]), 0.1)
+        self.assertGreater(status["lag_histogram"]["count"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main(argv=["first-arg-is-ignored"], exit=False)
@@ -0,0 +1,79 @@
+import unittest
+
+from mongomock import MongoClient
+
+import yadacoin.core.config
+from yadacoin.core.config import Config
+from yadacoin.core.migrations import BlockTimeToInt, Migrations
+
+from ..test_setup import AsyncTestCase
+
+
+class AppLog:
+    def warning(self, message):
+        pass
+
+    def info(self, message):
+        pass
+
+
+class TestMigrations(AsyncTestCase):
+    async def asyncSetUp(self):
+        yadacoin.core.config.CONFIG = Config.generate()
+        yadacoin.core.config.CONFIG.app_log = AppLog()
+        self.db = MongoClient().db
+        self.db.blocks.insert_many(
+            [
+                {
+                    "index": index,
+                    "time": str(1000 + index),
+                    "public_key": "pk",
+                    "transactions": [
+                        {
+                            "public_key": "pk",
+                            "time": str(1000 + index),
+                            "inputs": [],
+                            "outputs": [{"value": 12.5}],
+                        }
+                    ],
+                }
+                for index in range(5)
+            ]
+        )
+        self.migrations = Migrations(self.db)
+        self.migrations.batch_size = 2
+
+    async def test_run(self):
+        self.migrations.run()
+        self.assertEqual(
+            self.db.schema_version.find_one({"_id": "schema_version"})["version"],
+            self.migrations.latest,
+        )
+        for block in self.db.blocks.find():
+            self.assertEqual(block["time"], 1000 + block["index"])
+            self.assertEqual(block["transactions"][0]["time"], 1000 + block["index"])
+            self.assertIn("updated_at", block)
+
+        # up to date, nothing is read
+        self.db.blocks.insert_one({"index": 5, "time": "1005"})
+        self.migrations.run()
+        self.assertEqual(self.db.blocks.find_one({"index": 5})["time"], "1005")
+
+    async def test_resume(self):
+        first = self.db.blocks.find_one({"index": 0})
+        self.db.schema_version.insert_one(
+            {
+                "_id": "schema_version",
+                "version": 0,
+                "migrating": BlockTimeToInt.version,
+                "resume": first["_id"],
+            }
+        )
+        self.migrations.run()
+        # the first block was in a finished batch and is not read again
+        self.assertEqual(self.db.blocks.find_one({"index": 0})["time"], "1000")
+        self.assertEqual(self.db.blocks.find_one({"index": 1})["time"], 1001)
+
+
+if __name__ == "__main__":
+    unittest.main(argv=["first-arg-is-ignored"], exit=False)
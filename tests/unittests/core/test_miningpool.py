@@ -0,0 +1,37 @@
+import unittest
+
+import yadacoin.core.config
+from yadacoin.core.block import Block
+from yadacoin.core.config import Config
+from yadacoin.core.miningpool import MiningPool
+
+from ..test_setup import AsyncTestCase
+
+
+class TestMiningPool(AsyncTestCase):
+    async def asyncSetUp(self):
+        yadacoin.core.config.CONFIG = Config.generate()
+
+    async def test_generate_job_blob(self):
+        mp = MiningPool()
+        mp.config = Config()
+        mp.max_target = 2**256 - 1
+        mp.blob_header = ""
+        mp.blob_parts = []
+        mp.block_factory = await Block.init_async(
+            block_index=500000, header="5{nonce}abc", target=2**250
+        )
+        for header in ("5{nonce}abc", "6{nonce}abc{nonce}"):
+            mp.block_factory.header = header
+            job = await mp.generate_job("xmrig/6", "peer_id")
+            self.assertEqual(
+                job.blob,
+                header.encode()
+                .hex()
+                .replace("7b6e6f6e63657d", "00000000" + job.extra_nonce),
+            )
+            self.assertEqual(job.index, 500000)
+
+
+if __name__ == "__main__":
+    unittest.main(argv=["first-arg-is-ignored"], exit=False)
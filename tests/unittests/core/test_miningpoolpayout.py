@@ -0,0 +1,134 @@
+import unittest
+from unittest import mock
+from unittest.mock import AsyncMock, Mock
+
+import yadacoin.core.config
+from yadacoin.core.block import Block
+from yadacoin.core.chain import CHAIN
+from yadacoin.core.config import Config
+from yadacoin.core.miningpool import MiningPool
+from yadacoin.core.miningpoolpayout import PoolPayer
+
+from ..test_setup import AsyncTestCase
+
+ADDRESS_A = "1iNw3QHVs45woB9TmXL1XWHyKniTJhzC4"
+ADDRESS_B = "1HzWQE7iUZNLqmGU5Rc1r7hNKzDwDRWiJY"
+
+
+class TestPoolPayer(AsyncTestCase):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.config = Config()
+        yadacoin.core.config.CONFIG = self.config
+        self.db = self.config.mongo.async_db
+        for name in (
+            "blocks",
+            "shares",
+            "share_totals",
+            "share_totals_heights",
+            "share_payout",
+            "miner_transactions",
+        ):
+            await self.db[name].delete_many({})
+        self.payer = PoolPayer()
+
+    async def add_share(self, index, address, block_hash):
+        await self.db.shares.insert_one(
+            {
+                "address": address + ".rig",
+                "address_only": address,
+                "index": index,
+                "hash": block_hash,
+            }
+        )
+
+    async def test_start_share_totals(self):
+        mp = MiningPool()
+        mp.mongo = self.config.mongo
+        await mp.start_share_totals(10)
+        # shares stored before the pool started the height
+        await self.add_share(11, ADDRESS_A, "f" * 64)
+        await mp.start_share_totals(11)
+        self.assertEqual(
+            [x["index"] async for x in self.db.share_totals_heights.find({})], [10]
+        )
+
+    async def test_fresh_totals(self):
+        totals = [
+            {"index": 10, "address": ADDRESS_A, "difficulty": 3.0, "shares": 2},
+            {"index": 10, "address": ADDRESS_B, "difficulty": 1.0, "shares": 1},
+        ]
+        await self.db.share_totals.insert_many([x.copy() for x in totals])
+        await self.db.share_totals_heights.insert_one({"index": 10})
+        # raw shares are not counted for a complete height
+        await self.add_share(10, ADDRESS_A, "f" * 64)
+        with mock.patch.object(
+            self.payer, "rebuild_share_totals_for_height"
+        ) as rebuild:
+            self.assertEqual(await self.payer.get_share_totals_for_height(10), totals)
+            rebuild.assert_not_called()
+
+    async def test_legacy_rebuild(self):
+        await self.add_share(10, ADDRESS_A, "f" * 64)
+        await self.add_share(10, ADDRESS_A, "e" * 64)
+        await self.add_share(10, ADDRESS_B, "f" * 64)
+        totals = await self.payer.get_share_totals_for_height(10)
+        self.assertEqual(
+            {x["address"]: x["shares"] for x in totals}, {ADDRESS_A: 2, ADDRESS_B: 1}
+        )
+        self.assertTrue(await self.db.share_totals_heights.find_one({"index": 10}))
+
+        # rebuilt once, later payouts read the stored totals
+        await self.db.shares.delete_many({})
+        self.assertEqual(
+            sorted(
+                x["shares"] for x in await self.payer.get_share_totals_for_height(10)
+            ),
+            [1, 2],
+        )
+
+    async def test_do_payout_uses_totals(self):
+        self.config.payout_frequency = 1
+        # a payout starts once a later won block is ready as well
+        for index in (10, 11):
+            block = await Block.generate(
+                public_key=self.config.public_key,
+                private_key=self.config.private_key,
+                index=index,
+                prev_hash="",
+                target=CHAIN.MAX_TARGET,
+            )
+            await self.db.blocks.insert_one(block.to_dict())
+        await self.db.share_totals.insert_many(
+            [
+                {"index": 10, "address": ADDRESS_A, "difficulty": 3.0, "shares": 3},
+                {"index": 10, "address": ADDRESS_B, "difficulty": 1.0, "shares": 1},
+            ]
+        )
+        await self.db.share_totals_heights.insert_one({"index": 10})
+        self.config.LatestBlock = Mock()
+        self.config.LatestBlock.block.index = 20
+
+        transaction = Mock()
+        transaction.verify = AsyncMock()
+        transaction.to_dict.return_value = {}
+        with mock.patch(
+            "yadacoin.core.miningpoolpayout.Transaction.generate",
+            new=AsyncMock(return_value=transaction),
+        ) as generate, mock.patch.object(
+            self.payer, "already_used", new=AsyncMock(return_value=False)
+        ), mock.patch.object(
+            self.payer, "broadcast_transaction", new=AsyncMock()
+        ):
+            await self.payer.do_payout()
+
+        total_payout = block.get_coinbase().outputs[0].value * (
+            1 - self.config.pool_take
+        )
+        outputs = {x["to"]: x["value"] for x in generate.call_args.kwargs["outputs"]}
+        self.assertAlmostEqual(outputs[ADDRESS_A], total_payout * 0.75)
+        self.assertAlmostEqual(outputs[ADDRESS_B], total_payout * 0.25)
+
+
+if __name__ == "__main__":
+    unittest.main(argv=["first-arg-is-ignored"], exit=False)
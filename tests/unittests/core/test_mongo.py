@@ -63,6 +63,9 @@ class TestMongo(AsyncTestCase):
             def info(self, message):
                 pass
 
+            def debug(self, message):
+                pass
+
         c = Config()
         c.mongo_debug = True
         c.app_log = AppLog()
@@ -74,6 +77,7 @@ class TestMongo(AsyncTestCase):
         await m.async_db.test_collection.find({f"not_indexed{i}": 1}).limit(1).to_list(
             1
         )
+        await m.telemetry.drain()
         assert await m.async_db.unindexed_queries.find_one(
             {"command_name": "find", f"query.not_indexed{i}": None}
         )
@@ -81,6 +85,7 @@ class TestMongo(AsyncTestCase):
 
         # test find_one
         await m.async_db.test_collection.find_one({f"not_indexed{i}": 1})
+        await m.telemetry.drain()
         assert await m.async_db.unindexed_queries.find_one(
             {"command_name": "find", f"query.not_indexed{i}": None}
         )
@@ -88,6 +93,7 @@ class TestMongo(AsyncTestCase):
 
         # test count_documents
         await m.async_db.test_collection.count_documents({f"not_indexed{i}": 1})
+        await m.telemetry.drain()
         assert await m.async_db.unindexed_queries.find_one(
             {"command_name": "aggregate", f"query.0.$match.not_indexed{i}": None}
         )
@@ -95,6 +101,7 @@ class TestMongo(AsyncTestCase):
 
         # test delete_many
         await m.async_db.test_collection.delete_many({f"not_indexed{i}": 1})
+        await m.telemetry.drain()
         assert await m.async_db.unindexed_queries.find_one(
             {"command_name": "delete", f"query.0.q.not_indexed{i}": None}
         )
@@ -102,6 +109,7 @@ class TestMongo(AsyncTestCase):
 
         # test replace_one
         await m.async_db.test_collection.replace_one({f"not_indexed{i}": 1}, {})
+        await m.telemetry.drain()
         assert await m.async_db.unindexed_queries.find_one(
             {"command_name": "update", f"query.0.q.not_indexed{i}": None}
         )
@@ -111,6 +119,7 @@ class TestMongo(AsyncTestCase):
         await m.async_db.test_collection.update_one(
             {f"not_indexed{i}": 1}, {"$set": {}}
         )
+        await m.telemetry.drain()
         assert await m.async_db.unindexed_queries.find_one(
             {"command_name": "update", f"query.0.q.not_indexed{i}": None}
         )
@@ -120,6 +129,7 @@ class TestMongo(AsyncTestCase):
         await m.async_db.test_collection.update_many(
             {f"not_indexed{i}": 1}, {"$set": {}}
         )
+        await m.telemetry.drain()
         assert await m.async_db.unindexed_queries.find_one(
             {"command_name": "update", f"query.0.q.not_indexed{i}": None}
         )
@@ -129,6 +139,7 @@ class TestMongo(AsyncTestCase):
         await m.async_db.test_collection.aggregate(
             [{"$match": {f"not_indexed{i}": 1}}]
         ).to_list(1)
+        await m.telemetry.drain()
         assert await m.async_db.unindexed_queries.find_one(
             {"command_name": "aggregate", f"query.0.$match.not_indexed{i}": None}
         )
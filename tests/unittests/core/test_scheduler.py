@@ -0,0 +1,58 @@
+import asyncio
+import unittest
+
+from yadacoin.core.scheduler import Scheduler
+
+from ..test_setup import AsyncTestCase
+
+
+class TestScheduler(AsyncTestCase):
+    async def asyncSetUp(self):
+        self.scheduler = Scheduler()
+
+    async def asyncTearDown(self):
+        self.scheduler.stop()
+
+    async def test_wake_coalesces_while_running(self):
+        runs = []
+        release = asyncio.Event()
+
+        async def background_task():
+            runs.append(1)
+            await release.wait()
+
+        task = self.scheduler.add(background_task, 3600, events=("event",))
+        for _ in range(5):
+            self.scheduler.wake("event")
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(runs), 1)
+        self.assertTrue(task.pending)
+
+        release.set()
+        await asyncio.sleep(0.01)
+        # the five wakeups during the first run make a single extra run
+        self.assertEqual(len(runs), 2)
+        self.assertEqual(task.runs, 2)
+        self.assertEqual(task.wakeups, 5)
+
+    async def test_concurrency(self):
+        running = []
+        release = asyncio.Event()
+
+        async def background_task():
+            running.append(1)
+            await release.wait()
+
+        self.scheduler.add(background_task, 3600, events=("event",), concurrency=2)
+        for _ in range(3):
+            self.scheduler.wake("event")
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(running), 2)
+        release.set()
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(running), 3)
+        self.scheduler.wake("other")
+
+
+if __name__ == "__main__":
+    unittest.main(argv=["first-arg-is-ignored"], exit=False)
@@ -0,0 +1,51 @@
+import unittest
+
+import yadacoin.core.config
+from yadacoin.core.config import Config
+from yadacoin.core.sharewindow import ShareWindow, ShareWindows
+
+from ..test_setup import AsyncTestCase
+
+
+class Miner:
+    def __init__(self, address):
+        self.address = address
+        self.address_only = address.split(".")[0]
+
+
+class TestShareWindow(AsyncTestCase):
+    async def asyncSetUp(self):
+        yadacoin.core.config.CONFIG = Config.generate()
+
+    async def test_count(self):
+        window = ShareWindow(600)
+        window.add(1000)
+        window.add(1005)
+        window.add(1590)
+        self.assertEqual(window.count(1000), 3)
+        self.assertEqual(window.count(1500), 1)
+        self.assertEqual(window.last_share_time, 1590)
+
+    async def test_ring_wraps(self):
+        window = ShareWindow(600)
+        window.add(1000)
+        window.add(1000 + window.num_buckets * window.bucket_seconds)
+        self.assertEqual(window.count(0), 1)
+
+    async def test_miner_hash_rate(self):
+        windows = ShareWindows()
+        windows.record(Miner("addr.worker1"), 1000)
+        windows.record(Miner("addr.worker2"), 1000)
+        pool_diff = Config().pool_diff
+        self.assertEqual(
+            windows.miner_hash_rate("addr"), 2 * pool_diff / windows.miner_interval
+        )
+        self.assertEqual(
+            windows.miner_hash_rate("addr.worker1"),
+            pool_diff / windows.miner_interval,
+        )
+        self.assertIsNone(windows.miner_hash_rate("other"))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=["first-arg-is-ignored"], exit=False)
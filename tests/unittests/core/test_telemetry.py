@@ -0,0 +1,64 @@
+import unittest
+from types import SimpleNamespace
+
+import yadacoin.core.config
+from yadacoin.core.config import Config
+from yadacoin.core.mongo import QueryTelemetry
+
+from ..test_setup import AsyncTestCase
+
+
+class Telemetry(QueryTelemetry):
+    def __init__(self):
+        super().__init__()
+        self.explains = []
+
+    def explain(self, command_name, command, collection, database_name):
+        self.explains.append((command_name, collection))
+
+
+class TestQueryTelemetry(AsyncTestCase):
+    async def asyncSetUp(self):
+        yadacoin.core.config.CONFIG = Config.generate()
+        self.config = yadacoin.core.config.CONFIG
+        self.config.slow_query_threshold = 1
+        self.telemetry = Telemetry()
+
+    def run_query(self, request_id, query, duration):
+        command = {"find": "blocks", "filter": query}
+        self.telemetry.started(
+            SimpleNamespace(
+                command_name="find",
+                command=command,
+                database_name="yadacoin",
+                request_id=request_id,
+            )
+        )
+        self.telemetry.succeeded(
+            SimpleNamespace(
+                command_name="find",
+                request_id=request_id,
+                duration_micros=duration * 1000000,
+            )
+        )
+
+    async def test_shapes_and_slow_queries(self):
+        self.run_query(1, {"index": 1}, 0.01)
+        self.run_query(2, {"index": 2}, 0.02)
+        self.run_query(3, {"hash": {"$in": ["a", "b", "c"]}}, 2)
+        self.run_query(4, {"hash": {"$in": ["d"]}}, 3)
+        await self.telemetry.drain()
+
+        status = self.telemetry.to_dict()
+        shapes = {x["shape"]: x for x in status["query_shapes"]}
+        self.assertEqual(shapes["{index: ?}"]["count"], 2)
+        self.assertEqual(shapes["{hash: {$in: [?]}}"]["count"], 2)
+        self.assertEqual(status["slow_queries"]["count"], 2)
+        self.assertEqual(len(status["slow_queries"]["detail"]), 2)
+        # the slow shape is explained once per explain_interval
+        self.assertEqual(self.telemetry.explains, [("find", "blocks")])
+        self.assertEqual(self.telemetry.pending, {})
+
+
+if __name__ == "__main__":
+    unittest.main(argv=["first-arg-is-ignored"], exit=False)
@@ -29,6 +29,16 @@ class TestTransaction(AsyncTestCase):
         txn = Transaction()
         self.assertIsInstance(txn, Transaction)
 
+    async def test_slots(self):
+        txn = Transaction(
+            inputs=[Input(signature="id")],
+            outputs=[Output(to="1iNw3QHVs45woB9TmXL1XWHyKniTJhzC4", value=1)],
+        )
+        for obj in (txn, txn.inputs[0], txn.outputs[0]):
+            self.assertFalse(hasattr(obj, "__dict__"))
+        self.assertIs(txn.config, Config())
+        self.assertIs(txn.mongo, Config().mongo)
+
     async def test_generate(self):
         txn = await Transaction.generate(
             public_key=yadacoin.core.config.CONFIG.public_key,
@@ -62,6 +72,26 @@ class TestTransaction(AsyncTestCase):
 
             self.fail(f"Txn did not verify {format_exc()}")
 
+    async def test_generate_hash_cached(self):
+        txn = await Transaction.generate(
+            public_key=yadacoin.core.config.CONFIG.public_key,
+            private_key=yadacoin.core.config.CONFIG.private_key,
+        )
+        txn = Transaction.from_dict(txn.to_dict())
+        self.assertEqual(await txn.generate_hash(), txn.hash)
+        with patch("yadacoin.core.transaction.Transaction.get_input_hashes") as inputs:
+            self.assertEqual(await txn.generate_hash(), txn.hash)
+            inputs.assert_not_called()
+        # the preimage is not kept once hashed
+        self.assertFalse(hasattr(txn, "_hash_preimage"))
+
+        txn.fee = 1.0
+        self.assertNotEqual(await txn.generate_hash(), txn.hash)
+        txn.fee = 0.0
+        self.assertEqual(await txn.generate_hash(), txn.hash)
+        txn.outputs = [Output(to="1iNw3QHVs45woB9TmXL1XWHyKniTJhzC4", value=1)]
+        self.assertNotEqual(await txn.generate_hash(), txn.hash)
+
     @patch("yadacoin.core.transaction.Transaction.generate_inputs", return_value=1)
     async def test_do_money_coinbase(self, mock_generate_inputs):
         # Test coinbase, Passing
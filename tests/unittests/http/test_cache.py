@@ -0,0 +1,66 @@
+import unittest
+
+import yadacoin.core.config
+from yadacoin.core.config import Config
+from yadacoin.http.cache import ResponseCache
+
+from ..test_setup import AsyncTestCase
+
+
+class Block:
+    def __init__(self, block_hash):
+        self.hash = block_hash
+
+
+class LatestBlock:
+    block = Block("tip1")
+
+
+class Request:
+    def __init__(self, path, arguments=None):
+        self.path = path
+        self.arguments = arguments or {}
+
+
+class TestResponseCache(AsyncTestCase):
+    async def asyncSetUp(self):
+        yadacoin.core.config.CONFIG = Config.generate()
+        LatestBlock.block = Block("tip1")
+        Config().LatestBlock = LatestBlock
+
+    async def test_hit_and_tip_invalidation(self):
+        cache = ResponseCache()
+        key = cache.make_key(Request("/explorer-latest", {"b": [b"1"], "a": [b"2"]}))
+        self.assertEqual(
+            key, cache.make_key(Request("/explorer-latest", {"a": [b"2"], "b": [b"1"]}))
+        )
+        self.assertIsNone(cache.get(key))
+        cache.set(key, '{"a": 1}', 600)
+        body, etag = cache.get(key)
+        self.assertEqual(body, b'{"a": 1}')
+        self.assertTrue(etag.startswith('"'))
+
+        LatestBlock.block = Block("tip2")
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(len(cache.entries), 0)
+
+        # computed under the previous tip, not kept
+        cache.set(key, '{"a": 1}', 600)
+        self.assertEqual(len(cache.entries), 0)
+
+    async def test_bounds(self):
+        cache = ResponseCache()
+        cache.max_entries = 2
+        keys = [cache.make_key(Request(f"/route{i}")) for i in range(3)]
+        for key in keys:
+            cache.set(key, "{}", 600)
+        self.assertIsNone(cache.get(keys[0]))
+        self.assertIsNotNone(cache.get(keys[2]))
+        self.assertEqual(cache.size, 4)
+
+        cache.set(keys[1], "{}", -1)
+        self.assertIsNone(cache.get(keys[1]))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=["first-arg-is-ignored"], exit=False)
@@ -0,0 +1,29 @@
+import unittest
+
+from yadacoin.http.explorer import classify_search_term
+
+from ..test_setup import AsyncTestCase
+
+
+class TestClassifySearchTerm(AsyncTestCase):
+    async def asyncSetUp(self):
+        pass
+
+    async def test_classes(self):
+        self.assertEqual(classify_search_term("123456"), "height")
+        self.assertEqual(classify_search_term("ab" * 32), "hash")
+        self.assertEqual(classify_search_term("02" + "ab" * 32), "public_key")
+        self.assertEqual(
+            classify_search_term("1HhJoPHGmGG1fUvY6JPZgKPHCzPCSbGDT9"), "address"
+        )
+        self.assertEqual(
+            classify_search_term(
+                "MEUCIQDNVcSeBXIo1iuhWbDDw2aB+6b0Uvq5TwEzHjJc8ujXFAIgRG3k9hXwnXXZzT4A0uDcQlKzLLGXgIxyBh3cPRGbDGg="
+            ),
+            "signature",
+        )
+        self.assertIsNone(classify_search_term("not a term"))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=["first-arg-is-ignored"], exit=False)
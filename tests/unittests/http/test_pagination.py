@@ -0,0 +1,60 @@
+import unittest
+
+from mongomock import MongoClient
+
+from yadacoin.http.pagination import KeysetPage, decode_cursor, encode_cursor
+
+from ..test_setup import AsyncTestCase
+
+
+async def aiter_of(items):
+    for item in items:
+        yield item
+
+
+class TestKeysetPage(AsyncTestCase):
+    async def asyncSetUp(self):
+        self.blocks = MongoClient().db.blocks
+        self.blocks.insert_many(
+            [
+                {
+                    "index": index,
+                    "transactions": [
+                        {"id": f"{index}-{i}", "outputs": [{"to": "addr"}]}
+                        for i in range(3)
+                    ],
+                }
+                for index in range(4)
+            ]
+        )
+
+    async def get_page(self, cursor=None, limit=None):
+        page = KeysetPage(cursor=cursor, limit=limit)
+        rows = self.blocks.aggregate(
+            page.transactions_pipeline(
+                {"transactions.outputs.to": "addr"},
+                {"transactions.outputs.to": "addr"},
+            )
+        )
+        return [x["id"] async for x in page.transactions(aiter_of(rows))], page
+
+    async def test_cursor_roundtrip(self):
+        self.assertEqual(decode_cursor(encode_cursor(12, 3)), (12, 3))
+        with self.assertRaises(ValueError):
+            decode_cursor("not a cursor")
+
+    async def test_transactions_pages(self):
+        ids, page = await self.get_page(limit=4)
+        self.assertEqual(ids, ["3-0", "3-1", "3-2", "2-0"])
+        ids, page = await self.get_page(cursor=page.next_cursor, limit=4)
+        self.assertEqual(ids, ["2-1", "2-2", "1-0", "1-1"])
+        ids, page = await self.get_page(cursor=page.next_cursor, limit=4)
+        self.assertEqual(ids, ["1-2", "0-0", "0-1", "0-2"])
+        self.assertIsNone(page.next_cursor)
+
+        ids, page = await self.get_page()
+        self.assertEqual(len(ids), 12)
+
+
+if __name__ == "__main__":
+    unittest.main(argv=["first-arg-is-ignored"], exit=False)
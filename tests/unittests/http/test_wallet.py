@@ -0,0 +1,118 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+from unittest.mock import AsyncMock, Mock
+
+import yadacoin.core.config
+from yadacoin.core.blockchainutils import BlockChainUtils
+from yadacoin.core.config import Config
+from yadacoin.core.latestblock import LatestBlock
+from yadacoin.http.wallet import TransactionConfirmationsHandler
+
+from ..test_setup import AsyncTestCase
+
+
+class Block:
+    def __init__(self, index):
+        self.index = index
+        self.hash = f"hash{index}"
+
+
+class Blocks:
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self.queries = []
+
+    def find(self, query, projection):
+        self.queries.append(query)
+
+        async def blocks():
+            for block in self.blocks:
+                yield block
+
+        return blocks()
+
+
+class TestTransactionConfirmations(AsyncTestCase):
+    async def asyncSetUp(self):
+        self.config = Config.generate()
+        yadacoin.core.config.CONFIG = self.config
+        self.tip = LatestBlock.block
+        LatestBlock.block = Block(11)
+        self.config.LatestBlock = LatestBlock
+        self.config.BU = Mock()
+        self.config.BU.get_transaction_heights = AsyncMock(
+            return_value={"txn1": 10, "txn2": None}
+        )
+        self.handler = TransactionConfirmationsHandler.__new__(
+            TransactionConfirmationsHandler
+        )
+        self.handler.config = self.config
+
+    async def asyncTearDown(self):
+        LatestBlock.block = self.tip
+
+    async def new_block(self, index):
+        await asyncio.sleep(0.05)
+        LatestBlock.block = Block(index)
+        LatestBlock.new_block.notify_all()
+
+    async def test_wait_for_block(self):
+        start = time.time()
+        waiter = asyncio.ensure_future(LatestBlock.wait_for_block(10))
+        await self.new_block(12)
+        self.assertTrue(await waiter)
+        self.assertLess(time.time() - start, 1)
+        self.assertFalse(await LatestBlock.wait_for_block(0.01))
+
+    async def test_min_confirmations_wakes_on_block(self):
+        self.config.BU.get_transaction_heights.return_value = {"txn1": 10}
+        asyncio.ensure_future(self.new_block(12))
+        asyncio.ensure_future(self.new_block(13))
+        start = time.time()
+        results = await self.handler.wait_confirmations(["txn1"], 10, "3")
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(results, [{"txn_id": "txn1", "confirmations": 3}])
+
+    async def test_next_block_without_min_confirmations(self):
+        asyncio.ensure_future(self.new_block(12))
+        results = await self.handler.wait_confirmations(["txn1", "txn2"], 10, None)
+        self.assertEqual(
+            results,
+            [
+                {"txn_id": "txn1", "confirmations": 2},
+                {"txn_id": "txn2", "confirmations": 0},
+            ],
+        )
+
+    async def test_wait_capped(self):
+        wait_for_block = AsyncMock(return_value=False)
+        with mock.patch.object(
+            LatestBlock, "wait_for_block", new=wait_for_block
+        ), mock.patch("yadacoin.http.wallet.time") as clock:
+            # deadline, then one pass before and one after the wait
+            clock.time.side_effect = [1000, 1000, 1000 + 121]
+            results = await self.handler.wait_confirmations(["txn1"], 3600, "6")
+        wait_for_block.assert_called_once_with(120)
+        self.assertEqual(results, [{"txn_id": "txn1", "confirmations": 1}])
+
+    async def test_get_transaction_heights(self):
+        blocks = Blocks(
+            [
+                {"index": 10, "transactions": [{"id": "txn1"}, {"id": "other"}]},
+                {"index": 12, "transactions": [{"id": "txn1"}]},
+            ]
+        )
+        self.config.mongo = Mock()
+        self.config.mongo.async_db.blocks = blocks
+        heights = await BlockChainUtils().get_transaction_heights(["txn1", "txn2"])
+        self.assertEqual(heights, {"txn1": 12, "txn2": None})
+        # a single read for all the ids
+        self.assertEqual(
+            blocks.queries, [{"transactions.id": {"$in": ["txn1", "txn2"]}}]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main(argv=["first-arg-is-ignored"], exit=False)
@@ -0,0 +1,63 @@
+import unittest
+
+import yadacoin.core.config
+from yadacoin.core.config import Config
+from yadacoin.core.metrics import RPCMetrics
+from yadacoin.core.peer import Seed
+from yadacoin.tcpsocket.base import BaseRPC
+
+from ..test_setup import AsyncTestCase
+
+
+class RPC(BaseRPC):
+    rpc_role = "server"
+
+    async def getblocks(self, body, stream):
+        return
+
+    async def newblock(self, body, stream):
+        raise ValueError("bad block")
+
+
+class Stream:
+    def __init__(self, peer):
+        self.peer = peer
+
+
+class TestRPCMetrics(AsyncTestCase):
+    async def asyncSetUp(self):
+        yadacoin.core.config.CONFIG = Config.generate()
+        yadacoin.core.config.CONFIG.rpc_metrics = RPCMetrics()
+        self.rpc = RPC()
+
+    async def test_dispatch(self):
+        stream = Stream(Seed())
+        await self.rpc.dispatch("getblocks", {}, stream, 100)
+        await self.rpc.dispatch("getblocks", {}, stream, 50)
+        with self.assertRaises(ValueError):
+            await self.rpc.dispatch("newblock", {}, stream, 10)
+
+        rpc_metrics = self.rpc.config.rpc_metrics
+        getblocks = rpc_metrics.get("server", "getblocks", "Seed")
+        self.assertEqual(getblocks.messages_in, 2)
+        self.assertEqual(getblocks.bytes_in, 150)
+        self.assertEqual(getblocks.latency.count, 2)
+        self.assertEqual(rpc_metrics.get("server", "newblock", "Seed").errors, 1)
+
+        text = rpc_metrics.to_prometheus()
+        labels = 'role="server",method="getblocks",peer_type="Seed"'
+        self.assertIn(f"yadacoin_rpc_received_bytes_total{{{labels}}} 150", text)
+        self.assertIn(
+            f'yadacoin_rpc_handler_seconds_bucket{{{labels},le="+Inf"}} 2', text
+        )
+
+    async def test_unknown_method(self):
+        with self.assertRaises(AttributeError):
+            await self.rpc.dispatch("nosuchmethod", {}, Stream(Seed()), 10)
+        self.assertEqual(
+            self.rpc.config.rpc_metrics.get("server", "unknown", "Seed").errors, 1
+        )
+
+
+if __name__ == "__main__":
+    unittest.main(argv=["first-arg-is-ignored"], exit=False)
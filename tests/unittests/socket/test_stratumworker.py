@@ -0,0 +1,221 @@
+import asyncio
+import json
+import logging
+import time
+import unittest
+from unittest import mock
+from unittest.mock import AsyncMock, Mock
+
+from tornado.netutil import bind_sockets
+from tornado.tcpclient import TCPClient
+
+import yadacoin.core.config
+from yadacoin.core.block import Block
+from yadacoin.core.config import Config
+from yadacoin.tcpsocket.pool import StratumServer
+from yadacoin.tcpsocket.stratumworker import (
+    StratumWorkerClient,
+    StratumWorkerHub,
+    write_message,
+)
+
+from ..test_setup import AsyncTestCase
+
+JOB = {
+    "peer_id": "peer",
+    "job_id": "job",
+    "difficulty": 1000,
+    "target": "ffff",
+    "blob": "",
+    "seed_hash": "",
+    "height": 500000,
+    "extra_nonce": "",
+    "miner_diff": 1000,
+    "algo": "rx/yada",
+}
+
+
+class TestStratumWorkerHub(AsyncTestCase):
+    async def asyncSetUp(self):
+        config = Config.generate()
+        yadacoin.core.config.CONFIG = config
+        config.app_log = logging.getLogger("tornado.application")
+        config.max_miners = 1
+        config.stratum_worker_client = None
+        config.mongo = Mock()
+        config.mongo.async_db.pool_stats.update_one = AsyncMock()
+        config.LatestBlock = Mock()
+        config.LatestBlock.block.index = 499999
+        config.mp = Mock()
+        config.mp.block_factory = await self.template("a{nonce}")
+        config.mp.last_block_time = 100
+        config.mp.record_share = AsyncMock()
+        config.mp.process_nonce = AsyncMock(return_value=False)
+        config.mp.set_template = AsyncMock()
+        StratumServer.config = config
+        config.pool_server = StratumServer()
+        self.config = config
+
+        self.hub = StratumWorkerHub()
+        sockets = bind_sockets(0, "127.0.0.1")
+        self.hub.add_sockets(sockets)
+        config.stratum_ipc_port = sockets[0].getsockname()[1]
+        self.streams = []
+
+    async def asyncTearDown(self):
+        for stream in self.streams:
+            stream.close()
+        self.hub.stop()
+
+    async def template(self, header):
+        return await Block.init_async(
+            block_index=500000, block_time=time.time(), header=header, target=2**250
+        )
+
+    async def connect(self, worker_id):
+        stream = await TCPClient().connect("127.0.0.1", self.config.stratum_ipc_port)
+        self.streams.append(stream)
+        await write_message(stream, "connect", {"worker_id": worker_id})
+        return stream, await self.read(stream)
+
+    async def read(self, stream):
+        return json.loads(await stream.read_until(b"\n"))
+
+    async def until(self, condition):
+        for _ in range(200):
+            if condition():
+                return
+            await asyncio.sleep(0.01)
+        self.fail("condition not met")
+
+    async def test_round_trip(self):
+        stream, message = await self.connect(0)
+        self.assertEqual(message["method"], "template")
+        self.assertEqual(message["params"]["header"], "a{nonce}")
+        self.assertEqual(message["params"]["index"], 500000)
+        self.assertEqual(message["params"]["last_block_time"], 100)
+
+        share = {
+            "address": "1iNw3QHVs45woB9TmXL1XWHyKniTJhzC4.rig",
+            "index": 500000,
+            "hash": "00ff",
+            "nonce": "0000000100",
+            "weight": 1000,
+            "time": 1700000000,
+        }
+        await write_message(stream, "shares", {"shares": [share]})
+        await write_message(
+            stream,
+            "candidate",
+            {
+                "address": share["address"],
+                "nonce": "0000000200",
+                "job": JOB,
+                "header": "a{nonce}",
+            },
+        )
+        await self.until(lambda: self.config.mp.process_nonce.called)
+
+        (
+            miner,
+            index,
+            block_hash,
+            nonce,
+            weight,
+        ) = self.config.mp.record_share.call_args.args
+        self.assertEqual(miner.address_only, "1iNw3QHVs45woB9TmXL1XWHyKniTJhzC4")
+        self.assertEqual(
+            (index, block_hash, nonce, weight), (500000, "00ff", "0000000100", 1000)
+        )
+        args = self.config.mp.process_nonce.call_args
+        self.assertEqual(args.args[1], "0000000200")
+        self.assertEqual(args.args[2].index, 500000)
+        self.assertIs(args.kwargs["block_factory"], self.config.mp.block_factory)
+        self.assertEqual(args.kwargs["last_block_time"], 100)
+
+    async def test_worker_disconnect(self):
+        stream, _ = await self.connect(0)
+        other, _ = await self.connect(1)
+        await write_message(stream, "miner_count", {"miners": 1, "workers": 2})
+        await write_message(other, "miner_count", {"miners": 1, "workers": 1})
+        await self.until(lambda: self.hub.status()["workers"] == 3)
+
+        stream.close()
+        await self.until(lambda: 0 not in self.hub.streams)
+        self.assertEqual(
+            self.hub.status(), {"miners": 1, "workers": 1, "stratum_workers": 1}
+        )
+        self.config.mongo.async_db.pool_stats.update_one.assert_called_with(
+            {"stat": "miner_count"}, {"$set": {"value": 1}}, upsert=True
+        )
+
+    async def test_template_refresh_races_candidate(self):
+        stream, _ = await self.connect(0)
+        first = self.config.mp.block_factory
+        self.config.mp.block_factory = await self.template("b{nonce}")
+        self.config.mp.last_block_time = 200
+        await self.hub.template_checker()
+        message = await self.read(stream)
+        self.assertEqual(message["params"]["header"], "b{nonce}")
+
+        # found on the first template, sent after the refresh
+        candidate = {"address": "1iNw3QHVs45woB9TmXL1XWHyKniTJhzC4", "job": JOB}
+        await write_message(
+            stream, "candidate", {**candidate, "nonce": "01", "header": "a{nonce}"}
+        )
+        await self.until(lambda: self.config.mp.process_nonce.called)
+        args = self.config.mp.process_nonce.call_args
+        self.assertIs(args.kwargs["block_factory"], first)
+        self.assertEqual(args.kwargs["last_block_time"], 100)
+
+        await write_message(
+            stream, "candidate", {**candidate, "nonce": "02", "header": "c{nonce}"}
+        )
+        await write_message(
+            stream, "candidate", {**candidate, "nonce": "03", "header": "b{nonce}"}
+        )
+        await self.until(lambda: self.config.mp.process_nonce.call_count == 2)
+        args = self.config.mp.process_nonce.call_args
+        self.assertEqual(args.args[1], "03")
+        self.assertEqual(args.kwargs["last_block_time"], 200)
+
+    async def test_requests(self):
+        client = StratumWorkerClient(0)
+        with mock.patch.object(StratumServer, "block_checker", new=AsyncMock()):
+            await client.connect()
+        self.streams.append(client.stream)
+
+        async def request(method):
+            result, _ = await asyncio.gather(
+                client.request(method, {}), client.read_message()
+            )
+            return result
+
+        self.assertEqual(await request("getheight"), {"height": 499999})
+        # max_miners is 1 across every worker
+        self.assertTrue(await request("accepts_miner"))
+        self.assertTrue(await request("accepts_miner"))
+        self.assertFalse(await request("accepts_miner"))
+        with self.assertRaisesRegex(Exception, "Unknown request"):
+            await request("submit")
+
+    async def test_answered_by_node(self):
+        self.config.stratum_worker_client = Mock()
+        self.config.stratum_worker_client.request = AsyncMock(
+            side_effect=[{"height": 1}, {"balance": 2}, False]
+        )
+        server = StratumServer()
+        self.assertEqual(await server.getheight({}, None), {"height": 1})
+        self.assertEqual(await server.get_balance({}, None), {"balance": 2})
+        self.assertFalse(await StratumServer.accepts_miner())
+        self.assertEqual(
+            [
+                x.args[0]
+                for x in self.config.stratum_worker_client.request.call_args_list
+            ],
+            ["getheight", "get_balance", "accepts_miner"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main(argv=["first-arg-is-ignored"], exit=False)
@@ -10,7 +10,9 @@ import os
 import pkgutil
 import ssl
 import sys
+from time import perf_counter
 
+import_start = perf_counter()
 currentdir = os.path.dirname(os.path.realpath(__file__))
 parentdir = os.path.dirname(currentdir)
 sys.path.append(parentdir)
@@ -31,7 +33,6 @@ from traceback import format_exc
 import tornado.ioloop
 import tornado.locks
 import tornado.log
-from Crypto.PublicKey.ECC import EccKey
 from tornado.httpclient import AsyncHTTPClient
 from tornado.httpserver import HTTPServer
 from tornado.ioloop import PeriodicCallback
@@ -41,7 +42,6 @@ from tornado.web import Application, StaticFileHandler
 import yadacoin.core.blockchainutils
 import yadacoin.core.config
 import yadacoin.core.transactionutils
-from plugins.yadacoinpool import handlers
 from yadacoin import version
 from yadacoin.core.block import Block
 from yadacoin.core.blockchain import Blockchain
@@ -49,10 +49,11 @@ from yadacoin.core.chain import CHAIN
 from yadacoin.core.consensus import Consensus
 from yadacoin.core.crypt import Crypt
 from yadacoin.core.graphutils import GraphUtils
+from yadacoin.core.graphviews import GraphViews
 from yadacoin.core.health import Health
 from yadacoin.core.latestblock import LatestBlock
-from yadacoin.core.miningpool import MiningPool
-from yadacoin.core.miningpoolpayout import PoolPayer
+from yadacoin.core.loopmonitor import LoopMonitor
+from yadacoin.core.metrics import RPCMetrics, StartupTimer
 from yadacoin.core.mongo import Mongo
 from yadacoin.core.peer import (
     Group,
@@ -70,22 +71,13 @@ from yadacoin.core.processingqueue import (
     ProcessingQueues,
     TransactionProcessingQueueItem,
 )
-from yadacoin.core.smtp import Email
+from yadacoin.core.scheduler import Scheduler, SchedulerEvents
 from yadacoin.core.transaction import Transaction
 from yadacoin.enums.modes import MODES
 from yadacoin.enums.peertypes import PEER_TYPES
-from yadacoin.http.explorer import EXPLORER_HANDLERS
-from yadacoin.http.graph import GRAPH_HANDLERS
-from yadacoin.http.node import NODE_HANDLERS
-from yadacoin.http.pool import POOL_HANDLERS
-from yadacoin.http.product import PRODUCT_HANDLERS
-from yadacoin.http.wallet import WALLET_HANDLERS
-from yadacoin.http.web import WEB_HANDLERS
-from yadacoin.managers.docker import Docker
+from yadacoin.http.cache import ResponseCache
 from yadacoin.tcpsocket.node import NodeRPC, NodeSocketClient, NodeSocketServer
-from yadacoin.tcpsocket.pool import StratumServer
 from yadacoin.websocket.base import WEBSOCKET_HANDLERS, RCPWebSocketServer
-from yadacoin.websocket.peerjs import PEERJS_HANDLERS
 
 define("debug", default=False, help="debug mode", type=bool)
 define("verbose", default=False, help="verbose mode", type=bool)
@@ -132,9 +124,13 @@ from tornado.platform.asyncio import AsyncIOMainLoop
 
 class NodeApplication(Application):
     def __init__(self, test=False):
+        startup_timer = StartupTimer(import_start)
+        startup_timer.mark("import")
         options.parse_command_line(final=False)
         self.init_config(options)
         self.configure_logging()
+        self.config.startup_timer = startup_timer
+        startup_timer.mark("config")
         self.init_config_properties(test=test)
         if test:
             return
@@ -180,6 +176,8 @@ class NodeApplication(Application):
                 (r"/app/(.*)", StaticFileHandler, {"path": static_app_path}),
                 (r"/yadacoinstatic/(.*)", StaticFileHandler, {"path": static_path}),
             ]
+            from plugins.yadacoinpool import handlers
+
             self.default_handlers.extend(handlers.HANDLERS)
             self.init_websocket()
             self.init_webui()
@@ -187,6 +185,7 @@ class NodeApplication(Application):
             self.init_http()
             self.init_whitelist()
             self.init_jwt()
+        startup_timer.mark("listeners")
         self.init_ioloop()
 
     async def remove_peer(self, stream, reason=None):
@@ -279,12 +278,11 @@ class NodeApplication(Application):
             await self.config.mongo.async_db.node_status.update_many(
                 {}, {"$set": {"archived": True}}
             )
-            if (
-                Docker.is_inside_docker()
-                and hasattr(self.config, "docker_debug")
-                and self.config.docker_debug
-            ):
-                self.config.background_status.docker = Docker()
+            if getattr(self.config, "docker_debug", False):
+                from yadacoin.managers.docker import Docker
+
+                if Docker.is_inside_docker():
+                    self.config.background_status.docker = Docker()
         if self.config.background_status.busy:
             self.config.app_log.debug("background_status - busy")
             return
@@ -304,10 +302,8 @@ class NodeApplication(Application):
                     "num_messages": len(list(self.config.nodeClient.retry_messages))
                 },
             }
-            status["slow_queries"] = {
-                "count": len(self.config.mongo.async_db.slow_queries),
-                "detail": self.config.mongo.async_db.slow_queries,
-            }
+            status.update(self.config.mongo.telemetry.to_dict())
+            status["indexes"] = self.config.mongo.indexes.to_dict()
             status["transaction_tracker"] = {
                 "nodeServer": self.config.nodeServer.newtxn_tracker.to_dict(),
                 "nodeClient": self.config.nodeClient.newtxn_tracker.to_dict(),
@@ -316,11 +312,7 @@ class NodeApplication(Application):
                 "nodeServer": self.config.nodeServer.disconnect_tracker.to_dict(),
                 "nodeClient": self.config.nodeClient.disconnect_tracker.to_dict(),
             }
-            if (
-                Docker.is_inside_docker()
-                and hasattr(self.config, "docker_debug")
-                and self.config.docker_debug
-            ):
+            if hasattr(self.config.background_status, "docker"):
                 self.config.background_status.docker.set_container_stats()
                 status["docker"] = self.config.background_status.docker.to_dict()
 
@@ -384,17 +376,18 @@ class NodeApplication(Application):
         """
         self.config.app_log.debug("background_block_checker")
         if not hasattr(self.config, "background_block_checker"):
-            self.config.background_block_checker = WorkerVars(busy=False, last_send=0)
+            self.config.background_block_checker = WorkerVars(
+                busy=False,
+                last_send=0,
+                last_block_height=LatestBlock.block.index if LatestBlock.block else 0,
+            )
         if self.config.background_block_checker.busy:
             self.config.app_log.debug("background_block_checker - busy")
             return
         self.config.background_block_checker.busy = True
         try:
-            self.config.background_block_checker.last_block_height = 0
-            if LatestBlock.block:
-                self.config.background_block_checker.last_block_height = (
-                    LatestBlock.block.index
-                )
+            # the tip may have been moved by consensus before this run was woken up,
+            # so compare against the height this checker last announced
             await LatestBlock.block_checker()
             if (
                 self.config.background_block_checker.last_block_height
@@ -409,6 +402,9 @@ class NodeApplication(Application):
                         ).strftime("%Y-%m-%d %H:%M:%S"),
                     )
                 )
+                self.config.background_block_checker.last_block_height = (
+                    LatestBlock.block.index
+                )
                 await self.config.nodeShared.send_block_to_peers(
                     self.config.LatestBlock.block
                 )
@@ -507,6 +503,9 @@ class NodeApplication(Application):
                                 "background_message_sender - continue 2"
                             )
                             continue
+                        self.config.rpc_metrics.get(
+                            "server", x[1], peer_cls
+                        ).retries += 1
                         if len(x) > 3:
                             await self.config.nodeShared.write_result(
                                 self.config.nodeServer.inbound_streams[peer_cls][x[0]],
@@ -551,6 +550,9 @@ class NodeApplication(Application):
                             continue
                         if message.get("test"):
                             continue
+                        self.config.rpc_metrics.get(
+                            "client", x[1], peer_cls
+                        ).retries += 1
                         if len(x) > 3:
                             await self.config.nodeShared.write_result(
                                 self.config.nodeClient.outbound_streams[peer_cls][x[0]],
@@ -674,21 +676,9 @@ class NodeApplication(Application):
                 if x.endswith("_cache")
             ]
             self.cache_last_times = {}
-            try:
-                async for x in self.config.mongo.async_db.blocks.find(
-                    {"updated_at": {"$exists": False}}
-                ):
-                    await self.config.mongo.async_db.blocks.update_one(
-                        {"index": x["index"]}, {"$set": {"updated_at": time()}}
-                    )
-                for cache_collection in self.cache_collections:
-                    self.cache_last_times[cache_collection] = 0
-                    await self.config.mongo.async_db[cache_collection].delete_many(
-                        {"cache_time": {"$exists": False}}
-                    )
-                self.config.cache_inited = True
-            except Exception:
-                self.config.app_log.error(format_exc())
+            for cache_collection in self.cache_collections:
+                self.cache_last_times[cache_collection] = 0
+            self.config.cache_inited = True
         self.config.background_cache_validator.busy = False
 
         """
@@ -750,6 +740,23 @@ class NodeApplication(Application):
             self.config.app_log.error("error in background_cache_validator")
             self.config.app_log.error(format_exc())
 
+    async def background_graph_views(self):
+        """Responsible for routing the blocks stored before the graph views existed"""
+
+        self.config.app_log.debug("background_graph_views")
+        if not hasattr(self.config, "background_graph_views"):
+            self.config.background_graph_views = WorkerVars(busy=False)
+        if self.config.background_graph_views.busy:
+            self.config.app_log.debug("background_graph_views - busy")
+            return
+        self.config.background_graph_views.busy = True
+        try:
+            if not await self.config.graph_views.is_current():
+                await self.config.graph_views.catch_up()
+        except Exception:
+            self.config.app_log.error(format_exc())
+        self.config.background_graph_views.busy = False
+
     async def background_mempool_cleaner(self):
         """Responsible for removing failed transactions from the mempool"""
 
@@ -911,44 +918,50 @@ class NodeApplication(Application):
             ThreadPoolExecutor(max_workers=1)
         )
 
+        self.config.loop_monitor = LoopMonitor()
+        self.config.loop_monitor.start()
+        self.config.scheduler = Scheduler()
+        scheduler = self.config.scheduler
         if MODES.NODE.value in self.config.modes:
-            PeriodicCallback(
-                self.background_status, self.config.status_wait * 1000
-            ).start()
+            scheduler.add(self.background_status, self.config.status_wait)
 
-            PeriodicCallback(
-                self.background_block_checker, self.config.block_checker_wait * 1000
-            ).start()
+            scheduler.add(
+                self.background_block_checker,
+                self.config.block_checker_wait,
+                events=(SchedulerEvents.NEW_BLOCK,),
+            )
 
-            PeriodicCallback(
-                self.background_cache_validator, self.config.cache_validator_wait * 1000
-            ).start()
+            scheduler.add(
+                self.background_cache_validator, self.config.cache_validator_wait
+            )
 
-            PeriodicCallback(
-                self.background_mempool_cleaner, self.config.mempool_cleaner_wait * 1000
-            ).start()
+            scheduler.add(
+                self.background_mempool_cleaner, self.config.mempool_cleaner_wait
+            )
 
-            PeriodicCallback(
-                self.background_mempool_sender, self.config.mempool_sender_wait * 1000
-            ).start()
+            scheduler.add(self.background_graph_views, self.config.graph_views_wait)
 
-            PeriodicCallback(
+            scheduler.add(
+                self.background_mempool_sender, self.config.mempool_sender_wait
+            )
+
+            scheduler.add(
                 self.background_txn_queue_processor,
-                self.config.txn_queue_processor_wait * 1000,
-            ).start()
+                self.config.txn_queue_processor_wait,
+                events=(SchedulerEvents.TXN_QUEUED,),
+            )
 
-            PeriodicCallback(
+            scheduler.add(
                 self.background_block_queue_processor,
-                self.config.block_queue_processor_wait * 1000,
-            ).start()
+                self.config.block_queue_processor_wait,
+                events=(SchedulerEvents.BLOCK_QUEUED,),
+            )
 
-            PeriodicCallback(
-                self.background_peers, self.config.peers_wait * 1000
-            ).start()
+            scheduler.add(self.background_peers, self.config.peers_wait)
 
-            PeriodicCallback(
-                self.background_message_sender, self.config.message_sender_wait * 1000
-            ).start()
+            scheduler.add(
+                self.background_message_sender, self.config.message_sender_wait
+            )
 
             if self.config.peer_type in [
                 PEER_TYPES.SERVICE_PROVIDER.value,
@@ -956,24 +969,25 @@ class NodeApplication(Application):
                 PEER_TYPES.SEED.value,
                 PEER_TYPES.USER.value,
             ]:
-                PeriodicCallback(
+                scheduler.add(
                     self.background_transactions_combining,
-                    self.config.transactions_combining_wait * 1000,
-                ).start()
+                    self.config.transactions_combining_wait,
+                )
 
             if MODES.POOL.value in self.config.modes:
-                PeriodicCallback(
+                scheduler.add(
                     self.background_nonce_processor,
-                    self.config.nonce_processor_wait * 1000,
-                ).start()
+                    self.config.nonce_processor_wait,
+                    events=(SchedulerEvents.NONCE_QUEUED,),
+                )
 
         if self.config.pool_payout:
             self.config.app_log.info("PoolPayout activated")
+            from yadacoin.core.miningpoolpayout import PoolPayer
+
             self.config.pp = PoolPayer()
 
-            PeriodicCallback(
-                self.background_pool_payer, self.config.pool_payer_wait * 1000
-            ).start()
+            scheduler.add(self.background_pool_payer, self.config.pool_payer_wait)
 
         if (
             hasattr(self.config, "stress_test_newtxn")
@@ -987,10 +1001,14 @@ class NodeApplication(Application):
         ):
             PeriodicCallback(self.background_newblock_stress_test, 3000).start()
 
+        self.config.startup_timer.mark("background tasks")
+        self.config.startup_timer.log(self.config.app_log)
         while True:
             tornado.ioloop.IOLoop.current().start()
 
     def init_jwt(self):
+        from Crypto.PublicKey.ECC import EccKey
+
         jwt_key = EccKey(curve="p256", d=int(self.config.private_key, 16))
         self.config.jwt_secret_key = jwt_key.export_key(format="PEM")
         self.config.jwt_public_key = (
@@ -1036,6 +1054,15 @@ class NodeApplication(Application):
         self.default_handlers.extend(WEBSOCKET_HANDLERS)
 
     def init_webui(self):
+        # handler modules are only imported by nodes serving http
+        from yadacoin.http.explorer import EXPLORER_HANDLERS
+        from yadacoin.http.graph import GRAPH_HANDLERS
+        from yadacoin.http.node import NODE_HANDLERS
+        from yadacoin.http.pool import POOL_HANDLERS
+        from yadacoin.http.product import PRODUCT_HANDLERS
+        from yadacoin.http.wallet import WALLET_HANDLERS
+        from yadacoin.http.web import WEB_HANDLERS
+
         self.default_handlers.extend(NODE_HANDLERS)
         self.default_handlers.extend(GRAPH_HANDLERS)
         self.default_handlers.extend(EXPLORER_HANDLERS)
@@ -1047,6 +1074,8 @@ class NodeApplication(Application):
             hasattr(self.config, "activate_peerjs")
             and self.config.activate_peerjs == True
         ):
+            from yadacoin.websocket.peerjs import PEERJS_HANDLERS
+
             self.default_handlers.extend(PEERJS_HANDLERS)
 
     def init_plugins(self):
@@ -1120,9 +1149,15 @@ class NodeApplication(Application):
             self.config.https_server = HTTPServer(self, ssl_options=ssl_ctx)
             self.config.https_server.listen(self.config.ssl.port)
         if hasattr(self.config, "email") and self.config.email.is_valid():
+            from yadacoin.core.smtp import Email
+
             self.config.emailer = Email()
 
     def init_pool(self):
+        from yadacoin.core.miningpool import MiningPool
+        from yadacoin.tcpsocket.pool import StratumServer
+        from yadacoin.tcpsocket.stratumworker import StratumWorkerHub
+
         self.config.app_log.info(
             "Pool: {}:{}".format(self.config.peer_host, self.config.stratum_pool_port)
         )
@@ -1132,7 +1167,13 @@ class NodeApplication(Application):
         StratumServer.config.mp = tornado.ioloop.IOLoop.current().run_sync(
             MiningPool.init_async
         )
-        self.config.pool_server.listen(self.config.stratum_pool_port)
+        if self.config.stratum_workers:
+            # miners are served by worker processes sharing the stratum port
+            self.config.stratum_hub = StratumWorkerHub()
+            self.config.stratum_hub.listen(self.config.stratum_ipc_port, "127.0.0.1")
+            self.config.stratum_hub.start_workers(options.config)
+        else:
+            self.config.pool_server.listen(self.config.stratum_pool_port)
 
     def init_peer(self):
         self.config.peer = Peer.my_peer()
@@ -1146,11 +1187,16 @@ class NodeApplication(Application):
         self.config.TU = yadacoin.core.transactionutils.TU
         yadacoin.core.blockchainutils.set_BU(self.config.BU)  # To be removed
         self.config.GU = GraphUtils()
+        self.config.graph_views = GraphViews()
+        self.config.response_cache = ResponseCache()
+        self.config.rpc_metrics = RPCMetrics()
         self.config.LatestBlock = LatestBlock
         if test:
             return
         tornado.ioloop.IOLoop.current().run_sync(self.config.LatestBlock.block_checker)
+        self.config.startup_timer.mark("latest block")
         self.init_consensus()
+        self.config.startup_timer.mark("consensus")
         self.config.cipher = Crypt(self.config.wif)
         if MODES.NODE.value in self.config.modes:
             # self.config.pyrx = pyrx.PyRX()
@@ -8,7 +8,6 @@ from datetime import timedelta
 from decimal import Decimal, getcontext
 from logging import getLogger
 
-import pyrx
 from bitcoin.signmessage import BitcoinMessage, VerifyMessage
 from bitcoin.wallet import P2PKHBitcoinAddress
 from coincurve.utils import verify_signature
@@ -129,6 +128,7 @@ class Block(object):
         "txn_hashes",
         "merkle_root",
         "verify_merkle_root",
+        "merkle_tree",
         "hash",
         "public_key",
         "signature",
@@ -211,6 +211,7 @@ class Block(object):
         prev_hash=None,
         nonce=None,
         target=0,
+        merkle_tree=None,
     ):
         config = Config()
         if force_version is None:
@@ -327,6 +328,8 @@ class Block(object):
             public_key=public_key,
             target=target,
         )
+        # the tree of a previous template, for the pairs it shares with this one
+        block.merkle_tree = merkle_tree
         txn_hashes = block.get_transaction_hashes()
         block.set_merkle_root(txn_hashes)
         block.header = block.generate_header()
@@ -443,18 +446,29 @@ class Block(object):
         self.merkle_root = self.get_merkle_root(txn_hashes)
 
     def get_merkle_root(self, txn_hashes):
-        hashes = []
-        for i in range(0, len(txn_hashes), 2):
-            txn1 = txn_hashes[i]
-            try:
-                txn2 = txn_hashes[i + 1]
-            except:
-                txn2 = ""
-            hashes.append(hashlib.sha256((txn1 + txn2).encode("utf-8")).digest().hex())
-        if len(hashes) > 1:
-            return self.get_merkle_root(hashes)
-        else:
-            return hashes[0]
+        """Hashes pairs of hex hashes level by level, on their ascii bytes.
+        The levels are kept in merkle_tree, pairs already hashed there are reused"""
+        level = [x.encode() for x in txn_hashes]
+        tree = getattr(self, "merkle_tree", None)
+        if tree and tree[0] == level:
+            return tree[-1][0].decode()
+        known = {}
+        if tree:
+            for lower, upper in zip(tree, tree[1:]):
+                for i, parent in enumerate(upper):
+                    known[b"".join(lower[i * 2 : i * 2 + 2])] = parent
+        levels = [level]
+        while True:
+            pairs = [b"".join(level[i : i + 2]) for i in range(0, len(level), 2)]
+            level = [
+                known.get(pair) or binascii.hexlify(hashlib.sha256(pair).digest())
+                for pair in pairs
+            ]
+            levels.append(level)
+            if len(level) <= 1:
+                break
+        self.merkle_tree = levels
+        return level[0].decode()
 
     @classmethod
     async def from_dict(cls, block):
@@ -498,14 +512,21 @@ class Block(object):
             and len(txn.inputs) == 0
         )
 
-    def generate_hash_from_header(self, height, header, nonce):
+    @staticmethod
+    def get_pyrx():
         if not hasattr(Block, "pyrx"):
+            # the randomx extension is only loaded once a randomx hash is needed
+            import pyrx
+
             Block.pyrx = pyrx.PyRX()
+        return Block.pyrx
+
+    def generate_hash_from_header(self, height, header, nonce):
         seed_hash = binascii.unhexlify(
             "4181a493b397a733b083639334bc32b407915b9a82b7917ac361816f0a1f5d4d"
         )  # sha256(yadacoin65000)
         if height >= CHAIN.BLOCK_V5_FORK:
-            bh = Block.pyrx.get_rx_hash(
+            bh = Block.get_pyrx().get_rx_hash(
                 header.encode().replace(b"{nonce}", binascii.unhexlify(nonce)),
                 seed_hash,
                 height,
@@ -514,7 +535,7 @@ class Block(object):
             return hh
         elif height >= CHAIN.RANDOMX_FORK:
             header = header.format(nonce=nonce)
-            bh = Block.pyrx.get_rx_hash(header, seed_hash, height)
+            bh = Block.get_pyrx().get_rx_hash(header, seed_hash, height)
             hh = binascii.hexlify(bh).decode()
             return hh
         else:
@@ -680,7 +701,7 @@ class Block(object):
 
     def get_transaction_hashes(self):
         """Returns a sorted list of tx hash, so the merkle root is constant across nodes"""
-        return sorted([str(x.hash) for x in self.transactions], key=str.lower)
+        return sorted((str(x.hash) for x in self.transactions), key=str.lower)
 
     async def save(self):
         await self.verify()
@@ -739,3 +760,61 @@ class Block(object):
     def in_the_future(self):
         """Tells wether the block is too far away in the future"""
         return int(self.time) > time.time() + CHAIN.TIME_TOLERANCE
+
+
+class BlockCandidate(object):
+    """Share candidate built on top of a pool block template.
+    Only nonce, hash and signature differ from the template, everything else is read from it.
+    The template transactions are shared, a full Block is only built by materialize()"""
+
+    # Memory optimization
+    __slots__ = ("template", "nonce", "hash", "signature", "special_target")
+
+    def __init__(self, template: Block, nonce: str, block_hash: str):
+        self.template = template
+        self.nonce = nonce
+        self.hash = block_hash
+        self.signature = ""
+        self.special_target = template.special_target
+
+    @property
+    def version(self):
+        return self.template.version
+
+    @property
+    def time(self):
+        return self.template.time
+
+    @property
+    def index(self):
+        return self.template.index
+
+    @property
+    def target(self):
+        return self.template.target
+
+    @property
+    def special_min(self):
+        return self.template.special_min
+
+    @property
+    def header(self):
+        return self.template.header
+
+    @property
+    def transactions(self):
+        return self.template.transactions
+
+    def materialize(self):
+        """Returns a full Block for this candidate, without a json round trip or retarget"""
+        block = Block()
+        for slot in Block.__slots__:
+            if hasattr(self.template, slot):
+                setattr(block, slot, getattr(self.template, slot))
+        # new list, same Transaction objects
+        block.transactions = list(self.template.transactions)
+        block.nonce = self.nonce
+        block.hash = self.hash
+        block.signature = self.signature
+        block.special_target = self.special_target
+        return block
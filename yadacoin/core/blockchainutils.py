@@ -189,8 +189,220 @@ class BlockChainUtils(object):
         return (total_coinbase + total_received) - total_spent
 
     async def get_wallet_balance(self, address, amount_needed=None):
-        total_balance = await self.get_final_balance(address)
-        return total_balance
+        balances = await self.get_wallet_balances([address])
+        return balances[address]
+
+    async def get_transaction_heights(self, txn_ids):
+        """Height of the block holding each transaction id, None when not in a block.
+        One $in read on the transaction id index, projected down to the ids"""
+        heights = {txn_id: None for txn_id in txn_ids}
+        async for block in self.mongo.async_db.blocks.find(
+            {"transactions.id": {"$in": list(heights)}},
+            {"_id": 0, "index": 1, "transactions.id": 1},
+        ):
+            for txn in block.get("transactions", []):
+                txn_id = txn.get("id")
+                if txn_id in heights and (
+                    heights[txn_id] is None or block["index"] > heights[txn_id]
+                ):
+                    heights[txn_id] = block["index"]
+        return heights
+
+    async def get_reverse_public_keys(self, addresses):
+        """Public key of every address that ever sent to itself, None for the others"""
+        reverse_public_keys = {address: None for address in addresses}
+        async for x in self.mongo.async_db.reversed_public_keys.find(
+            {"address": {"$in": list(reverse_public_keys)}}
+        ):
+            reverse_public_keys[x["address"]] = x["public_key"]
+        missing = [
+            address
+            for address, public_key in reverse_public_keys.items()
+            if public_key is None
+        ]
+        if not missing:
+            return reverse_public_keys
+        pipeline = [
+            {"$match": {"transactions.outputs.to": {"$in": missing}}},
+            {"$unwind": "$transactions"},
+            {"$unwind": "$transactions.outputs"},
+            {"$match": {"transactions.outputs.to": {"$in": missing}}},
+            {
+                "$group": {
+                    "_id": "$transactions.outputs.to",
+                    "unique_public_keys": {"$addToSet": "$transactions.public_key"},
+                }
+            },
+        ]
+        async for x in self.mongo.async_db.blocks.aggregate(
+            pipeline, allowDiskUse=True, hint="__to"
+        ):
+            address = x["_id"]
+            for public_key in x["unique_public_keys"]:
+                xaddress = str(
+                    P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(public_key))
+                )
+                if xaddress == address:
+                    await self.mongo.async_db.reversed_public_keys.update_one(
+                        {"address": address, "public_key": public_key},
+                        {"$set": {"address": address, "public_key": public_key}},
+                        upsert=True,
+                    )
+                    reverse_public_keys[address] = public_key
+                    break
+        return reverse_public_keys
+
+    async def get_wallet_balances(self, addresses):
+        """Same balances as get_final_balance, for many addresses in two aggregates:
+        everything received by the addresses grouped by sender, and everything the
+        addresses spent to others grouped by recipient"""
+        addresses = list(set(addresses))
+        reverse_public_keys = await self.get_reverse_public_keys(addresses)
+        balances = {address: 0.0 for address in addresses}
+
+        received_pipeline = [
+            {"$match": {"transactions.outputs.to": {"$in": addresses}}},
+            {"$unwind": "$transactions"},
+            {"$unwind": "$transactions.outputs"},
+            {"$match": {"transactions.outputs.to": {"$in": addresses}}},
+            {
+                "$group": {
+                    "_id": {
+                        "to": "$transactions.outputs.to",
+                        "public_key": "$transactions.public_key",
+                        "coinbase": {
+                            "$eq": [
+                                {"$size": {"$ifNull": ["$transactions.inputs", []]}},
+                                0,
+                            ]
+                        },
+                    },
+                    "total": {"$sum": "$transactions.outputs.value"},
+                }
+            },
+        ]
+        async for x in self.mongo.async_db.blocks.aggregate(
+            received_pipeline, allowDiskUse=True, hint="__to"
+        ):
+            address = x["_id"]["to"]
+            if x["_id"].get("public_key") != reverse_public_keys[address]:
+                balances[address] += x["total"]
+            elif x["_id"]["coinbase"]:
+                balances[address] += x["total"]
+            # change sent back to the address is neither received nor spent
+
+        addresses_by_public_key = {
+            public_key: address
+            for address, public_key in reverse_public_keys.items()
+            if public_key
+        }
+        if not addresses_by_public_key:
+            return balances
+        public_keys = list(addresses_by_public_key)
+        spent_pipeline = [
+            {"$match": {"transactions.public_key": {"$in": public_keys}}},
+            {"$unwind": "$transactions"},
+            {
+                "$match": {
+                    "transactions.public_key": {"$in": public_keys},
+                    "transactions.inputs.0": {"$exists": True},
+                }
+            },
+            {"$unwind": "$transactions.outputs"},
+            {
+                "$group": {
+                    "_id": {
+                        "public_key": "$transactions.public_key",
+                        "to": "$transactions.outputs.to",
+                    },
+                    "total": {"$sum": "$transactions.outputs.value"},
+                }
+            },
+        ]
+        async for x in self.mongo.async_db.blocks.aggregate(
+            spent_pipeline, allowDiskUse=True
+        ):
+            address = addresses_by_public_key[x["_id"]["public_key"]]
+            if x["_id"].get("to") != address:
+                balances[address] -= x["total"]
+        return balances
+
+    async def get_wallet_unspent_outputs(self, addresses, inc_mempool=False):
+        """Unspent outputs of at least 1 to any of the addresses, one entry per
+        transaction and address, checked for spends in one aggregate"""
+        addresses = list(set(addresses))
+        reverse_public_keys = await self.get_reverse_public_keys(addresses)
+        pipeline = [
+            {
+                "$match": {
+                    "transactions.outputs.to": {"$in": addresses},
+                    "transactions.outputs.value": {"$gte": 1},
+                },
+            },
+            {"$unwind": "$transactions"},
+            {"$unwind": "$transactions.outputs"},
+            {
+                "$match": {
+                    "transactions.outputs.to": {"$in": addresses},
+                    "transactions.outputs.value": {"$gte": 1},
+                },
+            },
+            {
+                "$group": {
+                    "_id": {
+                        "id": "$transactions.id",
+                        "to": "$transactions.outputs.to",
+                    },
+                    "value": {"$sum": "$transactions.outputs.value"},
+                    "height": {"$first": "$index"},
+                }
+            },
+            {"$sort": {"height": 1}},
+        ]
+        outputs = [
+            {
+                "id": x["_id"]["id"],
+                "to": x["_id"]["to"],
+                "value": x["value"],
+                "height": x["height"],
+            }
+            async for x in self.mongo.async_db.blocks.aggregate(
+                pipeline, allowDiskUse=True, hint="__to"
+            )
+        ]
+        input_ids = list({x["id"] for x in outputs})
+        if not input_ids:
+            return outputs
+
+        spent = set()
+        spent_pipeline = [
+            {"$match": {"transactions.inputs.id": {"$in": input_ids}}},
+            {"$unwind": "$transactions"},
+            {"$unwind": "$transactions.inputs"},
+            {"$match": {"transactions.inputs.id": {"$in": input_ids}}},
+            {
+                "$project": {
+                    "_id": 0,
+                    "public_key": "$transactions.public_key",
+                    "id": "$transactions.inputs.id",
+                }
+            },
+        ]
+        async for x in self.mongo.async_db.blocks.aggregate(
+            spent_pipeline, allowDiskUse=True
+        ):
+            spent.add((x["public_key"], x["id"]))
+        if inc_mempool:
+            async for x in self.mongo.async_db.miner_transactions.find(
+                {"inputs.id": {"$in": input_ids}},
+                {"_id": 0, "public_key": 1, "inputs.id": 1},
+            ):
+                for txn_input in x.get("inputs", []):
+                    spent.add((x["public_key"], txn_input["id"]))
+
+        return [
+            x for x in outputs if (reverse_public_keys[x["to"]], x["id"]) not in spent
+        ]
 
     async def get_public_key_address_pairs(self, address):
         pipeline = [
@@ -106,11 +106,21 @@ class Config:
         self.peers = None
         self.BU = None
         self.GU = None
+        self.graph_views = None
+        self.response_cache = None
+        self.scheduler = None
+        self.loop_monitor = None
+        self.rpc_metrics = None
+        self.startup_timer = None
         self.SIO = None
         self.debug = False
         self.mp = None
         self.pp = None
         self.stratum_pool_port = config.get("stratum_pool_port", 3333)
+        self.stratum_workers = config.get("stratum_workers", 0)
+        self.stratum_ipc_port = config.get(
+            "stratum_ipc_port", self.stratum_pool_port + 1
+        )
         self.proxy_port = config.get("proxy_port", 8080)
         self.wallet_host_port = config.get(
             "wallet_host_port", "http://localhost:{}".format(config["serve_port"])
@@ -153,12 +163,18 @@ class Config:
         self.pool_payer_wait = config.get("pool_payer_wait", 120)
         self.cache_validator_wait = config.get("cache_validator_wait", 3600)
         self.mempool_cleaner_wait = config.get("mempool_cleaner_wait", 1200)
+        self.graph_views_wait = config.get("graph_views_wait", 10)
         self.mempool_sender_wait = config.get("mempool_sender_wait", 180)
         self.nonce_processor_wait = config.get("nonce_processor_wait", 1)
 
         self.mongo_query_timeout = config.get("mongo_query_timeout", 30000)
         self.http_request_timeout = config.get("http_request_timeout", 3000)
-
+        self.http_cache_entries = config.get("http_cache_entries", 1000)
+        self.http_cache_bytes = config.get("http_cache_bytes", 16 * 1024 * 1024)
+        self.loop_lag_threshold = config.get("loop_lag_threshold", 1)
+        self.slow_query_threshold = config.get("slow_query_threshold", 3)
+        self.slow_query_buffer = config.get("slow_query_buffer", 100)
+        self.explain_interval = config.get("explain_interval", 600)
         self.masternode_fee_minimum = config.get("masternode_fee_minimum", 1)
 
         for key, val in config.items():
@@ -220,6 +236,12 @@ class Config:
             "uptime": "{:d}:{:02d}:{:02d}".format(h, m, s),
             "height": self.LatestBlock.block.index,
         }
+        if self.loop_monitor:
+            status["event_loop"] = self.loop_monitor.to_dict()
+        if self.scheduler:
+            status["background_tasks"] = self.scheduler.to_dict()
+        if self.startup_timer:
+            status["startup"] = self.startup_timer.to_dict()
         return status
 
     def get_identity(self):
@@ -435,12 +457,18 @@ class Config:
         cls.pool_payer_wait = config.get("pool_payer_wait", 120)
         cls.cache_validator_wait = config.get("cache_validator_wait", 3600)
         cls.mempool_cleaner_wait = config.get("mempool_cleaner_wait", 1200)
+        cls.graph_views_wait = config.get("graph_views_wait", 10)
         cls.mempool_sender_wait = config.get("mempool_sender_wait", 180)
         cls.nonce_processor_wait = config.get("nonce_processor_wait", 1)
 
         cls.mongo_query_timeout = config.get("mongo_query_timeout", 3000)
         cls.http_request_timeout = config.get("http_request_timeout", 3000)
-
+        cls.http_cache_entries = config.get("http_cache_entries", 1000)
+        cls.http_cache_bytes = config.get("http_cache_bytes", 16 * 1024 * 1024)
+        cls.loop_lag_threshold = config.get("loop_lag_threshold", 1)
+        cls.slow_query_threshold = config.get("slow_query_threshold", 3)
+        cls.slow_query_buffer = config.get("slow_query_buffer", 100)
+        cls.explain_interval = config.get("explain_interval", 600)
         cls.masternode_fee_minimum = config.get("masternode_fee_minimum", 1)
 
     @staticmethod
@@ -575,6 +603,8 @@ class Config:
             "skynet_api_key": self.skynet_api_key,
             "web_jwt_expiry": self.web_jwt_expiry,
             "stratum_pool_port": self.stratum_pool_port,
+            "stratum_workers": self.stratum_workers,
+            "stratum_ipc_port": self.stratum_ipc_port,
             "proxy_port": self.proxy_port,
             "dns_resolvers": self.dns_resolvers,
             "dns_bypass_ips": self.dns_bypass_ips,
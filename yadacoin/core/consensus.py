@@ -309,7 +309,8 @@ class Consensus(object):
                 return await self.search_network_for_new()
 
     async def search_network_for_new(self):
-        if self.config.network == "regnet":
+        # a regnet only syncs from the seeds in its config
+        if self.config.network == "regnet" and not getattr(self.config, "seeds", None):
             return False
 
         if self.syncing:
@@ -537,6 +538,12 @@ class Consensus(object):
 
             await self.config.LatestBlock.update_latest_block()
 
+            if self.config.graph_views:
+                try:
+                    await self.config.graph_views.on_block_inserted(db_block)
+                except Exception:
+                    self.app_log.warning("{}".format(format_exc()))
+
             self.app_log.info("New block inserted for height: {}".format(block.index))
 
             if self.config.mp:
@@ -554,6 +561,4 @@ class Consensus(object):
 
             return True
         except Exception:
-            from traceback import format_exc
-
             self.app_log.warning("{}".format(format_exc()))
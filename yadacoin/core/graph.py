@@ -91,22 +91,24 @@ class Graph(object):
                 upsert=True,
             )
 
-    def get_lookup_rids(self):
+    async def get_lookup_rids(self):
         lookup_rids = [
             self.rid,
         ]
-        lookup_rids.extend([x["rid"] for x in GU().get_friend_requests(self.rid)])
-        lookup_rids.extend([x["rid"] for x in GU().get_sent_friend_requests(self.rid)])
+        lookup_rids.extend([x["rid"] async for x in GU().get_friend_requests(self.rid)])
+        lookup_rids.extend(
+            [x["rid"] async for x in GU().get_sent_friend_requests(self.rid)]
+        )
         return list(set(lookup_rids))
 
-    def get_request_rids_for_rid(self):
+    async def get_request_rids_for_rid(self):
         lookup_rids = {}
-        for x in GU().get_friend_requests(self.rid):
+        async for x in GU().get_friend_requests(self.rid):
             if x["rid"] not in lookup_rids:
                 lookup_rids[x["rid"]] = []
             lookup_rids[x["rid"]].append(x["requester_rid"])
 
-        for x in GU().get_sent_friend_requests(self.rid):
+        async for x in GU().get_sent_friend_requests(self.rid):
             if x["rid"] not in lookup_rids:
                 lookup_rids[x["rid"]] = []
             lookup_rids[x["rid"]].append(x["requested_rid"])
@@ -130,7 +132,7 @@ class Graph(object):
 
     async def get_friend_requests(self, search_rid):
         self.friend_requests = []
-        self.friend_requests += [x for x in GU().get_friend_requests(search_rid)]
+        self.friend_requests += [x async for x in GU().get_friend_requests(search_rid)]
 
         res = await self.config.mongo.async_db.miner_transactions.find(
             {
@@ -147,7 +149,7 @@ class Graph(object):
     async def get_sent_friend_requests(self, search_rid):
         self.sent_friend_requests = []
         self.sent_friend_requests += [
-            x for x in GU().get_sent_friend_requests(search_rid)
+            x async for x in GU().get_sent_friend_requests(search_rid)
         ]
 
         res = await self.config.mongo.async_db.miner_transactions.find(
@@ -164,7 +166,7 @@ class Graph(object):
 
     async def get_messages(self, not_mine=False):
         if self.wallet_mode:
-            for transaction in self.mongo.db.miner_transactions.find(
+            async for transaction in self.mongo.async_db.miner_transactions.find(
                 {"relationship": {"$ne": ""}}
             ):
                 try:
@@ -183,7 +185,7 @@ class Graph(object):
             )
             self.messages = []
             used_ids = []
-            for x in rid_transactions:
+            async for x in rid_transactions:
                 if x.get("id") not in used_ids and x["rid"] and x["relationship"]:
                     self.messages.append(x)
                     used_ids.append(x.get("id"))
@@ -194,7 +196,7 @@ class Graph(object):
                         messages.append(x)
                 self.messages = messages
         else:
-            rids = self.get_lookup_rids() + self.rids
+            rids = await self.get_lookup_rids() + self.rids
             self.messages = [x async for x in GU().get_collection(rids)]
         res = await self.config.mongo.async_db.miner_transactions.find(
             {
@@ -213,7 +215,7 @@ class Graph(object):
 
     async def get_sent_messages(self, not_mine=False):
         if self.wallet_mode:
-            for transaction in self.mongo.db.miner_transactions.find(
+            async for transaction in self.mongo.async_db.miner_transactions.find(
                 {"relationship": {"$ne": ""}}
             ):
                 try:
@@ -232,7 +234,7 @@ class Graph(object):
             )
             self.messages = []
             used_ids = []
-            for x in rid_transactions:
+            async for x in rid_transactions:
                 if x.get("id") not in used_ids and x["rid"] and x["relationship"]:
                     self.messages.append(x)
                     used_ids.append(x.get("id"))
@@ -271,31 +273,34 @@ class Graph(object):
                 self.new_messages.append(message)
                 used_rids.append(message["rid"])
 
-    def get_group_messages(self):
+    async def get_group_messages(self):
         if self.wallet_mode:
-            self.rid_transactions = GU().get_transactions_by_rid(
-                self.rids,
-                username_signature=self.config.username_signature,
-                rid=True,
-                raw=True,
-                returnheight=True,
-            )
+            self.rid_transactions = [
+                x
+                async for x in GU().get_transactions_by_rid(
+                    self.rids,
+                    username_signature=self.config.username_signature,
+                    rid=True,
+                    raw=True,
+                    returnheight=True,
+                )
+            ]
         else:
             my_username_signature = self.config.username_signature
             posts = []
             blocked = [
                 x["username"]
-                for x in self.mongo.db.blocked_users.find(
+                async for x in self.mongo.async_db.blocked_users.find(
                     {"username_signature": self.username_signature}
                 )
             ]
             flagged = [
                 x["id"]
-                for x in self.mongo.db.flagged_content.find(
+                async for x in self.mongo.async_db.flagged_content.find(
                     {"username_signature": self.username_signature}
                 )
             ]
-            for x in GU().get_posts(self.rid):
+            async for x in GU().get_posts(self.rid):
                 rids = sorted(
                     [str(my_username_signature), str(x.get("username_signature"))],
                     key=str.lower,
@@ -320,13 +325,13 @@ class Graph(object):
         comments = []
         blocked = [
             x["username"]
-            for x in self.mongo.db.blocked_users.find(
+            async for x in self.mongo.async_db.blocked_users.find(
                 {"username_signature": self.username_signature}
             )
         ]
         flagged = [
             x["id"]
-            for x in self.mongo.db.flagged_content.find(
+            async for x in self.mongo.async_db.flagged_content.find(
                 {"username_signature": self.username_signature}
             )
         ]
@@ -334,7 +339,7 @@ class Graph(object):
         if not self.ids:
             return json.dumps({})
         used_ids = []
-        for x in GU().get_comments(self.rid, self.ids):
+        async for x in GU().get_comments(self.rid, self.ids):
             if x["relationship"].get("id") not in out:
                 out[x["relationship"].get("id")] = []
 
@@ -369,20 +374,20 @@ class Graph(object):
         reacts = []
         blocked = [
             x["username"]
-            for x in self.mongo.db.blocked_users.find(
+            async for x in self.mongo.async_db.blocked_users.find(
                 {"username_signature": self.username_signature}
             )
         ]
         flagged = [
             x["id"]
-            for x in self.mongo.db.flagged_content.find(
+            async for x in self.mongo.async_db.flagged_content.find(
                 {"username_signature": self.username_signature}
             )
         ]
         out = {}
         if not self.ids:
             return json.dumps({})
-        for x in GU().get_reacts(self.rid, self.ids):
+        async for x in GU().get_reacts(self.rid, self.ids):
             if x["relationship"].get("id") not in out:
                 out[x["relationship"].get("id")] = []
 
@@ -109,58 +109,69 @@ class GraphUtils(object):
             queryType="searchRid",
         )
 
-    def get_posts(self, rids):
-        from yadacoin.core.crypt import Crypt
-
-        if not isinstance(rids, list):
-            rids = [
-                rids,
-            ]
-
-        posts_cache = self.mongo.db.posts_cache.find({"rid": {"$in": rids}}).sort(
-            [("height", -1)]
+    async def views_current(self):
+        return (
+            bool(self.config.graph_views) and await self.config.graph_views.is_current()
         )
 
-        latest_block = self.config.LatestBlock.block
-
-        if posts_cache.count_documents():
-            posts_cache = posts_cache[0]
-            block_height = posts_cache["height"]
+    async def get_relationship_transactions(self, block_height):
+        """Relationship transactions without rid above block_height, then the fastgraph ones"""
+        if await self.views_current():
+            transactions = self.mongo.async_db.relationship_transactions_cache.find(
+                {"height": {"$gt": block_height}}, {"_id": 0, "txn": 1, "height": 1}
+            ).sort([("height", 1)])
         else:
-            block_height = 0
-        transactions = self.mongo.db.blocks.aggregate(
-            [
-                {"$match": {"index": {"$gt": block_height}}},
-                {
-                    "$match": {
-                        "transactions": {"$elemMatch": {"relationship": {"$ne": ""}}},
-                        "transactions.dh_public_key": "",
-                        "transactions.rid": "",
-                    }
-                },
-                {"$unwind": "$transactions"},
-                {"$project": {"_id": 0, "txn": "$transactions", "height": "$index"}},
-                {
-                    "$match": {
-                        "txn.relationship": {"$ne": ""},
-                        "txn.dh_public_key": "",
-                        "txn.rid": "",
-                    }
-                },
-                {"$sort": {"height": 1}},
-            ]
-        )
+            transactions = self.mongo.async_db.blocks.aggregate(
+                [
+                    {"$match": {"index": {"$gt": block_height}}},
+                    {
+                        "$match": {
+                            "transactions": {
+                                "$elemMatch": {"relationship": {"$ne": ""}}
+                            },
+                            "transactions.dh_public_key": "",
+                            "transactions.rid": "",
+                        }
+                    },
+                    {"$unwind": "$transactions"},
+                    {
+                        "$project": {
+                            "_id": 0,
+                            "txn": "$transactions",
+                            "height": "$index",
+                        }
+                    },
+                    {
+                        "$match": {
+                            "txn.relationship": {"$ne": ""},
+                            "txn.dh_public_key": "",
+                            "txn.rid": "",
+                        }
+                    },
+                    {"$sort": {"height": 1}},
+                ]
+            )
+        async for x in transactions:
+            yield x
 
-        fastgraph_transactions = self.mongo.db.fastgraph_transactions.find(
-            {"txn.relationship": {"$ne": ""}, "txn.dh_public_key": "", "txn.rid": ""}
-        )
+        async for x in self.mongo.async_db.fastgraph_transactions.find(
+            {"txn.relationship": {"$ne": ""}, "txn.dh_public_key": "", "txn.rid": ""},
+            {"_id": 0},
+        ):
+            yield x
+
+    async def cache_relationship_transactions(self, cache, rids, data_key):
+        """Decrypts the relationship transactions not cached yet for rids and stores them in cache,
+        returns the height the cache was up to before"""
+        cached = await cache.find_one({"rid": {"$in": rids}}, sort=[("height", -1)])
+        block_height = cached["height"] if cached else 0
+        latest_block = self.config.LatestBlock.block
 
-        transactions = [x for x in transactions] + [x for x in fastgraph_transactions]
         # transactions are all posts not yet cached by this rid
         # so we want to grab all bulletin secrets for this rid
-        mutual_username_signatures = self.get_mutual_username_signatures(rids)
+        mutual_username_signatures = await self.get_mutual_username_signatures(rids)
         friends = []
-        for friend in self.get_transactions_by_rid(
+        async for friend in self.get_transactions_by_rid(
             rids, self.config.username_signature, rid=True
         ):
             if "their_username_signature" in friend["relationship"]:
@@ -170,49 +181,19 @@ class GraphUtils(object):
 
         if friends:
             mutual_username_signatures.extend(friends)
-            for i, x in enumerate(transactions):
-                res = self.mongo.db.posts_cache.find_one(
-                    {"rid": {"$in": rids}, "id": x["txn"]["id"]}
-                )
+            async for x in self.get_relationship_transactions(block_height):
+                res = await cache.find_one({"rid": {"$in": rids}, "id": x["txn"]["id"]})
                 if res:
                     continue
                 for bs in mutual_username_signatures:
                     try:
                         crypt = Crypt(bs)
                         decrypted = crypt.decrypt(x["txn"]["relationship"])
-                        try:
-                            decrypted = base64.b64decode(decrypted)
-                        except:
-                            raise
+                        decrypted = base64.b64decode(decrypted)
                         data = json.loads(decrypted.decode("utf-8"))
-                        x["txn"]["relationship"] = data
-                        if "postText" in data:
-                            had_txns = True
-                            self.app_log.debug(
-                                "caching posts at height: {}".format(x.get("height", 0))
-                            )
-                            for rid in rids:
-                                self.mongo.db.posts_cache.update(
-                                    {
-                                        "rid": rid,
-                                        "height": x.get("height", 0),
-                                        "id": x["txn"]["id"],
-                                        "username_signature": bs,
-                                    },
-                                    {
-                                        "rid": rid,
-                                        "height": x.get("height", 0),
-                                        "id": x["txn"]["id"],
-                                        "txn": x["txn"],
-                                        "username_signature": bs,
-                                        "success": True,
-                                        "cache_time": time(),
-                                    },
-                                    upsert=True,
-                                )
                     except Exception as e:
                         for rid in rids:
-                            self.mongo.db.posts_cache.update(
+                            await cache.replace_one(
                                 {
                                     "rid": rid,
                                     "height": x.get("height", 0),
@@ -231,9 +212,38 @@ class GraphUtils(object):
                                 upsert=True,
                             )
                         self.app_log.debug(e)
+                        continue
+                    x["txn"]["relationship"] = data
+                    if data_key in data:
+                        had_txns = True
+                        self.app_log.debug(
+                            "caching {} at height: {}".format(
+                                cache.name, x.get("height", 0)
+                            )
+                        )
+                        for rid in rids:
+                            await cache.replace_one(
+                                {
+                                    "rid": rid,
+                                    "height": x.get("height", 0),
+                                    "id": x["txn"]["id"],
+                                    "username_signature": bs,
+                                },
+                                {
+                                    "rid": rid,
+                                    "height": x.get("height", 0),
+                                    "id": x["txn"]["id"],
+                                    "txn": x["txn"],
+                                    "username_signature": bs,
+                                    "success": True,
+                                    "cache_time": time(),
+                                },
+                                upsert=True,
+                            )
+                    break
         if not had_txns:
             for rid in rids:
-                self.mongo.db.posts_cache.insert(
+                await cache.insert_one(
                     {
                         "rid": rid,
                         "height": latest_block.index,
@@ -241,9 +251,20 @@ class GraphUtils(object):
                         "cache_time": time(),
                     }
                 )
+        return block_height
+
+    async def get_posts(self, rids):
+        if not isinstance(rids, list):
+            rids = [
+                rids,
+            ]
+
+        block_height = await self.cache_relationship_transactions(
+            self.mongo.async_db.posts_cache, rids, "postText"
+        )
 
         i = 1
-        for x in self.mongo.db.fastgraph_transaction_cache.find(
+        async for x in self.mongo.async_db.fastgraph_transaction_cache.find(
             {"txn.dh_public_key": "", "txn.relationship": {"$ne": ""}, "txn.rid": ""}
         ):
             if "txn" in x:
@@ -251,7 +272,7 @@ class GraphUtils(object):
                 yield x["txn"]
             i += 1
 
-        for x in self.mongo.db.posts_cache.find(
+        async for x in self.mongo.async_db.posts_cache.find(
             {"rid": {"$in": rids}, "success": True}
         ):
             if "txn" in x:
@@ -259,141 +280,17 @@ class GraphUtils(object):
                 x["txn"]["username_signature"] = x["username_signature"]
                 yield x["txn"]
 
-    def get_reacts(self, rids, ids):
-        from yadacoin.core.crypt import Crypt
-
+    async def get_reacts(self, rids, ids):
         if not isinstance(rids, list):
             rids = [
                 rids,
             ]
 
-        reacts_cache = self.mongo.db.reacts_cache.find({"rids": {"$in": rids}}).sort(
-            [("height", -1)]
-        )
-
-        latest_block = self.config.LatestBlock.block
-
-        if reacts_cache.count_documents():
-            reacts_cache = reacts_cache[0]
-            block_height = reacts_cache["height"]
-        else:
-            block_height = 0
-        transactions = self.mongo.db.blocks.aggregate(
-            [
-                {"$match": {"index": {"$gt": block_height}}},
-                {
-                    "$match": {
-                        "transactions": {"$elemMatch": {"relationship": {"$ne": ""}}},
-                        "transactions.dh_public_key": "",
-                        "transactions.rid": "",
-                    }
-                },
-                {"$unwind": "$transactions"},
-                {"$project": {"_id": 0, "txn": "$transactions", "height": "$index"}},
-                {
-                    "$match": {
-                        "txn.relationship": {"$ne": ""},
-                        "txn.dh_public_key": "",
-                        "txn.rid": "",
-                    }
-                },
-                {"$sort": {"height": 1}},
-            ]
-        )
-
-        fastgraph_transactions = self.mongo.db.fastgraph_transactions.find(
-            {"txn.relationship": {"$ne": ""}, "txn.dh_public_key": "", "txn.rid": ""}
+        await self.cache_relationship_transactions(
+            self.mongo.async_db.reacts_cache, rids, "react"
         )
 
-        transactions = [x for x in transactions] + [x for x in fastgraph_transactions]
-        # transactions are all posts not yet cached by this rid
-        # so we want to grab all bulletin secrets for this rid
-        mutual_username_signatures = self.get_mutual_username_signatures(rids)
-        friends = []
-        for friend in self.get_transactions_by_rid(
-            rids, self.config.username_signature, rid=True
-        ):
-            if "their_username_signature" in friend["relationship"]:
-                friends.append(friend["relationship"]["their_username_signature"])
-        friends = list(set(friends))
-        had_txns = False
-
-        if friends:
-            mutual_username_signatures.extend(friends)
-            for i, x in enumerate(transactions):
-                res = self.mongo.db.reacts_cache.find_one(
-                    {"rid": {"$in": rids}, "id": x["txn"]["id"]}
-                )
-                if res:
-                    continue
-                for bs in mutual_username_signatures:
-                    try:
-                        crypt = Crypt(bs)
-                        decrypted = crypt.decrypt(x["txn"]["relationship"])
-                        try:
-                            decrypted = base64.b64decode(decrypted)
-                        except:
-                            raise
-                        data = json.loads(decrypted.decode("utf-8"))
-                        x["txn"]["relationship"] = data
-                        if "react" in data:
-                            had_txns = True
-                            self.app_log.debug(
-                                "caching reacts at height: {}".format(
-                                    x.get("height", 0)
-                                )
-                            )
-                            for rid in rids:
-                                self.mongo.db.reacts_cache.update(
-                                    {
-                                        "rid": rid,
-                                        "height": x.get("height", 0),
-                                        "id": x["txn"]["id"],
-                                        "username_signature": bs,
-                                    },
-                                    {
-                                        "rid": rid,
-                                        "height": x.get("height", 0),
-                                        "id": x["txn"]["id"],
-                                        "txn": x["txn"],
-                                        "username_signature": bs,
-                                        "success": True,
-                                        "cache_time": time(),
-                                    },
-                                    upsert=True,
-                                )
-                    except:
-                        for rid in rids:
-                            self.mongo.db.reacts_cache.update(
-                                {
-                                    "rid": rid,
-                                    "height": x.get("height", 0),
-                                    "id": x["txn"]["id"],
-                                    "username_signature": bs,
-                                },
-                                {
-                                    "rid": rid,
-                                    "height": x.get("height", 0),
-                                    "id": x["txn"]["id"],
-                                    "txn": x["txn"],
-                                    "username_signature": bs,
-                                    "success": False,
-                                    "cache_time": time(),
-                                },
-                                upsert=True,
-                            )
-        if not had_txns:
-            for rid in rids:
-                self.mongo.db.reacts_cache.insert(
-                    {
-                        "rid": rid,
-                        "height": latest_block.index,
-                        "success": False,
-                        "cache_time": time(),
-                    }
-                )
-
-        for x in self.mongo.db.reacts_cache.find(
+        async for x in self.mongo.async_db.reacts_cache.find(
             {"txn.relationship.id": {"$in": ids}, "success": True}
         ):
             if "txn" in x and "id" in x["txn"]["relationship"]:
@@ -401,141 +298,17 @@ class GraphUtils(object):
                 x["txn"]["username_signature"] = x["username_signature"]
                 yield x["txn"]
 
-    def get_comments(self, rids, ids):
-        from yadacoin.core.crypt import Crypt
-
+    async def get_comments(self, rids, ids):
         if not isinstance(rids, list):
             rids = [
                 rids,
             ]
 
-        comments_cache = self.mongo.db.comments_cache.find(
-            {"rids": {"$in": rids}}
-        ).sort([("height", -1)])
-
-        latest_block = self.config.LatestBlock.block
-
-        if comments_cache.count_documents():
-            comments_cache = comments_cache[0]
-            block_height = comments_cache["height"]
-        else:
-            block_height = 0
-        transactions = self.mongo.db.blocks.aggregate(
-            [
-                {"$match": {"index": {"$gt": block_height}}},
-                {
-                    "$match": {
-                        "transactions": {"$elemMatch": {"relationship": {"$ne": ""}}},
-                        "transactions.dh_public_key": "",
-                        "transactions.rid": "",
-                    }
-                },
-                {"$unwind": "$transactions"},
-                {"$project": {"_id": 0, "txn": "$transactions", "height": "$index"}},
-                {
-                    "$match": {
-                        "txn.relationship": {"$ne": ""},
-                        "txn.dh_public_key": "",
-                        "txn.rid": "",
-                    }
-                },
-                {"$sort": {"height": 1}},
-            ]
-        )
-
-        fastgraph_transactions = self.mongo.db.fastgraph_transactions.find(
-            {"txn.relationship": {"$ne": ""}, "txn.dh_public_key": "", "txn.rid": ""}
+        await self.cache_relationship_transactions(
+            self.mongo.async_db.comments_cache, rids, "comment"
         )
 
-        transactions = [x for x in transactions] + [x for x in fastgraph_transactions]
-        # transactions are all posts not yet cached by this rid
-        # so we want to grab all bulletin secrets for this rid
-        mutual_username_signatures = self.get_mutual_username_signatures(rids)
-        friends = []
-        for friend in self.get_transactions_by_rid(
-            rids, self.config.username_signature, rid=True
-        ):
-            if "their_username_signature" in friend["relationship"]:
-                friends.append(friend["relationship"]["their_username_signature"])
-        friends = list(set(friends))
-        had_txns = False
-
-        if friends:
-            mutual_username_signatures.extend(friends)
-            for i, x in enumerate(transactions):
-                res = self.mongo.db.comments_cache.find_one(
-                    {"rid": {"$in": rids}, "id": x["txn"]["id"]}
-                )
-                if res:
-                    continue
-                for bs in mutual_username_signatures:
-                    try:
-                        crypt = Crypt(bs)
-                        decrypted = crypt.decrypt(x["txn"]["relationship"])
-                        try:
-                            decrypted = base64.b64decode(decrypted)
-                        except:
-                            raise
-                        data = json.loads(decrypted.decode("utf-8"))
-                        x["txn"]["relationship"] = data
-                        if "comment" in data:
-                            had_txns = True
-                            self.app_log.debug(
-                                "caching comments at height: {}".format(
-                                    x.get("height", 0)
-                                )
-                            )
-                            for rid in rids:
-                                self.mongo.db.comments_cache.update(
-                                    {
-                                        "rid": rid,
-                                        "height": x.get("height", 0),
-                                        "id": x["txn"]["id"],
-                                        "username_signature": bs,
-                                    },
-                                    {
-                                        "rid": rid,
-                                        "height": x.get("height", 0),
-                                        "id": x["txn"]["id"],
-                                        "txn": x["txn"],
-                                        "username_signature": bs,
-                                        "success": True,
-                                        "cache_time": time(),
-                                    },
-                                    upsert=True,
-                                )
-                    except:
-                        for rid in rids:
-                            self.mongo.db.comments_cache.update(
-                                {
-                                    "rid": rid,
-                                    "height": x.get("height", 0),
-                                    "id": x["txn"]["id"],
-                                    "username_signature": bs,
-                                },
-                                {
-                                    "rid": rid,
-                                    "height": x.get("height", 0),
-                                    "id": x["txn"]["id"],
-                                    "txn": x["txn"],
-                                    "username_signature": bs,
-                                    "success": False,
-                                    "cache_time": time(),
-                                },
-                                upsert=True,
-                            )
-        if not had_txns:
-            for rid in rids:
-                self.mongo.db.comments_cache.insert(
-                    {
-                        "rid": rid,
-                        "height": latest_block.index,
-                        "success": False,
-                        "cache_time": time(),
-                    }
-                )
-
-        for x in self.mongo.db.comments_cache.find(
+        async for x in self.mongo.async_db.comments_cache.find(
             {"txn.relationship.id": {"$in": ids}, "success": True}
         ):
             if "txn" in x and "id" in x["txn"]["relationship"]:
@@ -543,14 +316,10 @@ class GraphUtils(object):
                 x["txn"]["username_signature"] = x["username_signature"]
                 yield x["txn"]
 
-    def get_relationships(self, wif):
-        # from block import Block
-        # from transaction import Transaction
-        from yadacoin.core.crypt import Crypt
-
+    async def get_relationships(self, wif):
         relationships = []
         cipher = None
-        for block in self.config.BU.get_blocks():
+        async for block in await self.config.BU.get_blocks_async():
             for transaction in block.get("transactions"):
                 try:
                     if not cipher:
@@ -562,7 +331,7 @@ class GraphUtils(object):
                     continue
         return relationships
 
-    def get_transaction_by_rid(
+    async def get_transaction_by_rid(
         self,
         selector,
         wif=None,
@@ -573,10 +342,6 @@ class GraphUtils(object):
         my=False,
         public_key=None,
     ):
-        # from block import Block
-        # from transaction import Transaction
-        from yadacoin.core.crypt import Crypt
-
         if not rid:
             ds = username_signature
             selectors = [TU.hash(ds + selector), TU.hash(selector + ds)]
@@ -588,8 +353,8 @@ class GraphUtils(object):
             else:
                 selectors = selector
 
-        def txn_gen():
-            res = self.mongo.db.blocks.find(
+        async def txn_gen():
+            res = self.mongo.async_db.blocks.find(
                 {
                     "transactions": {
                         "$elemMatch": {
@@ -597,12 +362,13 @@ class GraphUtils(object):
                             "rid": {"$in": selectors},
                         }
                     }
-                }
+                },
+                {"_id": 0},
             )
-            for x in res:
+            async for x in res:
                 yield x
 
-            res = self.mongo.db.fastgraph_transactions.find(
+            res = self.mongo.async_db.fastgraph_transactions.find(
                 {
                     "txn": {
                         "$elemMatch": {
@@ -610,13 +376,14 @@ class GraphUtils(object):
                             "rid": {"$in": selectors},
                         }
                     }
-                }
+                },
+                {"_id": 0},
             )
-            for x in res:
+            async for x in res:
                 yield x
 
         cipher = None
-        for block in txn_gen():
+        async for block in txn_gen():
             for transaction in block.get("transactions"):
                 if theirs and public_key == transaction["public_key"]:
                     continue
@@ -663,7 +430,7 @@ class GraphUtils(object):
                     if txn.get("relationship"):
                         yield txn
 
-    def get_transactions_by_rid(
+    async def get_transactions_by_rid(
         self,
         selector,
         username_signature,
@@ -678,9 +445,6 @@ class GraphUtils(object):
         shared_decrypt=False,
     ):
         # selectors is old code before we got an RID by sorting the bulletin secrets
-        # from block import Block
-        # from transaction import Transaction
-
         if not rid:
             ds = username_signature
             selectors = [TU.hash(ds + selector), TU.hash(selector + ds)]
@@ -694,7 +458,7 @@ class GraphUtils(object):
 
         cipher = None
         for selector in selectors:
-            for txn in self.get_transactions_by_rid_worker(
+            async for txn in self.get_transactions_by_rid_worker(
                 selector,
                 username_signature,
                 wif,
@@ -713,11 +477,10 @@ class GraphUtils(object):
                     }
                 else:
                     query = {"relationship": {"$ne": ""}, "rid": selector}
-                res = self.config.mongo.db.miner_transactions.find(
+                async for txn in self.mongo.async_db.miner_transactions.find(
                     query, {"_id": 0}
-                ).sort([("time", -1)])
-                for txn in res:
-                    res1 = self.config.mongo.db.miner_transactions_cache.find_one(
+                ).sort([("time", -1)]):
+                    res1 = await self.mongo.async_db.miner_transactions_cache.find_one(
                         {
                             "id": txn["id"],
                             "username_signature": username_signature,
@@ -745,18 +508,18 @@ class GraphUtils(object):
                             relationship = json.loads(decrypted.decode("latin1"))
                             txn["relationship"] = relationship
                             txn["success"] = True
-                            self.mongo.db.miner_transactions_cache.update(
+                            await self.mongo.async_db.miner_transactions_cache.update_one(
                                 {"id": txn["id"]}, {"$set": txn}, upsert=True
                             )
                         except:
                             txn["success"] = False
-                            self.mongo.db.miner_transactions_cache.update(
+                            await self.mongo.async_db.miner_transactions_cache.update_one(
                                 {"id": txn["id"]}, {"$set": txn}, upsert=True
                             )
                             continue
                     yield txn
 
-    def get_transactions_by_rid_worker(
+    async def get_transactions_by_rid_worker(
         self,
         selector,
         username_signature,
@@ -768,21 +531,8 @@ class GraphUtils(object):
         requested_rid=False,
         shared_decrypt=False,
     ):
-        from yadacoin.core.crypt import Crypt
-
-        transactions_by_rid_cache = self.mongo.db.transactions_by_rid_cache.find(
-            {
-                "raw": raw,
-                "rid": rid,
-                "username_signature": username_signature,
-                "returnheight": returnheight,
-                "selector": selector,
-                "requested_rid": requested_rid,
-            }
-        ).sort([("height", -1)])
         latest_block = self.config.LatestBlock.block
 
-        transactions = []
         if lt_block_height:
             query = {
                 "transactions.rid": selector,
@@ -791,19 +541,25 @@ class GraphUtils(object):
             }
             if requested_rid:
                 query["transactions.requested_rid"] = selector
-            blocks = self.mongo.db.blocks.find(query)
         else:
-            if transactions_by_rid_cache.count_documents():
-                transactions_by_rid_cache = transactions_by_rid_cache[0]
+            transactions_by_rid_cache = (
+                await self.mongo.async_db.transactions_by_rid_cache.find_one(
+                    {
+                        "raw": raw,
+                        "rid": rid,
+                        "username_signature": username_signature,
+                        "returnheight": returnheight,
+                        "selector": selector,
+                        "requested_rid": requested_rid,
+                    },
+                    sort=[("height", -1)],
+                )
+            )
+            if transactions_by_rid_cache:
                 block_height = transactions_by_rid_cache["height"]
             else:
                 block_height = 0
 
-            query = {
-                "transactions.rid": selector,
-                "transactions": {"$elemMatch": {"relationship": {"$ne": ""}}},
-                "index": {"$gt": block_height},
-            }
             if requested_rid:
                 query = {
                     "$or": [
@@ -819,10 +575,10 @@ class GraphUtils(object):
                     "transactions": {"$elemMatch": {"relationship": {"$ne": ""}}},
                     "index": {"$gt": block_height},
                 }
-            blocks = self.mongo.db.blocks.find(query)
 
+        had_txns = False
         cipher = None
-        for block in blocks:
+        async for block in self.mongo.async_db.blocks.find(query, {"_id": 0}):
             for transaction in block.get("transactions"):
                 if transaction.get("relationship") and (
                     transaction.get("rid") == selector
@@ -836,7 +592,7 @@ class GraphUtils(object):
                                 if wif and wif != self.config.wif:
                                     cipher = Crypt(wif)
                                 else:
-                                    cipher = self.config.wif
+                                    cipher = self.config.cipher
                             if shared_decrypt:
                                 decrypted = cipher.shared_decrypt(
                                     transaction["relationship"]
@@ -852,7 +608,7 @@ class GraphUtils(object):
                             block["index"]
                         )
                     )
-                    self.mongo.db.transactions_by_rid_cache.insert(
+                    await self.mongo.async_db.transactions_by_rid_cache.insert_one(
                         {
                             "raw": raw,
                             "rid": rid,
@@ -866,9 +622,9 @@ class GraphUtils(object):
                             "cache_time": time(),
                         }
                     )
-                    transactions.append(transaction)
-        if not transactions:
-            self.mongo.db.transactions_by_rid_cache.insert(
+                    had_txns = True
+        if not had_txns:
+            await self.mongo.async_db.transactions_by_rid_cache.insert_one(
                 {
                     "raw": raw,
                     "rid": rid,
@@ -882,38 +638,48 @@ class GraphUtils(object):
                 }
             )
 
-        for ftxn in self.mongo.db.fastgraph_transactions.find({"txn.rid": selector}):
+        async for ftxn in self.mongo.async_db.fastgraph_transactions.find(
+            {"txn.rid": selector}, {"_id": 0}
+        ):
             if "txn" in ftxn:
                 yield ftxn["txn"]
 
         last_id = ""
-        for x in self.mongo.db.transactions_by_rid_cache.find(
+        async for x in self.mongo.async_db.transactions_by_rid_cache.find(
             {
                 "raw": raw,
                 "rid": rid,
                 "returnheight": returnheight,
                 "selector": selector,
                 "requested_rid": requested_rid,
-            }
+            },
+            {"_id": 0},
         ).sort([("txn.id", 1)]):
             if "txn" in x and x["txn"]["id"] != last_id:
                 last_id = x["txn"]["id"]
                 yield x["txn"]
 
-    def get_second_degree_transactions_by_rids(self, rids, start_height):
+    async def get_second_degree_transactions_by_rids(self, rids, start_height):
         start_height = start_height or 0
         if not isinstance(rids, list):
             rids = [
                 rids,
             ]
         transactions = []
-        for block in self.mongo.db.blocks.find(
+        async for block in self.mongo.async_db.blocks.find(
             {
                 "$and": [
                     {"transactions": {"$elemMatch": {"relationship": {"$ne": ""}}}},
                     {"index": {"$gt": start_height}},
+                    {
+                        "$or": [
+                            {"transactions.requester_rid": {"$in": rids}},
+                            {"transactions.requested_rid": {"$in": rids}},
+                        ]
+                    },
                 ]
-            }
+            },
+            {"_id": 0},
         ):
             for transaction in block.get("transactions"):
                 if (
@@ -923,28 +689,21 @@ class GraphUtils(object):
                     transactions.append(transaction)
         return transactions
 
-    def get_friend_requests(self, rids):
-        if not isinstance(rids, list):
-            rids = [
-                rids,
-            ]
+    async def cache_friend_requests(self, cache, rid_field, rids):
+        if await self.views_current():
+            # kept up to date as blocks are inserted
+            return
+        cached = await cache.find_one({rid_field: {"$in": rids}}, sort=[("height", -1)])
+        block_height = cached["height"] if cached else 0
 
-        friend_requests_cache = self.mongo.db.friend_requests_cache.find(
-            {"requested_rid": {"$in": rids}}
-        ).sort([("height", -1)])
-        latest_block = self.config.LatestBlock.block
-        if friend_requests_cache.count_documents():
-            friend_requests_cache = friend_requests_cache[0]
-            block_height = friend_requests_cache["height"]
-        else:
-            block_height = 0
-        transactions = self.mongo.db.blocks.aggregate(
+        had_txns = False
+        async for x in self.mongo.async_db.blocks.aggregate(
             [
                 {"$match": {"index": {"$gt": block_height}}},
                 {
                     "$match": {
                         "transactions": {"$elemMatch": {"dh_public_key": {"$ne": ""}}},
-                        "transactions.requested_rid": {"$in": rids},
+                        "transactions.{}".format(rid_field): {"$in": rids},
                     }
                 },
                 {"$unwind": "$transactions"},
@@ -959,26 +718,24 @@ class GraphUtils(object):
                 {
                     "$match": {
                         "txn.dh_public_key": {"$ne": ""},
-                        "txn.requested_rid": {"$in": rids},
+                        "txn.{}".format(rid_field): {"$in": rids},
                     }
                 },
                 {"$sort": {"height": 1}},
             ]
-        )
-        had_txns = False
-        for x in transactions:
+        ):
             had_txns = True
             self.app_log.debug(
-                "caching friend requests at height: {}".format(x["height"])
+                "caching {} at height: {}".format(cache.name, x["height"])
             )
-            self.mongo.db.friend_requests_cache.update(
+            await cache.replace_one(
                 {
-                    "requested_rid": x["txn"]["requested_rid"],
+                    rid_field: x["txn"][rid_field],
                     "height": x["height"],
                     "id": x["txn"]["id"],
                 },
                 {
-                    "requested_rid": x["txn"]["requested_rid"],
+                    rid_field: x["txn"][rid_field],
                     "height": x["height"],
                     "block_hash": x["block_hash"],
                     "id": x["txn"]["id"],
@@ -989,101 +746,56 @@ class GraphUtils(object):
             )
 
         if not had_txns:
+            latest_block = self.config.LatestBlock.block
             for rid in rids:
-                self.mongo.db.friend_requests_cache.insert(
+                await cache.insert_one(
                     {
                         "height": latest_block.index,
                         "block_hash": latest_block.hash,
-                        "requested_rid": rid,
+                        rid_field: rid,
                         "cache_time": time(),
                     }
                 )
 
-        for x in self.mongo.db.fastgraph_transactions.find(
+    async def get_friend_requests(self, rids):
+        if not isinstance(rids, list):
+            rids = [
+                rids,
+            ]
+
+        await self.cache_friend_requests(
+            self.mongo.async_db.friend_requests_cache, "requested_rid", rids
+        )
+
+        async for x in self.mongo.async_db.fastgraph_transactions.find(
             {"txn.dh_public_key": {"$ne": ""}, "txn.requested_rid": {"$in": rids}}
         ):
             if "txn" in x:
                 yield x["txn"]
 
-        for x in self.mongo.db.friend_requests_cache.find(
+        async for x in self.mongo.async_db.friend_requests_cache.find(
             {"txn": {"$exists": True}, "requested_rid": {"$in": rids}}
         ):
-            if "txn" in x:
-                yield x["txn"]
+            yield x["txn"]
 
-    def get_sent_friend_requests(self, rids):
+    async def get_sent_friend_requests(self, rids):
         if not isinstance(rids, list):
             rids = [
                 rids,
             ]
 
-        sent_friend_requests_cache = self.mongo.db.sent_friend_requests_cache.find(
-            {"requester_rid": {"$in": rids}}
-        ).sort([("height", -1)])
-
-        if sent_friend_requests_cache.count_documents():
-            sent_friend_requests_cache = sent_friend_requests_cache[0]
-            block_height = sent_friend_requests_cache["height"]
-        else:
-            block_height = 0
-
-        transactions = self.mongo.db.blocks.aggregate(
-            [
-                {"$match": {"index": {"$gt": block_height}}},
-                {
-                    "$match": {
-                        "transactions": {"$elemMatch": {"dh_public_key": {"$ne": ""}}},
-                        "transactions.requester_rid": {"$in": rids},
-                    }
-                },
-                {"$unwind": "$transactions"},
-                {
-                    "$project": {
-                        "_id": 0,
-                        "txn": "$transactions",
-                        "height": "$index",
-                        "block_hash": "$hash",
-                    }
-                },
-                {
-                    "$match": {
-                        "txn.dh_public_key": {"$ne": ""},
-                        "txn.requester_rid": {"$in": rids},
-                    }
-                },
-                {"$sort": {"height": 1}},
-            ]
+        await self.cache_friend_requests(
+            self.mongo.async_db.sent_friend_requests_cache, "requester_rid", rids
         )
 
-        for x in transactions:
-            self.app_log.debug(
-                "caching sent friend requests at height: {}".format(x["height"])
-            )
-            self.mongo.db.sent_friend_requests_cache.update(
-                {
-                    "requester_rid": x["txn"]["requester_rid"],
-                    "height": x["height"],
-                    "id": x["txn"]["id"],
-                },
-                {
-                    "requester_rid": x["txn"]["requester_rid"],
-                    "height": x["height"],
-                    "block_hash": x["block_hash"],
-                    "id": x["txn"]["id"],
-                    "txn": x["txn"],
-                    "cache_time": time(),
-                },
-                upsert=True,
-            )
-
-        for x in self.mongo.db.fastgraph_transactions.find(
+        async for x in self.mongo.async_db.fastgraph_transactions.find(
             {"txn.dh_public_key": {"$ne": ""}, "txn.requester_rid": {"$in": rids}}
         ):
             if "txn" in x:
                 yield x["txn"]
 
-        for x in self.mongo.db.sent_friend_requests_cache.find(
-            {"requester_rid": {"$in": rids}}
+        async for x in self.mongo.async_db.sent_friend_requests_cache.find(
+            {"txn": {"$exists": True}, "requester_rid": {"$in": rids}}
         ):
             yield x["txn"]
 
@@ -1095,6 +807,22 @@ class GraphUtils(object):
                 rids,
             ]
 
+        if not await self.views_current():
+            await self.cache_messages(rids)
+
+        query = {
+            "$or": [
+                {"rid": {"$in": rids}},
+                {"requester_rid": {"$in": rids}},
+                {"requested_rid": {"$in": rids}},
+            ]
+        }
+
+        async for x in self.mongo.async_db.messages_cache.find(query):
+            x["txn"]["height"] = x["height"]
+            yield x["txn"]
+
+    async def cache_messages(self, rids):
         message_cache = await self.mongo.async_db.messages_cache.find_one(
             {
                 "$or": [
@@ -1170,31 +898,21 @@ class GraphUtils(object):
                 upsert=True,
             )
 
-        query = {
-            "$or": [
-                {"rid": {"$in": rids}},
-                {"requester_rid": {"$in": rids}},
-                {"requested_rid": {"$in": rids}},
-            ]
-        }
-
-        async for x in self.mongo.async_db.messages_cache.find(query):
-            x["txn"]["height"] = x["height"]
-            yield x["txn"]
-
-    def get_mutual_rids(self, rid):
+    async def get_mutual_rids(self, rid):
         # find the requested and requester rids where rid is present in those fields
         rids = set()
-        rids.update([x["requested_rid"] for x in self.get_sent_friend_requests(rid)])
-        rids.update([x["requester_rid"] for x in self.get_friend_requests(rid)])
+        rids.update(
+            [x["requested_rid"] async for x in self.get_sent_friend_requests(rid)]
+        )
+        rids.update([x["requester_rid"] async for x in self.get_friend_requests(rid)])
         rids = list(rids)
         return rids
 
-    def get_mutual_username_signatures(self, rid, at_block_height=None):
+    async def get_mutual_username_signatures(self, rid, at_block_height=None):
         # Get the mutual relationships, then get the bulleting secrets for those relationships
         mutual_username_signatures = set()
-        rids = self.get_mutual_rids(rid)
-        for transaction in self.get_transactions_by_rid(
+        rids = await self.get_mutual_rids(rid)
+        async for transaction in self.get_transactions_by_rid(
             rids, self.config.username_signature, rid=True
         ):
             if "their_username_signature" in transaction["relationship"]:
@@ -1203,23 +921,21 @@ class GraphUtils(object):
                 )
         return list(mutual_username_signatures)
 
-    def get_shared_secrets_by_rid(self, rid):
+    async def get_shared_secrets_by_rid(self, rid):
         shared_secrets = []
         dh_public_keys = []
         dh_private_keys = []
-        txns = self.get_transactions_by_rid(
+        async for txn in self.get_transactions_by_rid(
             rid, self.config.username_signature, rid=True, inc_mempool=True
-        )
-        for txn in txns:
+        ):
             if (
                 str(txn["public_key"]) == str(self.config.public_key)
                 and txn["relationship"]["dh_private_key"]
             ):
                 dh_private_keys.append(txn["relationship"]["dh_private_key"])
-        txns = self.get_transactions_by_rid(
+        async for txn in self.get_transactions_by_rid(
             rid, self.config.username_signature, rid=True, raw=True, inc_mempool=True
-        )
-        for txn in txns:
+        ):
             if (
                 str(txn["public_key"]) != str(self.config.public_key)
                 and txn["dh_public_key"]
@@ -1236,17 +952,15 @@ class GraphUtils(object):
         return shared_secrets
 
     async def verify_message(self, rid, message, public_key, txn_id, txn=None):
-        from yadacoin.core.crypt import Crypt
-
         sent = False
         received = False
-        res = self.mongo.db.verify_message_cache.find_one(
+        res = await self.mongo.async_db.verify_message_cache.find_one(
             {"rid": rid, "message.signIn": message}
         )
         if res:
             received = True
         else:
-            shared_secrets = self.get_shared_secrets_by_rid(rid)
+            shared_secrets = await self.get_shared_secrets_by_rid(rid)
             if txn:
                 if isinstance(txn, Transaction):
                     await txn.verify()
@@ -1261,7 +975,7 @@ class GraphUtils(object):
                 await txn.verify()
             cipher = None
             for shared_secret in list(set(shared_secrets)):
-                res = self.mongo.db.verify_message_cache.find_one(
+                res = await self.mongo.async_db.verify_message_cache.find_one(
                     {
                         "rid": rid,
                         "shared_secret": shared_secret.hex(),
@@ -1279,7 +993,7 @@ class GraphUtils(object):
                         try:
                             decrypted = cipher.shared_decrypt(txn.relationship)
                             signin = json.loads(decrypted.decode("utf-8"))
-                            self.mongo.db.verify_message_cache.update(
+                            await self.mongo.async_db.verify_message_cache.replace_one(
                                 {
                                     "rid": rid,
                                     "shared_secret": shared_secret.hex(),
@@ -1303,7 +1017,7 @@ class GraphUtils(object):
                         else:
                             sent = True
                 except:
-                    self.mongo.db.verify_message_cache.update(
+                    await self.mongo.async_db.verify_message_cache.replace_one(
                         {
                             "rid": rid,
                             "shared_secret": shared_secret.hex(),
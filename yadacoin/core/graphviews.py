@@ -0,0 +1,142 @@
+"""
+Graph caches maintained from inserted blocks instead of per request
+"""
+
+from logging import getLogger
+from time import time
+
+from tornado.locks import Lock
+
+from yadacoin.core.config import Config
+
+
+class GraphViews:
+    """Routes the transactions of every inserted block into the graph caches.
+    Once the views have caught up with the chain, graph reads no longer scan blocks."""
+
+    catch_up_blocks = 1000
+    # caches holding per reader decrypted data, only rolled back on reorg
+    decrypted_caches = (
+        "posts_cache",
+        "reacts_cache",
+        "comments_cache",
+        "transactions_by_rid_cache",
+    )
+    views = (
+        "friend_requests_cache",
+        "sent_friend_requests_cache",
+        "messages_cache",
+        "relationship_transactions_cache",
+    )
+
+    def __init__(self):
+        self.config = Config()
+        self.mongo = self.config.mongo
+        self.app_log = getLogger("tornado.application")
+        self.lock = Lock()
+        self.height = None
+
+    async def get_height(self):
+        """Height of the last block routed into the views, -1 before the first one"""
+        if self.height is None:
+            state = await self.mongo.async_db.graph_views.find_one({"name": "height"})
+            self.height = state["value"] if state else -1
+        return self.height
+
+    async def set_height(self, height):
+        self.height = height
+        await self.mongo.async_db.graph_views.update_one(
+            {"name": "height"}, {"$set": {"value": height}}, upsert=True
+        )
+
+    async def is_current(self):
+        latest_block = self.config.LatestBlock.block
+        return bool(latest_block) and await self.get_height() >= latest_block.index
+
+    async def on_block_inserted(self, block):
+        """Called with the block dict once it is stored, blocks at and above its height were replaced"""
+        async with self.lock:
+            height = await self.get_height()
+            if block["index"] <= height:
+                # a reorg replaced blocks the views already hold
+                await self.rollback(block["index"])
+                height = await self.get_height()
+            if block["index"] > height + 1:
+                # still catching up, catch_up will route it
+                return
+            await self.route_block(block)
+            await self.set_height(block["index"])
+
+    async def rollback(self, height):
+        for name in self.views + self.decrypted_caches:
+            await self.mongo.async_db[name].delete_many({"height": {"$gte": height}})
+        if await self.get_height() >= height:
+            await self.set_height(height - 1)
+
+    async def route_block(self, block):
+        for txn in block.get("transactions", []):
+            entry = {
+                "height": block["index"],
+                "block_hash": block["hash"],
+                "id": txn["id"],
+                "txn": txn,
+                "cache_time": time(),
+            }
+            if txn.get("dh_public_key"):
+                if txn.get("requested_rid"):
+                    await self.upsert(
+                        "friend_requests_cache",
+                        {"requested_rid": txn["requested_rid"]},
+                        entry,
+                    )
+                if txn.get("requester_rid"):
+                    await self.upsert(
+                        "sent_friend_requests_cache",
+                        {"requester_rid": txn["requester_rid"]},
+                        entry,
+                    )
+            if txn.get("rid") or txn.get("requester_rid") or txn.get("requested_rid"):
+                await self.upsert(
+                    "messages_cache",
+                    {
+                        "rid": txn.get("rid"),
+                        "requester_rid": txn.get("requester_rid"),
+                        "requested_rid": txn.get("requested_rid"),
+                    },
+                    entry,
+                )
+            elif txn.get("relationship") and not txn.get("dh_public_key"):
+                # posts, reacts and comments, decrypted per reader from here
+                await self.upsert("relationship_transactions_cache", {}, entry)
+
+    async def upsert(self, name, keys, entry):
+        await self.mongo.async_db[name].replace_one(
+            {**keys, "height": entry["height"], "id": entry["id"]},
+            {**keys, **entry},
+            upsert=True,
+        )
+
+    async def catch_up(self):
+        """Routes the blocks stored before the views existed, a batch at a time"""
+        async with self.lock:
+            height = await self.get_height()
+            last_height = height
+            async for block in self.mongo.async_db.blocks.find(
+                {"index": {"$gt": height, "$lte": height + self.catch_up_blocks}},
+                {"_id": 0},
+            ).sort([("index", 1)]):
+                if block["index"] != last_height + 1:
+                    break
+                await self.route_block(block)
+                last_height = block["index"]
+            if last_height != height:
+                self.app_log.debug(f"graph views caught up to {last_height}")
+                await self.set_height(last_height)
+            if (
+                last_height < height + self.catch_up_blocks
+                and not await self.is_current()
+            ):
+                # routed again from here once the block is stored
+                self.app_log.warning(
+                    f"graph views waiting at {last_height}, block {last_height + 1} is missing"
+                )
@@ -0,0 +1,536 @@
+"""
+Declared mongo indexes, built in the background at startup, and the drift
+between them, the existing indexes and the queries the node runs
+"""
+
+import threading
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from yadacoin.core.config import Config
+
+# (caller, collection, fields the query filters on) of the hot queries
+QUERY_SHAPES = [
+    ("BlockChainUtils.get_latest_block", "blocks", ["index"]),
+    ("BlockChainUtils.get_block_by_index", "blocks", ["index"]),
+    ("BlockChainUtils.get_transaction_heights", "blocks", ["transactions.id"]),
+    ("BlockChainUtils.get_reverse_public_keys", "reversed_public_keys", ["address"]),
+    ("BlockChainUtils.get_wallet_balances", "blocks", ["transactions.outputs.to"]),
+    ("BlockChainUtils.get_wallet_balances", "blocks", ["transactions.public_key"]),
+    ("BlockChainUtils.get_wallet_unspent_outputs", "miner_transactions", ["inputs.id"]),
+    ("BlockChainUtils.get_transactions", "get_transactions_cache", ["public_key"]),
+    ("BlockChainUtils.get_transaction_by_id", "blocks", ["transactions.id"]),
+    ("BlockChainUtils.get_transaction_by_id", "miner_transactions", ["id"]),
+    (
+        "BlockChainUtils.get_mempool_transactions",
+        "miner_transactions",
+        ["inputs.id", "public_key"],
+    ),
+    ("GraphUtils.search_ns_requested_rid", "name_server", ["txn.requested_rid"]),
+    ("GraphUtils.search_ns_requester_rid", "name_server", ["txn.requester_rid"]),
+    ("GraphUtils.get_posts", "posts_cache", ["rid"]),
+    ("GraphUtils.get_reacts", "reacts_cache", ["txn.relationship.id"]),
+    ("GraphUtils.get_comments", "comments_cache", ["txn.relationship.id"]),
+    ("GraphUtils.get_transactions_by_rid", "miner_transactions_cache", ["id"]),
+    ("GraphUtils.get_transactions_by_rid_worker", "transactions_by_rid_cache", ["rid"]),
+    (
+        "GraphUtils.get_transactions_by_rid_worker",
+        "fastgraph_transactions",
+        ["txn.rid"],
+    ),
+    ("GraphUtils.get_friend_requests", "friend_requests_cache", ["requested_rid"]),
+    (
+        "GraphUtils.get_sent_friend_requests",
+        "sent_friend_requests_cache",
+        ["requester_rid"],
+    ),
+    ("GraphUtils.cache_messages", "messages_cache", ["rid"]),
+    ("GraphUtils.verify_message", "verify_message_cache", ["rid"]),
+    ("GraphViews.get_height", "graph_views", ["name"]),
+]
+
+
+def declared_indexes():
+    indexes = {}
+    __id = IndexModel([("id", ASCENDING)], name="__id", unique=True)
+    __hash = IndexModel([("hash", ASCENDING)], name="__hash")
+    __time = IndexModel([("time", ASCENDING)], name="__time")
+    __index = IndexModel([("index", ASCENDING)], name="__index")
+    __to = IndexModel([("transactions.outputs.to", ASCENDING)], name="__to")
+    __value = IndexModel([("transactions.outputs.value", ASCENDING)], name="__value")
+    __txn_id = IndexModel([("transactions.id", ASCENDING)], name="__txn_id")
+    __txn_hash = IndexModel([("transactions.hash", ASCENDING)], name="__txn_hash")
+    __txn_inputs_id = IndexModel(
+        [("transactions.inputs.id", ASCENDING)], name="__txn_inputs_id"
+    )
+    __txn_id_inputs_id = IndexModel(
+        [("transactions.id", ASCENDING), ("transactions.inputs.id", ASCENDING)],
+        name="__txn_id_inputs_id",
+    )
+    __txn_id_public_key = IndexModel(
+        [("transactions.id", ASCENDING), ("transactions.public_key", ASCENDING)],
+        name="__txn_id_public_key",
+    )
+    __txn_public_key = IndexModel(
+        [("transactions.public_key", ASCENDING)], name="__txn_public_key"
+    )
+    __txn_inputs_public_key = IndexModel(
+        [("transactions.inputs.public_key", ASCENDING)],
+        name="__txn_inputs_public_key",
+    )
+    __txn_inputs_address = IndexModel(
+        [("transactions.inputs.address", ASCENDING)], name="__txn_inputs_address"
+    )
+    __txn_public_key_inputs_public_key_address = IndexModel(
+        [
+            ("transactions.public_key", ASCENDING),
+            ("transactions.inputs.public_key", ASCENDING),
+            ("transactions.inputs.address", ASCENDING),
+        ],
+        name="__txn_public_key_inputs_public_key_address",
+    )
+    __public_key_index = IndexModel(
+        [("public_key", ASCENDING), ("index", DESCENDING)],
+        name="__public_key_index",
+    )
+    __public_key_time = IndexModel(
+        [
+            ("public_key", ASCENDING),
+            ("time", ASCENDING),
+        ],
+        name="__public_key_time",
+    )
+    __public_key = IndexModel([("public_key", ASCENDING)], name="__public_key")
+    __prev_hash = IndexModel([("prevHash", ASCENDING)], name="__prev_hash")
+    __txn_public_key_inputs_id = IndexModel(
+        [
+            ("transactions.public_key", ASCENDING),
+            ("transactions.inputs.id", ASCENDING),
+        ],
+        name="__txn_public_key_inputs_id",
+    )
+    __txn_rid = IndexModel([("transactions.rid", ASCENDING)], name="__txn_rid")
+    __txn_requested_rid = IndexModel(
+        [("transactions.requested_rid", ASCENDING)], name="__txn_requested_rid"
+    )
+    __txn_requester_rid = IndexModel(
+        [("transactions.requester_rid", ASCENDING)], name="__txn_requester_rid"
+    )
+    __txn_index_rid = IndexModel(
+        [("index", ASCENDING), ("transactions.rid", ASCENDING)],
+        name="__txn_index_rid",
+    )
+    __txn_index_requested_rid = IndexModel(
+        [("index", ASCENDING), ("transactions.requested_rid", ASCENDING)],
+        name="__txn_index_requested_rid",
+    )
+    __txn_index_requester_rid = IndexModel(
+        [("index", ASCENDING), ("transactions.requester_rid", ASCENDING)],
+        name="__txn_index_requester_rid",
+    )
+    __txn_time = IndexModel([("transactions.time", DESCENDING)], name="__txn_time")
+    __txn_contract_rid = IndexModel(
+        [("transactions.contract.rid", ASCENDING)], name="__txn_contract_rid"
+    )
+    __txn_rel_contract_identity_public_key = IndexModel(
+        [
+            (
+                "transactions.relationship.smart_contract.identity.public_key",
+                ASCENDING,
+            )
+        ],
+        name="__txn_rel_contract_identity_public_key",
+    )
+    __txn_rel_contract_expiry = IndexModel(
+        [
+            (
+                "transactions.relationship.smart_contract.expiry",
+                ASCENDING,
+            )
+        ],
+        name="__txn_rel_contract_expiry",
+    )
+    __updated_at = IndexModel(
+        [
+            (
+                "updated_at",
+                ASCENDING,
+            )
+        ],
+        name="__updated_at",
+    )
+    __txn_outputs_to_index = IndexModel(
+        [("transactions.outputs.to", ASCENDING), ("index", ASCENDING)],
+        name="__txn_outputs_to_index",
+    )
+    __txn_inputs_0 = IndexModel(
+        [("transactions.inputs.0", ASCENDING)],
+        name="__txn_inputs_0",
+    )
+    __txn_rel_smart_contract_expiry_txn_time = IndexModel(
+        [
+            ("transactions.relationship.smart_contract.expiry", ASCENDING),
+            ("transactions.time", ASCENDING),
+        ],
+        name="__txn_rel_smart_contract_expiry_txn_time",
+    )
+
+    indexes["blocks"] = [
+        __hash,
+        __time,
+        __index,
+        __id,
+        __to,
+        __value,
+        __txn_id,
+        __txn_hash,
+        __txn_inputs_id,
+        __txn_id_inputs_id,
+        __txn_id_public_key,
+        __txn_public_key,
+        __txn_inputs_public_key,
+        __txn_inputs_address,
+        __txn_public_key_inputs_public_key_address,
+        __public_key_index,
+        __public_key_time,
+        __public_key,
+        __prev_hash,
+        __txn_public_key_inputs_id,
+        __txn_rid,
+        __txn_requested_rid,
+        __txn_requester_rid,
+        __txn_index_rid,
+        __txn_index_requested_rid,
+        __txn_index_requester_rid,
+        __txn_time,
+        __txn_contract_rid,
+        __txn_rel_contract_identity_public_key,
+        __txn_rel_contract_expiry,
+        __updated_at,
+        __txn_outputs_to_index,
+        __txn_inputs_0,
+        __txn_rel_smart_contract_expiry_txn_time,
+    ]
+
+    __id = IndexModel([("id", ASCENDING)], name="__id")
+    __height = IndexModel([("height", ASCENDING)], name="__height")
+    __cache_time = IndexModel([("cache_time", ASCENDING)], name="__cache_time")
+    indexes["unspent_cache"] = [__id, __height, __cache_time]
+
+    __id = IndexModel([("id", ASCENDING)], name="__id")
+    __index = IndexModel([("index", ASCENDING)], name="__index")
+    __block_hash = IndexModel([("block.hash", ASCENDING)], name="__block_hash")
+    __block_prevHash_index_version = IndexModel(
+        [
+            ("block.prevHash", ASCENDING),
+            ("block.index", ASCENDING),
+            ("block.version", ASCENDING),
+        ],
+        name="__block_prevHash_index_version",
+    )
+    indexes["consensus"] = [__id, __index, __block_hash, __block_prevHash_index_version]
+
+    __address = IndexModel([("address", ASCENDING)], name="__address")
+    __address_desc = IndexModel([("address", DESCENDING)], name="__address_desc")
+    __address_only = IndexModel([("address_only", ASCENDING)], name="__address_only")
+    __address_only_desc = IndexModel(
+        [("address_only", DESCENDING)], name="__address_only_desc"
+    )
+    __index = IndexModel([("index", ASCENDING)], name="__index")
+    __hash = IndexModel([("hash", ASCENDING)], name="__hash")
+    __time = IndexModel([("time", DESCENDING)], name="__time")
+    indexes["shares"] = [
+        __address,
+        __address_desc,
+        __address_only,
+        __address_only_desc,
+        __index,
+        __hash,
+        __time,
+    ]
+
+    __index_address = IndexModel(
+        [("index", ASCENDING), ("address", ASCENDING)],
+        name="__index_address",
+        unique=True,
+    )
+    indexes["share_totals"] = [__index_address]
+
+    __index = IndexModel([("index", DESCENDING)], name="__index", unique=True)
+    indexes["share_totals_heights"] = [__index]
+
+    __index = IndexModel([("index", DESCENDING)], name="__index")
+    indexes["share_payout"] = [
+        __index,
+    ]
+
+    __txn_id = IndexModel([("txn.id", ASCENDING)], name="__txn_id")
+    __cache_time = IndexModel([("cache_time", ASCENDING)], name="__cache_time")
+    __height = IndexModel([("height", ASCENDING)], name="__height")
+    indexes["transactions_by_rid_cache"] = [__txn_id, __cache_time, __height]
+
+    __requested_rid_height = IndexModel(
+        [("requested_rid", ASCENDING), ("height", DESCENDING)],
+        name="__requested_rid_height",
+    )
+    __height = IndexModel([("height", ASCENDING)], name="__height")
+    indexes["friend_requests_cache"] = [__requested_rid_height, __height]
+
+    __requester_rid_height = IndexModel(
+        [("requester_rid", ASCENDING), ("height", DESCENDING)],
+        name="__requester_rid_height",
+    )
+    __height = IndexModel([("height", ASCENDING)], name="__height")
+    indexes["sent_friend_requests_cache"] = [__requester_rid_height, __height]
+
+    __rid = IndexModel([("rid", ASCENDING)], name="__rid")
+    __requester_rid = IndexModel([("requester_rid", ASCENDING)], name="__requester_rid")
+    __requested_rid = IndexModel([("requested_rid", ASCENDING)], name="__requested_rid")
+    __height = IndexModel([("height", ASCENDING)], name="__height")
+    indexes["messages_cache"] = [__rid, __requester_rid, __requested_rid, __height]
+
+    __height = IndexModel([("height", ASCENDING)], name="__height")
+    indexes["relationship_transactions_cache"] = [__height]
+
+    __rid_height = IndexModel(
+        [("rid", ASCENDING), ("height", DESCENDING)], name="__rid_height"
+    )
+    __txn_relationship_id = IndexModel(
+        [("txn.relationship.id", ASCENDING)], name="__txn_relationship_id"
+    )
+    __height = IndexModel([("height", ASCENDING)], name="__height")
+    for cache in ("posts_cache", "reacts_cache", "comments_cache"):
+        indexes[cache] = [__rid_height, __txn_relationship_id, __height]
+
+    __id = IndexModel([("id", ASCENDING)], name="__id")
+    __hash = IndexModel([("hash", ASCENDING)], name="__hash")
+    __outputs_to = IndexModel([("outputs.to", ASCENDING)], name="__outputs_to")
+    __public_key = IndexModel([("public_key", ASCENDING)], name="__public_key")
+    __rid = IndexModel([("rid", ASCENDING)], name="__rid")
+    __requested_rid = IndexModel([("requested_rid", ASCENDING)], name="__requested_rid")
+    __requester_rid = IndexModel([("requester_rid", ASCENDING)], name="__requester_rid")
+    __time = IndexModel([("time", DESCENDING)], name="__time")
+    __inputs_id = IndexModel([("inputs.id", ASCENDING)], name="__inputs_id")
+    __fee_time = IndexModel(
+        [("fee", DESCENDING), ("time", ASCENDING)], name="__fee_time"
+    )
+    __rel_smart_contract = IndexModel(
+        [("relationship.smart_contract", ASCENDING)], name="__rel_smart_contract"
+    )
+    indexes["miner_transactions"] = [
+        __id,
+        __hash,
+        __outputs_to,
+        __public_key,
+        __rid,
+        __requested_rid,
+        __requester_rid,
+        __time,
+        __inputs_id,
+        __fee_time,
+        __rel_smart_contract,
+    ]
+
+    __id = IndexModel([("txn.id", ASCENDING)], name="__id")
+    __hash = IndexModel([("txn.hash", ASCENDING)], name="__hash")
+    __index = IndexModel(
+        [("index", DESCENDING)],
+        name="__index",
+    )
+    __outputs_to = IndexModel([("txn.outputs.to", ASCENDING)], name="__outputs_to")
+    __outputs_to_index = IndexModel(
+        [("txn.outputs.to", ASCENDING), ("index", DESCENDING)],
+        name="__outputs_to_index",
+    )
+    __public_key = IndexModel([("txn.public_key", ASCENDING)], name="__public_key")
+    __rid = IndexModel([("txn.rid", ASCENDING)], name="__rid")
+    __requested_rid = IndexModel(
+        [("txn.requested_rid", ASCENDING)], name="__requested_rid"
+    )
+    __requester_rid = IndexModel(
+        [("txn.requester_rid", ASCENDING)], name="__requester_rid"
+    )
+    __time = IndexModel([("txn.time", DESCENDING)], name="__time")
+    __inputs_id = IndexModel([("txn.inputs.id", ASCENDING)], name="__inputs_id")
+    __fee_time = IndexModel(
+        [("txn.fee", DESCENDING), ("txn.time", ASCENDING)], name="__fee_time"
+    )
+    indexes["failed_transactions"] = [
+        __id,
+        __hash,
+        __index,
+        __outputs_to,
+        __outputs_to_index,
+        __public_key,
+        __rid,
+        __requested_rid,
+        __requester_rid,
+        __time,
+        __inputs_id,
+        __fee_time,
+    ]
+
+    __time = IndexModel([("time", ASCENDING)], name="__time")
+    __rid = IndexModel([("rid", ASCENDING)], name="__rid")
+    __username_signature = IndexModel(
+        [("username_signature", ASCENDING)], name="__username_signature"
+    )
+    __rid_username_signature = IndexModel(
+        [("rid", ASCENDING), ("username_signature", ASCENDING)],
+        name="__rid_username_signature",
+    )
+    indexes["user_collection_last_activity"] = [
+        __time,
+        __rid,
+        __username_signature,
+        __rid_username_signature,
+    ]
+
+    __timestamp = IndexModel([("timestamp", DESCENDING)], name="__timestamp")
+    __archived = IndexModel([("archived", ASCENDING)], name="__archived")
+    __timestamp_archived = IndexModel(
+        [("timestamp", DESCENDING), ("archived", ASCENDING)],
+        name="__timestamp_archived",
+    )
+    indexes["node_status"] = [__timestamp, __archived, __timestamp_archived]
+
+    __time = IndexModel([("time", ASCENDING)], name="__time")
+    __stat = IndexModel([("stat", ASCENDING)], name="__stat")
+    indexes["pool_stats"] = [__time, __stat]
+
+    # hot queries of BlockChainUtils and GraphUtils without a covering index before
+    indexes["reversed_public_keys"] = [
+        IndexModel([("address", ASCENDING)], name="__address")
+    ]
+    indexes["fastgraph_transactions"] = [
+        IndexModel([("txn.rid", ASCENDING)], name="__txn_rid")
+    ]
+    indexes["transactions_by_rid_cache"].append(
+        IndexModel([("rid", ASCENDING)], name="__rid")
+    )
+    indexes["get_transactions_cache"] = [
+        IndexModel([("public_key", ASCENDING)], name="__public_key")
+    ]
+    indexes["miner_transactions_cache"] = [IndexModel([("id", ASCENDING)], name="__id")]
+    indexes["verify_message_cache"] = [IndexModel([("rid", ASCENDING)], name="__rid")]
+    indexes["name_server"] = [
+        IndexModel([("txn.requested_rid", ASCENDING)], name="__txn_requested_rid"),
+        IndexModel([("txn.requester_rid", ASCENDING)], name="__txn_requester_rid"),
+    ]
+    indexes["graph_views"] = [IndexModel([("name", ASCENDING)], name="__name")]
+    return indexes
+
+
+class Indexes:
+    """Builds the declared indexes on a background thread so the node serves
+    from the existing ones meanwhile, and reports the drift before and after"""
+
+    def __init__(self, db):
+        self.db = db
+        self.config = Config()
+        self.declared = declared_indexes()
+        self.status = "pending"
+        self.errors = {}
+        self.startup_report = None
+        self.report = None
+
+    def start(self):
+        threading.Thread(
+            target=self.provision, name="index-provisioning", daemon=True
+        ).start()
+
+    def provision(self):
+        self.startup_report = self.drift()
+        if self.startup_report["missing"] or self.startup_report["mismatched"]:
+            self.config.app_log.warning(
+                f"Index drift at startup, building in the background: {self.startup_report}"
+            )
+        self.status = "building"
+        for collection, models in self.declared.items():
+            try:
+                self.db[collection].create_indexes(models)
+            except Exception:
+                # one conflicting index fails the whole batch, build the rest
+                for model in models:
+                    try:
+                        self.db[collection].create_indexes([model])
+                    except Exception as e:
+                        name = f'{collection}.{model.document["name"]}'
+                        self.errors[name] = str(e)
+                        self.config.app_log.warning(
+                            f"Index provisioning failed for {name}: {e}"
+                        )
+        self.report = self.drift()
+        self.status = "done"
+        for shape in self.report["unindexed_query_shapes"]:
+            caller, collection, fields = shape
+            unbuilt = shape in self.report["unbuilt_query_shapes"]
+            self.config.app_log.warning(
+                f"Query without an index: {caller} {collection} {fields}"
+                + (", its declared index is not built" if unbuilt else "")
+            )
+
+    def existing(self):
+        collections = set(self.db.list_collection_names())
+        return {
+            collection: {
+                name: [(field, int(direction)) for field, direction in info["key"]]
+                for name, info in self.db[collection].index_information().items()
+            }
+            for collection in self.declared
+            if collection in collections
+        }
+
+    def drift(self):
+        existing = self.existing()
+        missing = {}
+        mismatched = {}
+        undeclared = {}
+        for collection, models in self.declared.items():
+            existing_keys = existing.get(collection, {})
+            names = set()
+            for model in models:
+                name = model.document["name"]
+                key = [(f, int(d)) for f, d in model.document["key"].items()]
+                names.add(name)
+                if name not in existing_keys:
+                    missing.setdefault(collection, []).append(name)
+                elif existing_keys[name] != key:
+                    mismatched.setdefault(collection, []).append(name)
+            extra = set(existing_keys) - names - {"_id_"}
+            if extra:
+                undeclared[collection] = sorted(extra)
+        # only the indexes in the db serve a query, declared ones may have
+        # failed or still be building
+        unindexed = []
+        unbuilt = []
+        for shape in QUERY_SHAPES:
+            caller, collection, fields = shape
+            if self.covers(fields, existing.get(collection, {}).values()):
+                continue
+            unindexed.append(shape)
+            declared = [
+                list(model.document["key"].items())
+                for model in self.declared.get(collection, [])
+            ]
+            if self.covers(fields, declared):
+                unbuilt.append(shape)
+        return {
+            "missing": missing,
+            "mismatched": mismatched,
+            "undeclared": undeclared,
+            "unindexed_query_shapes": unindexed,
+            "unbuilt_query_shapes": unbuilt,
+        }
+
+    def covers(self, fields, keys):
+        """An index can serve the query when it starts with one of its fields"""
+        return any(key and key[0][0] in fields for key in keys)
+
+    def to_dict(self):
+        return {
+            "status": self.status,
+            "errors": self.errors,
+            "startup": self.startup_report,
+            "current": self.report,
+        }
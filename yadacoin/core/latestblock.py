@@ -1,9 +1,16 @@
+from datetime import timedelta
+
+from tornado.locks import Condition
+
 from yadacoin.core.config import Config
+from yadacoin.core.scheduler import SchedulerEvents
 
 
 class LatestBlock:
     config = None
     block = None
+    # notified every time a new block becomes the tip
+    new_block = Condition()
 
     @classmethod
     async def set_config(cls):
@@ -25,7 +32,17 @@ class LatestBlock:
         if not block:
             await cls.config.BU.insert_genesis()
             return
+        previous_hash = cls.block.hash if cls.block else None
         cls.block = await Block.from_dict(block)
+        if cls.block.hash != previous_hash:
+            cls.new_block.notify_all()
+            if getattr(cls.config, "scheduler", None):
+                cls.config.scheduler.wake(SchedulerEvents.NEW_BLOCK)
+
+    @classmethod
+    async def wait_for_block(cls, timeout):
+        """Waits up to timeout seconds for a new tip, returns False on timeout"""
+        return await cls.new_block.wait(timeout=timedelta(seconds=timeout))
 
     @classmethod
     async def get_latest_block(cls):
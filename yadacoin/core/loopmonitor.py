@@ -0,0 +1,98 @@
+"""
+Event loop lag monitor, reports what the loop was running when it stalled
+"""
+
+import sys
+import threading
+import traceback
+from inspect import CO_COROUTINE
+from logging import getLogger
+from time import monotonic, sleep, time
+
+from tornado.ioloop import PeriodicCallback
+
+from yadacoin.core.config import Config
+from yadacoin.core.metrics import Histogram
+
+
+class LoopMonitor:
+    """A periodic tick measures how late the loop runs it, and a watchdog
+    thread grabs the loop thread stack once a tick is late by more than
+    the threshold, so the blocking coroutine can be named"""
+
+    interval = 0.5
+    max_stalls = 20
+
+    def __init__(self):
+        self.config = Config()
+        self.app_log = getLogger("tornado.application")
+        self.threshold = getattr(self.config, "loop_lag_threshold", 1)
+        self.lag = Histogram()
+        self.last_lag = 0
+        self.stalls = []
+        self.stall = None
+        self.last_tick = monotonic()
+        self.thread_id = None
+        self.running = False
+
+    def start(self):
+        self.thread_id = threading.get_ident()
+        self.last_tick = monotonic()
+        self.running = True
+        self.callback = PeriodicCallback(self.tick, self.interval * 1000)
+        self.callback.start()
+        threading.Thread(target=self.watchdog, name="loop-monitor", daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        self.callback.stop()
+
+    def tick(self):
+        now = monotonic()
+        self.last_lag = max(now - self.last_tick - self.interval, 0)
+        self.last_tick = now
+        self.lag.observe(self.last_lag)
+        if self.stall:
+            self.stall["duration"] = "%.4f" % self.last_lag
+            self.app_log.warning(
+                "Event loop blocked for %.2fs in %s",
+                self.last_lag,
+                " > ".join(self.stall["coroutines"]) or "a callback",
+            )
+            self.stall = None
+
+    def watchdog(self):
+        while self.running:
+            sleep(self.threshold / 2)
+            late = monotonic() - self.last_tick - self.interval
+            if late > self.threshold and not self.stall:
+                self.record_stall()
+
+    def record_stall(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        stack = traceback.extract_stack(frame)
+        coroutines = []
+        while frame:
+            if frame.f_code.co_flags & CO_COROUTINE:
+                coroutines.append(
+                    getattr(frame.f_code, "co_qualname", frame.f_code.co_name)
+                )
+            frame = frame.f_back
+        self.stall = {
+            "time": int(time()),
+            "duration": None,
+            "coroutines": coroutines[::-1],
+            "stack": traceback.format_list(stack[-15:]),
+        }
+        self.stalls.append(self.stall)
+        del self.stalls[: -self.max_stalls]
+
+    def to_dict(self):
+        return {
+            "lag": "%.4f" % self.last_lag,
+            "lag_histogram": self.lag.to_dict(),
+            "threshold": self.threshold,
+            "stalls": self.stalls,
+        }
@@ -0,0 +1,132 @@
+"""
+Lightweight in process metrics
+"""
+
+from bisect import bisect_left
+from time import perf_counter
+
+
+class Histogram:
+    """Cumulative duration histogram in seconds"""
+
+    buckets = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "avg": "%.4f" % (self.sum / (self.count or 1)),
+            "max": "%.4f" % self.max,
+            "buckets": {
+                **{
+                    f"le_{bucket}": count
+                    for bucket, count in zip(self.buckets, self.counts)
+                },
+                "le_inf": self.counts[-1],
+            },
+        }
+
+    def to_prometheus(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bucket, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bucket}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class RPCMethodMetrics:
+    def __init__(self):
+        self.messages_in = 0
+        self.bytes_in = 0
+        self.messages_out = 0
+        self.bytes_out = 0
+        self.errors = 0
+        self.retries = 0
+        self.latency = Histogram()
+
+
+class RPCMetrics:
+    """Counters for the tcp rpc traffic by role, method and peer type"""
+
+    counters = (
+        ("messages_received_total", "messages_in", "RPC messages received"),
+        ("received_bytes_total", "bytes_in", "Bytes of RPC messages received"),
+        ("messages_sent_total", "messages_out", "RPC messages sent"),
+        ("sent_bytes_total", "bytes_out", "Bytes of RPC messages sent"),
+        ("errors_total", "errors", "RPC handlers that raised"),
+        ("retries_total", "retries", "RPC messages sent again, still unconfirmed"),
+    )
+
+    def __init__(self):
+        self.methods = {}
+
+    def get(self, role, method, peer_type):
+        key = (role, method, peer_type)
+        if key not in self.methods:
+            self.methods[key] = RPCMethodMetrics()
+        return self.methods[key]
+
+    def to_prometheus(self):
+        lines = []
+        labels = {
+            key: f'role="{key[0]}",method="{key[1]}",peer_type="{key[2]}"'
+            for key in self.methods
+        }
+        for name, attr, description in self.counters:
+            lines.append(f"# HELP yadacoin_rpc_{name} {description}")
+            lines.append(f"# TYPE yadacoin_rpc_{name} counter")
+            for key, metrics in self.methods.items():
+                lines.append(
+                    f"yadacoin_rpc_{name}{{{labels[key]}}} {getattr(metrics, attr)}"
+                )
+        name = "yadacoin_rpc_handler_seconds"
+        lines.append(f"# HELP {name} Time spent in the RPC method handler")
+        lines.append(f"# TYPE {name} histogram")
+        for key, metrics in self.methods.items():
+            lines.extend(metrics.latency.to_prometheus(name, labels[key]))
+        return "\n".join(lines) + "\n"
+
+
+class StartupTimer:
+    """Seconds spent in each startup phase, a phase ends when the next is marked"""
+
+    def __init__(self, start=None):
+        self.last = start if start is not None else perf_counter()
+        self.start = self.last
+        self.phases = {}
+
+    def mark(self, phase):
+        now = perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0) + now - self.last
+        self.last = now
+
+    def to_dict(self):
+        return {
+            **{phase: "%.3f" % seconds for phase, seconds in self.phases.items()},
+            "total": "%.3f" % (self.last - self.start),
+        }
+
+    def log(self, app_log):
+        app_log.info(
+            "Startup in %.2fs: %s"
+            % (
+                self.last - self.start,
+                ", ".join(
+                    f"{phase} {seconds:.2f}s" for phase, seconds in self.phases.items()
+                ),
+            )
+        )
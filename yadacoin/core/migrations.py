@@ -0,0 +1,179 @@
+"""
+Versioned one time schema migrations, run in batches at startup and resumed
+from the last finished batch if the node stopped half way
+"""
+
+from time import time
+
+from yadacoin.core.config import Config
+
+
+class Migration:
+    """Selects the documents still to migrate with query, so running it again is harmless"""
+
+    version = 0
+    description = ""
+    collection = "blocks"
+    query = {}
+    projection = None
+
+    def apply(self, db, documents):
+        """Migrates one batch of documents"""
+        raise NotImplementedError
+
+    def finish(self, db):
+        """Runs once every batch is migrated"""
+        return
+
+
+class BlockTimeToInt(Migration):
+    version = 1
+    description = "convert block time from string to number"
+    query = {"time": {"$type": "string"}}
+    projection = {"time": 1}
+
+    def apply(self, db, documents):
+        for x in documents:
+            db.blocks.update_one({"_id": x["_id"]}, {"$set": {"time": int(x["time"])}})
+
+
+class MempoolTimeToInt(Migration):
+    version = 2
+    description = "convert mempool transaction time from string to number"
+    collection = "miner_transactions"
+    query = {"time": {"$type": "string"}}
+    projection = {"time": 1}
+
+    def apply(self, db, documents):
+        for x in documents:
+            db.miner_transactions.update_one(
+                {"_id": x["_id"]}, {"$set": {"time": int(x["time"])}}
+            )
+
+
+class BlockTransactionTimeToInt(Migration):
+    version = 3
+    description = "convert blockchain transaction time from string to number"
+    query = {"transactions.time": {"$type": "string"}}
+    projection = {"transactions": 1}
+
+    def apply(self, db, documents):
+        for block in documents:
+            for txn in block["transactions"]:
+                if "time" not in txn:
+                    continue
+                if txn["time"] in ["", 0, "0"]:
+                    del txn["time"]
+                else:
+                    txn["time"] = int(txn["time"])
+            db.blocks.update_one(
+                {"_id": block["_id"]}, {"$set": {"transactions": block["transactions"]}}
+            )
+
+
+class RemoveTooHighRewardBlocks(Migration):
+    version = 4
+    description = "remove blocks with too high of reward"
+    query = {"index": {"$gte": 210000}}
+    projection = {"index": 1, "public_key": 1, "transactions": 1}
+
+    def apply(self, db, documents):
+        removed = []
+        for block in documents:
+            for txn in block["transactions"]:
+                if txn["public_key"] != block["public_key"] or len(txn["inputs"]):
+                    continue
+                if sum(x["value"] for x in txn["outputs"]) >= 50:
+                    Config().app_log.warning(
+                        f'Removing block with too high of reward: {block["index"]}'
+                    )
+                    removed.append(block["_id"])
+                    break
+        if removed:
+            db.blocks.delete_many({"_id": {"$in": removed}})
+
+
+class BlockUpdatedAt(Migration):
+    version = 5
+    description = "set updated_at on blocks and drop cache entries without cache_time"
+    query = {"updated_at": {"$exists": False}}
+    projection = {"_id": 1}
+
+    def apply(self, db, documents):
+        db.blocks.update_many(
+            {"_id": {"$in": [x["_id"] for x in documents]}},
+            {"$set": {"updated_at": time()}},
+        )
+
+    def finish(self, db):
+        for collection in db.list_collection_names():
+            if collection.endswith("_cache"):
+                db[collection].delete_many({"cache_time": {"$exists": False}})
+
+
+class Migrations:
+    migrations = [
+        BlockTimeToInt(),
+        MempoolTimeToInt(),
+        BlockTransactionTimeToInt(),
+        RemoveTooHighRewardBlocks(),
+        BlockUpdatedAt(),
+    ]
+    batch_size = 1000
+
+    def __init__(self, db):
+        self.db = db
+        self.config = Config()
+
+    @property
+    def latest(self):
+        return self.migrations[-1].version
+
+    def get_state(self):
+        return self.db.schema_version.find_one({"_id": "schema_version"}) or {
+            "version": 0
+        }
+
+    def set_state(self, **fields):
+        self.db.schema_version.update_one(
+            {"_id": "schema_version"}, {"$set": fields}, upsert=True
+        )
+
+    def run(self):
+        state = self.get_state()
+        if state["version"] >= self.latest:
+            return
+        for migration in self.migrations:
+            if migration.version <= state["version"]:
+                continue
+            resume = None
+            if state.get("migrating") == migration.version:
+                resume = state.get("resume")
+            self.run_migration(migration, resume)
+            self.set_state(version=migration.version, migrating=None, resume=None)
+
+    def run_migration(self, migration, resume=None):
+        self.config.app_log.warning(
+            f"Schema migration {migration.version}: {migration.description}"
+        )
+        count = 0
+        while True:
+            query = migration.query
+            if resume is not None:
+                query = {"$and": [query, {"_id": {"$gt": resume}}]}
+            documents = list(
+                self.db[migration.collection]
+                .find(query, migration.projection)
+                .sort([("_id", 1)])
+                .limit(self.batch_size)
+            )
+            if not documents:
+                break
+            migration.apply(self.db, documents)
+            resume = documents[-1]["_id"]
+            count += len(documents)
+            self.set_state(migrating=migration.version, resume=resume)
+            self.config.app_log.info(
+                f"Schema migration {migration.version}: {count} documents"
+            )
+        migration.finish(self.db)
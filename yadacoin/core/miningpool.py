@@ -4,13 +4,14 @@ import uuid
 from logging import getLogger
 from time import time
 
-from yadacoin.core.block import Block
+from yadacoin.core.block import Block, BlockCandidate
 from yadacoin.core.blockchain import Blockchain
 from yadacoin.core.chain import CHAIN
 from yadacoin.core.config import Config
 from yadacoin.core.job import Job
 from yadacoin.core.peer import Peer
 from yadacoin.core.processingqueue import BlockProcessingQueueItem
+from yadacoin.core.sharewindow import ShareWindows
 from yadacoin.core.transaction import Transaction
 from yadacoin.core.transactionutils import TU
 from yadacoin.tcpsocket.pool import StratumServer
@@ -36,12 +37,19 @@ class MiningPool(object):
             self.index = last_block.index
         self.last_refresh = 0
         self.block_factory = None
+        self.blob_header = ""
+        self.blob_parts = []
+        self.share_windows = await ShareWindows.init_async()
         await self.refresh()
         return self
 
     def get_status(self):
         """Returns pool status as explicit dict"""
-        status = {"miners": len(self.inbound), "ips": len(self.connected_ips)}
+        status = {
+            "miners": len(self.inbound),
+            "ips": len(self.connected_ips),
+            "shares": self.share_windows.to_dict(),
+        }
         return status
 
     async def process_nonce_queue(self):
@@ -70,11 +78,10 @@ class MiningPool(object):
                 await stream.write("{}\n".format(json.dumps(data)).encode())
             except:
                 pass
-            if "error" in data:
+            # a new header already sends a fresh job to every miner
+            if not await StratumServer.block_checker() and "error" in data:
                 await StratumServer.send_job(stream)
 
-            await StratumServer.block_checker()
-
             i += 1
             if i >= 1000:
                 self.config.app_log.info(
@@ -84,35 +91,40 @@ class MiningPool(object):
 
             item = self.config.processing_queues.nonce_queue.pop()
 
-    async def process_nonce(self, miner, nonce, job):
+    async def process_nonce(
+        self, miner, nonce, job, block_factory=None, last_block_time=None
+    ):
+        """Checks a nonce against the current template, or against block_factory
+        and its last_block_time when the nonce was found on an earlier one"""
+        if block_factory is None:
+            block_factory = self.block_factory
+            last_block_time = self.last_block_time
         nonce = nonce + job.extra_nonce
-        header = self.block_factory.header
+        header = block_factory.header
         self.config.app_log.debug(f"Extra Nonce for job {job.index}: {job.extra_nonce}")
         self.config.app_log.debug(f"Nonce for job {job.index}: {nonce}")
 
-        hash1 = self.block_factory.generate_hash_from_header(job.index, header, nonce)
+        hash1 = block_factory.generate_hash_from_header(job.index, header, nonce)
         self.config.app_log.info(f"Hash1 for job {job.index}: {hash1}")
 
-        if self.block_factory.index >= CHAIN.BLOCK_V5_FORK:
+        if block_factory.index >= CHAIN.BLOCK_V5_FORK:
             hash1_test = Blockchain.little_hash(hash1)
         else:
             hash1_test = hash1
 
         if (
-            int(hash1_test, 16) > self.block_factory.target
+            int(hash1_test, 16) > block_factory.target
             and self.config.network != "regnet"
             and (
-                self.block_factory.special_min
-                and int(hash1, 16) > self.block_factory.special_target
+                block_factory.special_min
+                and int(hash1, 16) > block_factory.special_target
             )
         ):
             return False
-        block_candidate = await self.block_factory.copy()
-        block_candidate.hash = hash1
-        block_candidate.nonce = nonce
+        block_candidate = BlockCandidate(block_factory, nonce, hash1)
 
         if block_candidate.special_min:
-            delta_t = int(block_candidate.time) - int(self.last_block_time)
+            delta_t = int(block_candidate.time) - int(last_block_time)
             special_target = CHAIN.special_target(
                 block_candidate.index,
                 block_candidate.target,
@@ -123,7 +135,7 @@ class MiningPool(object):
 
         if (
             block_candidate.index >= 35200
-            and (int(block_candidate.time) - int(self.last_block_time)) < 600
+            and (int(block_candidate.time) - int(last_block_time)) < 600
             and block_candidate.special_min
             and self.config.network == "mainnet"
         ):
@@ -136,61 +148,29 @@ class MiningPool(object):
 
         accepted = False
 
-        target = int(
-            "0x"
-            + (
-                f"0000000000000000000000000000000000000000000000000000000000000000"
-                + f"{hex(0x10000000000000001 // self.config.pool_diff)[2:64]}FFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF"[
-                    :64
-                ]
-            )[-64:],
-            16,
-        )
-
-        if block_candidate.index >= CHAIN.BLOCK_V5_FORK:
-            test_hash = int(Blockchain.little_hash(block_candidate.hash), 16)
-        else:
-            test_hash = int(hash1, 16)
+        target = self.get_pool_target()
+        test_hash = self.get_test_hash(block_candidate.index, block_candidate.hash)
 
         if test_hash < target:
             # submit share only now, not to slow down if we had a block
-            await self.mongo.async_db.shares.update_one(
-                {"hash": block_candidate.hash},
-                {
-                    "$set": {
-                        "address": miner.address,
-                        "address_only": miner.address_only,
-                        "index": block_candidate.index,
-                        "hash": block_candidate.hash,
-                        "nonce": nonce,
-                        "weight": job.miner_diff,
-                        "time": int(time()),
-                    }
-                },
-                upsert=True,
+            await self.record_share(
+                miner,
+                block_candidate.index,
+                block_candidate.hash,
+                nonce,
+                job.miner_diff,
             )
 
             accepted = True
 
-        if block_candidate.index >= CHAIN.BLOCK_V5_FORK:
-            test_hash = int(Blockchain.little_hash(block_candidate.hash), 16)
-        else:
-            test_hash = int(block_candidate.hash, 16)
-
         if test_hash < int(block_candidate.target) or self.config.network == "regnet":
             block_candidate.signature = self.config.BU.generate_signature(
                 block_candidate.hash, self.config.private_key
             )
 
-            if header != block_candidate.header:
-                return {
-                    "hash": block_candidate.hash,
-                    "nonce": nonce,
-                    "height": block_candidate.index,
-                    "id": block_candidate.signature,
-                }
+            block = block_candidate.materialize()
             try:
-                await block_candidate.verify()
+                await block.verify()
             except Exception:
                 if accepted and self.config.network == "mainnet":
                     return {
@@ -202,7 +182,7 @@ class MiningPool(object):
 
                 return False
             # accept winning block
-            await self.accept_block(block_candidate)
+            await self.accept_block(block)
             # Conversion to dict is important, or the object may change
             self.app_log.debug("block ok")
 
@@ -229,8 +209,9 @@ class MiningPool(object):
                 block_candidate.hash, self.config.private_key
             )
 
+            block = block_candidate.materialize()
             try:
-                await block_candidate.verify()
+                await block.verify()
             except Exception as e:
                 if accepted:
                     return {
@@ -249,7 +230,7 @@ class MiningPool(object):
                 )
                 return False
             # accept winning block
-            await self.accept_block(block_candidate)
+            await self.accept_block(block)
             # Conversion to dict is important, or the object may change
             self.app_log.debug("block ok - special_min")
 
@@ -268,6 +249,68 @@ class MiningPool(object):
                 "id": block_candidate.signature,
             }
 
+    def get_pool_target(self):
+        """Share target matching the pool difficulty"""
+        return int(
+            "0x"
+            + (
+                f"0000000000000000000000000000000000000000000000000000000000000000"
+                + f"{hex(0x10000000000000001 // self.config.pool_diff)[2:64]}FFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF"[
+                    :64
+                ]
+            )[-64:],
+            16,
+        )
+
+    def get_test_hash(self, index, block_hash):
+        if index >= CHAIN.BLOCK_V5_FORK:
+            return int(Blockchain.little_hash(block_hash), 16)
+        return int(block_hash, 16)
+
+    async def record_share(
+        self, miner, index, block_hash, nonce, weight, share_time=None
+    ):
+        """Stores an accepted share, a share already stored under the same hash is ignored"""
+        share_time = share_time or int(time())
+        result = await self.mongo.async_db.shares.update_one(
+            {"hash": block_hash},
+            {
+                "$set": {
+                    "address": miner.address,
+                    "address_only": miner.address_only,
+                    "index": index,
+                    "hash": block_hash,
+                    "nonce": nonce,
+                    "weight": weight,
+                    "time": share_time,
+                }
+            },
+            upsert=True,
+        )
+        if result.upserted_id is None:
+            return
+        self.share_windows.record(miner, share_time)
+        # payout weight, summed per height and address for the pool payer
+        await self.mongo.async_db.share_totals.update_one(
+            {"index": index, "address": miner.address_only},
+            {
+                "$inc": {
+                    "difficulty": float(CHAIN.MAX_TARGET - int(block_hash, 16)),
+                    "shares": 1,
+                }
+            },
+            upsert=True,
+        )
+
+    async def start_share_totals(self, index):
+        """Marks the share totals of a height as complete when the pool starts
+        it before any share is stored, so the payer can trust them as they are"""
+        if await self.mongo.async_db.shares.find_one({"index": index}, {"_id": 1}):
+            return
+        await self.mongo.async_db.share_totals_heights.update_one(
+            {"index": index}, {"$set": {"index": index}}, upsert=True
+        )
+
     async def refresh(self):
         """Refresh computes a new bloc to mine. The block is stored in self.block_factory and contains
         the transactions at the time of the refresh. Since tx hash is in the header, a refresh here means we have to
@@ -278,13 +321,16 @@ class MiningPool(object):
                 return
             self.refreshing = True
             await self.config.LatestBlock.block_checker()
+            index = self.config.LatestBlock.block.index + 1
             if self.block_factory:
                 self.last_block_time = int(self.block_factory.time)
+            if not self.block_factory or self.block_factory.index != index:
+                await self.start_share_totals(index)
             self.block_factory = await self.create_block(
                 await self.get_pending_transactions(),
                 self.config.public_key,
                 self.config.private_key,
-                index=self.config.LatestBlock.block.index + 1,
+                index=index,
             )
             self.block_factory.header = self.block_factory.generate_header()
             self.refreshing = False
@@ -296,7 +342,13 @@ class MiningPool(object):
             raise
 
     async def create_block(self, transactions, public_key, private_key, index):
-        return await Block.generate(transactions, public_key, private_key, index=index)
+        return await Block.generate(
+            transactions,
+            public_key,
+            private_key,
+            index=index,
+            merkle_tree=getattr(self.block_factory, "merkle_tree", None),
+        )
 
     async def block_to_mine_info(self):
         """Returns info for current block to mine"""
@@ -343,7 +395,11 @@ class MiningPool(object):
         job_id = str(uuid.uuid4())
         extra_nonce = str(random.randrange(100001, 999999))
         header = self.block_factory.header
-        blob = header.encode().hex().replace("7b6e6f6e63657d", "00000000" + extra_nonce)
+        if self.blob_header != header:
+            # encoded once per header, only the extra nonce differs between miners
+            self.blob_parts = header.encode().hex().split("7b6e6f6e63657d")
+            self.blob_header = header
+        blob = ("00000000" + extra_nonce).join(self.blob_parts)
 
         lower_agent = agent.lower()
 
@@ -371,8 +427,7 @@ class MiningPool(object):
             "target": target,  # can only be 16 characters long
             "blob": blob,
             "seed_hash": seed_hash,
-            "height": self.config.LatestBlock.block.index
-            + 1,  # This is the height of the one we are mining
+            "height": self.block_factory.index,  # This is the height of the one we are mining
             "extra_nonce": extra_nonce,
             "miner_diff": miner_diff,
             "algo": "rx/yada",
@@ -6,10 +6,6 @@ from yadacoin.core.config import Config
 from yadacoin.core.transaction import NotEnoughMoneyException, Transaction
 
 
-class NonMatchingDifficultyException(Exception):
-    pass
-
-
 class PartialPayoutException(Exception):
     pass
 
@@ -32,40 +28,22 @@ class PoolPayer(object):
             if not already_paid_height:
                 already_paid_height = {}
 
-        won_blocks = self.config.mongo.async_db.blocks.aggregate(
-            [
-                {
-                    "$match": {
-                        "transactions": {
-                            "$elemMatch": {
-                                "inputs.0": {"$exists": False},
-                            }
-                        },
-                        "transactions.outputs.to": self.config.address,
-                        "index": {"$gt": already_paid_height.get("index", 0)},
-                    }
-                },
-                {"$unwind": "$transactions"},
-                {
-                    "$match": {
-                        "transactions.inputs.0": {"$exists": False},
-                        "transactions.outputs.to": self.config.address,
+        won_blocks = self.config.mongo.async_db.blocks.find(
+            {
+                "transactions": {
+                    "$elemMatch": {
+                        "inputs.0": {"$exists": False},
+                        "outputs.to": self.config.address,
                     }
                 },
-                {"$sort": {"index": 1}},
-            ]
-        )
+                "index": {"$gt": already_paid_height.get("index", 0)},
+            },
+            {"_id": 0},
+        ).sort([("index", 1)])
 
         ready_blocks = []
         do_payout = False
         async for won_block in won_blocks:
-            won_block = await self.config.mongo.async_db.blocks.find_one(
-                {
-                    "index": won_block["index"],
-                    "id": won_block["id"],
-                    "hash": won_block["hash"],
-                }
-            )
             won_block = await Block.from_dict(won_block)
             coinbase = won_block.get_coinbase()
             if coinbase.outputs[0].to != self.config.address:
@@ -105,6 +83,12 @@ class PoolPayer(object):
                 await self.config.mongo.async_db.shares.delete_many(
                     {"index": block.index}
                 )
+                await self.config.mongo.async_db.share_totals.delete_many(
+                    {"index": block.index}
+                )
+                await self.config.mongo.async_db.share_totals_heights.delete_many(
+                    {"index": block.index}
+                )
                 continue
 
             if self.config.debug:
@@ -254,19 +238,18 @@ class PoolPayer(object):
         await self.broadcast_transaction(transaction)
 
     async def get_share_list_for_height(self, index):
-        raw_shares = []
-        async for x in self.config.mongo.async_db.shares.find(
-            {"index": index, "address": {"$ne": None}}
-        ).sort([("index", 1)]):
-            raw_shares.append(x)
-        if not raw_shares:
+        totals = await self.get_share_totals_for_height(index)
+        if not totals:
             return False
-        total_difficulty = self.get_difficulty([x for x in raw_shares])
+        total_difficulty = sum([x["difficulty"] for x in totals])
         shares = {}
-        for share in raw_shares:
-            address = share["address"].split(".")[0]
+        for x in totals:
+            address = x["address"]
             if not self.config.address_is_valid(address):
                 await self.config.mongo.async_db.shares.delete_many(
+                    {"$or": [{"address": address}, {"address_only": address}]}
+                )
+                await self.config.mongo.async_db.share_totals.delete_many(
                     {"address": address}
                 )
                 raise Exception(
@@ -274,25 +257,54 @@ class PoolPayer(object):
                         address
                     )
                 )
+            shares[address] = {
+                "difficulty": x["difficulty"],
+                "shares": x["shares"],
+                "payout_share": float(x["difficulty"]) / float(total_difficulty),
+            }
+        return shares
 
-            if address not in shares:
-                shares[address] = {
-                    "blocks": [],
-                }
-            shares[address]["blocks"].append(share)
+    async def get_share_totals_for_height(self, index):
+        """Pre-summed share weight per address, recorded by the pool as shares are accepted.
+        Heights not marked complete, such as ones with shares recorded before the totals
+        existed, are summed once from the raw shares.
+        """
+        if not await self.config.mongo.async_db.share_totals_heights.find_one(
+            {"index": index}
+        ):
+            return await self.rebuild_share_totals_for_height(index)
+        return await self.config.mongo.async_db.share_totals.find(
+            {"index": index}, {"_id": 0}
+        ).to_list(None)
 
-        add_up = 0
-        for address, item in shares.items():
-            test_difficulty = self.get_difficulty(item["blocks"])
-            shares[address]["payout_share"] = float(test_difficulty) / float(
-                total_difficulty
-            )
-            add_up += test_difficulty
+    async def rebuild_share_totals_for_height(self, index):
+        self.app_log.info("rebuilding share totals for height {}".format(index))
+        raw_shares = {}
+        async for x in self.config.mongo.async_db.shares.find(
+            {"index": index, "address": {"$ne": None}},
+            {"_id": 0, "address": 1, "hash": 1},
+        ):
+            raw_shares.setdefault(x["address"].split(".")[0], []).append(x)
 
-        if add_up == total_difficulty:
-            return shares
-        else:
-            raise NonMatchingDifficultyException()
+        totals = []
+        for address, blocks in raw_shares.items():
+            totals.append(
+                {
+                    "index": index,
+                    "address": address,
+                    "difficulty": float(self.get_difficulty(blocks)),
+                    "shares": len(blocks),
+                }
+            )
+        await self.config.mongo.async_db.share_totals.delete_many({"index": index})
+        if totals:
+            await self.config.mongo.async_db.share_totals.insert_many(
+                [x.copy() for x in totals]
+            )
+        await self.config.mongo.async_db.share_totals_heights.update_one(
+            {"index": index}, {"$set": {"index": index}}, upsert=True
+        )
+        return totals
 
     def get_difficulty(self, blocks):
         difficulty = 0
@@ -322,11 +334,10 @@ class PoolPayer(object):
 
     async def broadcast_transaction(self, transaction):
         self.app_log.debug(f"broadcast_transaction {transaction.transaction_signature}")
+        params = {"transaction": transaction.to_dict()}
         async for peer_stream in self.config.peer.get_sync_peers():
-            await self.config.nodeShared.write_params(
-                peer_stream, "newtxn", {"transaction": transaction.to_dict()}
-            )
+            await self.config.nodeShared.write_params(peer_stream, "newtxn", params)
             if peer_stream.peer.protocol_version > 1:
                 self.config.nodeClient.retry_messages[
                     (peer_stream.peer.rid, "newtxn", transaction.transaction_signature)
-                ] = {"transaction": transaction.to_dict()}
+                ] = params
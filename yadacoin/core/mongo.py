@@ -1,10 +1,19 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 from time import time
+from traceback import format_exc
+from types import SimpleNamespace
 
 from motor.motor_tornado import MotorClient
-from pymongo import ASCENDING, DESCENDING, IndexModel, MongoClient
+from pymongo import MongoClient
 from pymongo.monitoring import CommandListener
 
 from yadacoin.core.config import Config
+from yadacoin.core.indexes import Indexes
+from yadacoin.core.metrics import Histogram
+from yadacoin.core.migrations import Migrations
 
 
 class Mongo(object):
@@ -38,362 +47,14 @@ class Mongo(object):
             self.db.blocks.find_one()
         except Exception as e:
             raise e
+        startup_timer = getattr(self.config, "startup_timer", None)
+        if startup_timer:
+            startup_timer.mark("mongo connect")
 
-        __id = IndexModel([("id", ASCENDING)], name="__id", unique=True)
-        __hash = IndexModel([("hash", ASCENDING)], name="__hash")
-        __time = IndexModel([("time", ASCENDING)], name="__time")
-        __index = IndexModel([("index", ASCENDING)], name="__index")
-        __to = IndexModel([("transactions.outputs.to", ASCENDING)], name="__to")
-        __value = IndexModel(
-            [("transactions.outputs.value", ASCENDING)], name="__value"
-        )
-        __txn_id = IndexModel([("transactions.id", ASCENDING)], name="__txn_id")
-        __txn_hash = IndexModel([("transactions.hash", ASCENDING)], name="__txn_hash")
-        __txn_inputs_id = IndexModel(
-            [("transactions.inputs.id", ASCENDING)], name="__txn_inputs_id"
-        )
-        __txn_id_inputs_id = IndexModel(
-            [("transactions.id", ASCENDING), ("transactions.inputs.id", ASCENDING)],
-            name="__txn_id_inputs_id",
-        )
-        __txn_id_public_key = IndexModel(
-            [("transactions.id", ASCENDING), ("transactions.public_key", ASCENDING)],
-            name="__txn_id_public_key",
-        )
-        __txn_public_key = IndexModel(
-            [("transactions.public_key", ASCENDING)], name="__txn_public_key"
-        )
-        __txn_inputs_public_key = IndexModel(
-            [("transactions.inputs.public_key", ASCENDING)],
-            name="__txn_inputs_public_key",
-        )
-        __txn_inputs_address = IndexModel(
-            [("transactions.inputs.address", ASCENDING)], name="__txn_inputs_address"
-        )
-        __txn_public_key_inputs_public_key_address = IndexModel(
-            [
-                ("transactions.public_key", ASCENDING),
-                ("transactions.inputs.public_key", ASCENDING),
-                ("transactions.inputs.address", ASCENDING),
-            ],
-            name="__txn_public_key_inputs_public_key_address",
-        )
-        __public_key_index = IndexModel(
-            [("public_key", ASCENDING), ("index", DESCENDING)],
-            name="__public_key_index",
-        )
-        __public_key_time = IndexModel(
-            [
-                ("public_key", ASCENDING),
-                ("time", ASCENDING),
-            ],
-            name="__public_key_time",
-        )
-        __public_key = IndexModel([("public_key", ASCENDING)], name="__public_key")
-        __prev_hash = IndexModel([("prevHash", ASCENDING)], name="__prev_hash")
-        __txn_public_key_inputs_id = IndexModel(
-            [
-                ("transactions.public_key", ASCENDING),
-                ("transactions.inputs.id", ASCENDING),
-            ],
-            name="__txn_public_key_inputs_id",
-        )
-        __txn_rid = IndexModel([("transactions.rid", ASCENDING)], name="__txn_rid")
-        __txn_requested_rid = IndexModel(
-            [("transactions.requested_rid", ASCENDING)], name="__txn_requested_rid"
-        )
-        __txn_requester_rid = IndexModel(
-            [("transactions.requester_rid", ASCENDING)], name="__txn_requester_rid"
-        )
-        __txn_index_rid = IndexModel(
-            [("index", ASCENDING), ("transactions.rid", ASCENDING)],
-            name="__txn_index_rid",
-        )
-        __txn_index_requested_rid = IndexModel(
-            [("index", ASCENDING), ("transactions.requested_rid", ASCENDING)],
-            name="__txn_index_requested_rid",
-        )
-        __txn_index_requester_rid = IndexModel(
-            [("index", ASCENDING), ("transactions.requester_rid", ASCENDING)],
-            name="__txn_index_requester_rid",
-        )
-        __txn_time = IndexModel([("transactions.time", DESCENDING)], name="__txn_time")
-        __txn_contract_rid = IndexModel(
-            [("transactions.contract.rid", ASCENDING)], name="__txn_contract_rid"
-        )
-        __txn_rel_contract_identity_public_key = IndexModel(
-            [
-                (
-                    "transactions.relationship.smart_contract.identity.public_key",
-                    ASCENDING,
-                )
-            ],
-            name="__txn_rel_contract_identity_public_key",
-        )
-        __txn_rel_contract_expiry = IndexModel(
-            [
-                (
-                    "transactions.relationship.smart_contract.expiry",
-                    ASCENDING,
-                )
-            ],
-            name="__txn_rel_contract_expiry",
-        )
-        __updated_at = IndexModel(
-            [
-                (
-                    "updated_at",
-                    ASCENDING,
-                )
-            ],
-            name="__updated_at",
-        )
-        __txn_outputs_to_index = IndexModel(
-            [("transactions.outputs.to", ASCENDING), ("index", ASCENDING)],
-            name="__txn_outputs_to_index",
-        )
-        __txn_inputs_0 = IndexModel(
-            [("transactions.inputs.0", ASCENDING)],
-            name="__txn_inputs_0",
-        )
-        __txn_rel_smart_contract_expiry_txn_time = IndexModel(
-            [
-                ("transactions.relationship.smart_contract.expiry", ASCENDING),
-                ("transactions.time", ASCENDING),
-            ],
-            name="__txn_rel_smart_contract_expiry_txn_time",
-        )
-
-        try:
-            self.db.blocks.create_indexes(
-                [
-                    __hash,
-                    __time,
-                    __index,
-                    __id,
-                    __to,
-                    __value,
-                    __txn_id,
-                    __txn_hash,
-                    __txn_inputs_id,
-                    __txn_id_inputs_id,
-                    __txn_id_public_key,
-                    __txn_public_key,
-                    __txn_inputs_public_key,
-                    __txn_inputs_address,
-                    __txn_public_key_inputs_public_key_address,
-                    __public_key_index,
-                    __public_key_time,
-                    __public_key,
-                    __prev_hash,
-                    __txn_public_key_inputs_id,
-                    __txn_rid,
-                    __txn_requested_rid,
-                    __txn_requester_rid,
-                    __txn_index_rid,
-                    __txn_index_requested_rid,
-                    __txn_index_requester_rid,
-                    __txn_time,
-                    __txn_contract_rid,
-                    __txn_rel_contract_identity_public_key,
-                    __txn_rel_contract_expiry,
-                    __updated_at,
-                    __txn_outputs_to_index,
-                    __txn_inputs_0,
-                    __txn_rel_smart_contract_expiry_txn_time,
-                ]
-            )
-        except:
-            pass
-
-        __id = IndexModel([("id", ASCENDING)], name="__id")
-        __height = IndexModel([("height", ASCENDING)], name="__height")
-        __cache_time = IndexModel([("cache_time", ASCENDING)], name="__cache_time")
-        try:
-            self.db.unspent_cache.create_indexes([__id, __height, __cache_time])
-        except:
-            pass
-
-        __id = IndexModel([("id", ASCENDING)], name="__id")
-        __index = IndexModel([("index", ASCENDING)], name="__index")
-        __block_hash = IndexModel([("block.hash", ASCENDING)], name="__block_hash")
-        __block_prevHash_index_version = IndexModel(
-            [
-                ("block.prevHash", ASCENDING),
-                ("block.index", ASCENDING),
-                ("block.version", ASCENDING),
-            ],
-            name="__block_prevHash_index_version",
-        )
-        try:
-            self.db.consensus.create_indexes(
-                [__id, __index, __block_hash, __block_prevHash_index_version]
-            )
-        except:
-            pass
-
-        __address = IndexModel([("address", ASCENDING)], name="__address")
-        __address_desc = IndexModel([("address", DESCENDING)], name="__address_desc")
-        __address_only = IndexModel(
-            [("address_only", ASCENDING)], name="__address_only"
-        )
-        __address_only_desc = IndexModel(
-            [("address_only", DESCENDING)], name="__address_only_desc"
-        )
-        __index = IndexModel([("index", ASCENDING)], name="__index")
-        __hash = IndexModel([("hash", ASCENDING)], name="__hash")
-        __time = IndexModel([("time", DESCENDING)], name="__time")
-        try:
-            self.db.shares.create_indexes(
-                [
-                    __address,
-                    __address_desc,
-                    __address_only,
-                    __address_only_desc,
-                    __index,
-                    __hash,
-                    __time,
-                ]
-            )
-        except:
-            pass
-
-        __index = IndexModel([("index", DESCENDING)], name="__index")
-        try:
-            self.db.share_payout.create_indexes(
-                [
-                    __index,
-                ]
-            )
-        except:
-            pass
-
-        __txn_id = IndexModel([("txn.id", ASCENDING)], name="__txn_id")
-        __cache_time = IndexModel([("cache_time", ASCENDING)], name="__cache_time")
-        try:
-            self.db.transactions_by_rid_cache.create_indexes([__txn_id, __cache_time])
-        except:
-            pass
-
-        __id = IndexModel([("id", ASCENDING)], name="__id")
-        __hash = IndexModel([("hash", ASCENDING)], name="__hash")
-        __outputs_to = IndexModel([("outputs.to", ASCENDING)], name="__outputs_to")
-        __public_key = IndexModel([("public_key", ASCENDING)], name="__public_key")
-        __rid = IndexModel([("rid", ASCENDING)], name="__rid")
-        __requested_rid = IndexModel(
-            [("requested_rid", ASCENDING)], name="__requested_rid"
-        )
-        __requester_rid = IndexModel(
-            [("requester_rid", ASCENDING)], name="__requester_rid"
-        )
-        __time = IndexModel([("time", DESCENDING)], name="__time")
-        __inputs_id = IndexModel([("inputs.id", ASCENDING)], name="__inputs_id")
-        __fee_time = IndexModel(
-            [("fee", DESCENDING), ("time", ASCENDING)], name="__fee_time"
-        )
-        __rel_smart_contract = IndexModel(
-            [("relationship.smart_contract", ASCENDING)], name="__rel_smart_contract"
-        )
-        try:
-            self.db.miner_transactions.create_indexes(
-                [
-                    __id,
-                    __hash,
-                    __outputs_to,
-                    __public_key,
-                    __rid,
-                    __requested_rid,
-                    __requester_rid,
-                    __time,
-                    __inputs_id,
-                    __fee_time,
-                    __rel_smart_contract,
-                ]
-            )
-        except:
-            pass
-
-        __id = IndexModel([("txn.id", ASCENDING)], name="__id")
-        __hash = IndexModel([("txn.hash", ASCENDING)], name="__hash")
-        __index = IndexModel(
-            [("index", DESCENDING)],
-            name="__index",
-        )
-        __outputs_to = IndexModel([("txn.outputs.to", ASCENDING)], name="__outputs_to")
-        __outputs_to_index = IndexModel(
-            [("txn.outputs.to", ASCENDING), ("index", DESCENDING)],
-            name="__outputs_to_index",
-        )
-        __public_key = IndexModel([("txn.public_key", ASCENDING)], name="__public_key")
-        __rid = IndexModel([("txn.rid", ASCENDING)], name="__rid")
-        __requested_rid = IndexModel(
-            [("txn.requested_rid", ASCENDING)], name="__requested_rid"
-        )
-        __requester_rid = IndexModel(
-            [("txn.requester_rid", ASCENDING)], name="__requester_rid"
-        )
-        __time = IndexModel([("txn.time", DESCENDING)], name="__time")
-        __inputs_id = IndexModel([("txn.inputs.id", ASCENDING)], name="__inputs_id")
-        __fee_time = IndexModel(
-            [("txn.fee", DESCENDING), ("txn.time", ASCENDING)], name="__fee_time"
-        )
-        try:
-            self.db.failed_transactions.create_indexes(
-                [
-                    __id,
-                    __hash,
-                    __index,
-                    __outputs_to,
-                    __outputs_to_index,
-                    __public_key,
-                    __rid,
-                    __requested_rid,
-                    __requester_rid,
-                    __time,
-                    __inputs_id,
-                    __fee_time,
-                ]
-            )
-        except:
-            pass
-
-        __time = IndexModel([("time", ASCENDING)], name="__time")
-        __rid = IndexModel([("rid", ASCENDING)], name="__rid")
-        __username_signature = IndexModel(
-            [("username_signature", ASCENDING)], name="__username_signature"
-        )
-        __rid_username_signature = IndexModel(
-            [("rid", ASCENDING), ("username_signature", ASCENDING)],
-            name="__rid_username_signature",
-        )
-        try:
-            self.db.user_collection_last_activity.create_indexes(
-                [__time, __rid, __username_signature, __rid_username_signature]
-            )
-        except:
-            pass
-
-        __timestamp = IndexModel([("timestamp", DESCENDING)], name="__timestamp")
-        __archived = IndexModel([("archived", ASCENDING)], name="__archived")
-        __timestamp_archived = IndexModel(
-            [("timestamp", DESCENDING), ("archived", ASCENDING)],
-            name="__timestamp_archived",
-        )
-        try:
-            self.db.node_status.create_indexes(
-                [__timestamp, __archived, __timestamp_archived]
-            )
-        except:
-            raise
-
-        __time = IndexModel([("time", ASCENDING)], name="__time")
-        __stat = IndexModel([("stat", ASCENDING)], name="__stat")
-        try:
-            self.db.pool_stats.create_indexes([__time, __stat])
-        except:
-            raise
-
-        # TODO: add indexes for peers
+        self.indexes = Indexes(self.db)
+        self.indexes.start()
+        if startup_timer:
+            startup_timer.mark("index setup")
 
         if hasattr(self.config, "mongodb_username") and hasattr(
             self.config, "mongodb_password"
@@ -402,130 +63,199 @@ class Mongo(object):
                 self.config.mongodb_host,
                 username=self.config.mongodb_username,
                 password=self.config.mongodb_password,
-                event_listeners=[listener],
+                event_listeners=[telemetry],
             )
         else:
             self.async_client = MotorClient(
-                self.config.mongodb_host, event_listeners=[listener]
+                self.config.mongodb_host, event_listeners=[telemetry]
             )
         self.async_db = self.async_client[self.config.database]
         # self.async_db = self.async_client[self.config.database]
         self.async_site_db = self.async_client[self.config.site_database]
-        self.async_db.slow_queries = []
-        # convert block time from string to number
-        blocks_to_convert = self.db.blocks.find({"time": {"$type": 2}})
-        for block in blocks_to_convert:
-            self.config.app_log.warning(
-                f'Converting block time to int for block: {block["index"]}'
-            )
-            self.db.blocks.update(
-                {"index": block["index"]}, {"$set": {"time": int(block["time"])}}
-            )
+        self.telemetry = telemetry
+        self.telemetry.slow_queries = deque(
+            maxlen=getattr(self.config, "slow_query_buffer", 100)
+        )
+        Migrations(self.db).run()
+        if startup_timer:
+            startup_timer.mark("migrations")
 
-        # convert mempool transaction time from string to number
-        txns_to_convert = self.db.miner_transactions.find({"time": {"$type": 2}})
-        for txn in txns_to_convert:
-            self.config.app_log.warning(
-                f'Converting txn time to int for txn: {txn["id"]}'
-            )
-            self.db.miner_transactions.update(
-                {"id": txn["id"]}, {"$set": {"time": int(txn["time"])}}
-            )
 
-        # convert blockchain transaction time from string to number
-        blockchain_txns_to_convert = self.db.blocks.find(
-            {"transactions.time": {"$type": 2}}
-        )
-        for block in blockchain_txns_to_convert:
-            changed = False
-            for txn in block.get("transactions"):
-                changed = True
-                if "time" in txn:
-                    self.config.app_log.warning(
-                        f'Converting blockchain txn time to int for index and txn: {block["index"]} {txn["id"]}'
-                    )
-                    if txn["time"] in ["", 0, "0"]:
-                        del txn["time"]
-                    else:
-                        txn["time"] = int(txn["time"])
-            if changed:
-                self.db.blocks.update({"index": block["index"]}, {"$set": block})
-
-        too_high_reward_blocks = self.db.blocks.find({"index": {"$gte": 210000}})
-        for block in too_high_reward_blocks:
-            for txn in block["transactions"]:
-                if txn["public_key"] == block["public_key"] and len(txn["inputs"]) == 0:
-                    total_output = 0
-                    for txn_out in txn["outputs"]:
-                        total_output += txn_out["value"]
-                    if total_output >= 50:
-                        self.config.app_log.warning(
-                            f'Removing block with too high of reward: {block["index"]}'
-                        )
-                        self.db.blocks.delete_one({"index": block["index"]})
-
-
-class DeuggingListener(CommandListener):
+class QueryTelemetry(CommandListener):
+    """Always on query latency histograms by collection and query shape, and a
+    ring buffer of slow queries. Shapes that turn slow are explained in a
+    background thread at most once per explain_interval, with mongo_debug on
+    every new shape is explained once."""
+
     commands = [
         "find",
         "delete",
-        "insert_one",
         "update",
         "aggregate",
     ]
+    ignored_commands = {
+        "hello",
+        "ismaster",
+        "isMaster",
+        "ping",
+        "buildInfo",
+        "endSessions",
+        "saslStart",
+        "saslContinue",
+    }
+    max_shapes = 1000
+
+    def __init__(self):
+        self.lock = Lock()
+        self.pending = {}
+        self.shapes = {}
+        self.slow_queries = deque(maxlen=100)
+        self.slow_count = 0
+        self.explained = {}
+        self.explainer = ThreadPoolExecutor(max_workers=1)
 
     def get_collection_name(self, event):
-        if event.command_name in self.commands:
-            return event.command.get(event.command_name)
-        return None
+        if event.command_name == "getMore":
+            return event.command.get("collection")
+        collection = event.command.get(event.command_name)
+        return collection if isinstance(collection, str) else None
+
+    def get_query(self, command_name, command):
+        if command_name == "find":
+            return command.get("filter", {})
+        if command_name == "aggregate":
+            return command.get("pipeline", [])
+        if command_name == "update":
+            return [x.get("q", {}) for x in command.get("updates", [])]
+        if command_name == "delete":
+            return [x.get("q", {}) for x in command.get("deletes", [])]
+        if command_name in ("count", "distinct"):
+            return command.get("query", {})
+        return {}
+
+    def get_shape(self, query):
+        """The query with its values blanked, so queries differing only by
+        values share a histogram"""
+        if isinstance(query, dict):
+            return "{%s}" % ", ".join(
+                f"{k}: {self.get_shape(v)}" for k, v in query.items()
+            )
+        if isinstance(query, list):
+            return "[%s]" % ", ".join(
+                sorted(set(self.get_shape(item) for item in query))
+            )
+        return "?"
 
     def started(self, event):
-        if event.command_name not in self.commands:
-            return
-        config = Config()
-        if not config.mongo:
-            return
-
-        if not hasattr(config, "mongo_debug"):
-            return
-        if not config.mongo_debug:
-            return
-        event.command["start_time"] = time()
-        event.command["max_time_ms"] = config.mongo_query_timeout
-        if event.command.get(event.command_name) == "child_keys":
+        if event.command_name in self.ignored_commands:
             return
-        self.log_explain_output(event)
+        self.pending[event.request_id] = (
+            self.get_collection_name(event),
+            event.command,
+            event.database_name,
+        )
 
     def succeeded(self, event):
-        config = Config()
-        if not hasattr(config, "mongo_debug"):
-            return
-        if not config.mongo_debug:
-            return
-        if not hasattr(event, "command"):
-            return
-        self.duration = time() - event.command["start_time"]
-        self.do_logging(event.command_name, event.command)
+        self.record(event)
 
     def failed(self, event):
-        config = Config()
-        if not hasattr(config, "mongo_debug"):
-            return
-        if not config.mongo_debug:
-            return
-        self.duration = time() - event.command["start_time"]
-        self.do_logging(event.command_name, event.command)
+        self.record(event)
 
-    def do_logging(self, query_type, args, kwargs):
+    def record(self, event):
+        started = self.pending.pop(event.request_id, None)
+        if not started:
+            return
+        collection, command, database_name = started
         config = Config()
-        self.set_duration()
-        message = f"QUERY: {query_type} {self.collection} {args}, {kwargs}, duration: {self.duration}"
-        if self.duration > 3 and getattr(config, "slow_query_logging", None):
-            config.app_log.warning(f"SLOW {message}")
-            config.mongo.async_db.slow_queries.append(message)
-        else:
-            if hasattr(config, "mongo_debug") and config.mongo_debug:
-                config.app_log.debug(message)
+        duration = event.duration_micros / 1000000
+        query = self.get_query(event.command_name, command)
+        key = (collection, event.command_name, self.get_shape(query))
+        with self.lock:
+            histogram = self.shapes.get(key)
+            if histogram is None and len(self.shapes) < self.max_shapes:
+                histogram = self.shapes[key] = Histogram()
+            if histogram:
+                histogram.observe(duration)
+        mongo_debug = getattr(config, "mongo_debug", False)
+        slow = duration > getattr(config, "slow_query_threshold", 3)
+        if slow:
+            with self.lock:
+                self.slow_count += 1
+            self.slow_queries.append(
+                {
+                    "time": int(time()),
+                    "collection": collection,
+                    "command": event.command_name,
+                    "shape": key[2],
+                    "duration": "%.4f" % duration,
+                    "query": str(query)[:1000],
+                }
+            )
+            if getattr(config, "slow_query_logging", None):
+                config.app_log.warning(
+                    f"SLOW QUERY: {event.command_name} {collection} {query}, duration: {duration}"
+                )
+        elif mongo_debug:
+            config.app_log.debug(
+                f"QUERY: {event.command_name} {collection} {query}, duration: {duration}"
+            )
+        if (
+            (slow or mongo_debug)
+            and event.command_name in self.commands
+            and collection
+            and self.should_explain(key, mongo_debug)
+        ):
+            self.explainer.submit(
+                self.explain, event.command_name, command, collection, database_name
+            )
+
+    def should_explain(self, key, mongo_debug):
+        last_explain = self.explained.get(key)
+        if last_explain and (
+            mongo_debug
+            or time() - last_explain < getattr(Config(), "explain_interval", 600)
+        ):
+            return False
+        self.explained[key] = time()
+        return True
+
+    def explain(self, command_name, command, collection, database_name):
+        try:
+            self.log_explain_output(
+                SimpleNamespace(
+                    command_name=command_name,
+                    command=command,
+                    database_name=database_name,
+                )
+            )
+        except Exception:
+            Config().app_log.warning(format_exc())
+
+    async def drain(self):
+        """Waits for the explains queued so far"""
+        await asyncio.wrap_future(self.explainer.submit(lambda: None))
+
+    def to_dict(self, top=20):
+        with self.lock:
+            shapes = sorted(
+                self.shapes.items(), key=lambda item: item[1].sum, reverse=True
+            )[:top]
+        return {
+            "slow_queries": {
+                "count": self.slow_count,
+                "detail": list(self.slow_queries),
+            },
+            "query_shapes": [
+                {
+                    "collection": collection,
+                    "command": command_name,
+                    "shape": shape,
+                    "total": "%.4f" % histogram.sum,
+                    **histogram.to_dict(),
+                }
+                for (collection, command_name, shape), histogram in shapes
+            ],
+        }
 
     def log_explain_output(self, event):
         config = Config()
@@ -718,4 +448,4 @@ class DeuggingListener(CommandListener):
 
 
 # Register the profiling listener
-listener = DeuggingListener()
+telemetry = QueryTelemetry()
@@ -4,6 +4,7 @@ from yadacoin.core.block import Block
 from yadacoin.core.blockchain import Blockchain
 from yadacoin.core.config import Config
 from yadacoin.core.miner import Miner
+from yadacoin.core.scheduler import SchedulerEvents
 from yadacoin.core.transaction import Transaction
 from yadacoin.enums.modes import MODES
 
@@ -11,6 +12,13 @@ from yadacoin.enums.modes import MODES
 class ProcessingQueue:
     num_items_processed = 0
     time_sum = 0
+    # scheduler event raised when an item is queued
+    event = None
+
+    def wake(self):
+        scheduler = getattr(Config(), "scheduler", None)
+        if scheduler:
+            scheduler.wake(self.event)
 
     def time_sum_start(self):
         self.start_time = time()
@@ -41,6 +49,8 @@ class BlockProcessingQueueItem:
 
 
 class BlockProcessingQueue(ProcessingQueue):
+    event = SchedulerEvents.BLOCK_QUEUED
+
     def __init__(self):
         self.queue = {}
         self.last_popped = ()
@@ -56,6 +66,7 @@ class BlockProcessingQueue(ProcessingQueue):
             if (first_block["hash"], final_block["hash"]) == self.last_popped:
                 return
             self.queue.setdefault((first_block["hash"], final_block["hash"]), item)
+        self.wake()
         return True
 
     def pop(self):
@@ -73,6 +84,8 @@ class TransactionProcessingQueueItem:
 
 
 class TransactionProcessingQueue(ProcessingQueue):
+    event = SchedulerEvents.TXN_QUEUED
+
     def __init__(self):
         self.queue = {}
         self.last_popped = ""
@@ -81,6 +94,7 @@ class TransactionProcessingQueue(ProcessingQueue):
         if item.transaction.transaction_signature == self.last_popped:
             return
         self.queue.setdefault(item.transaction.transaction_signature, item)
+        self.wake()
         return True
 
     def pop(self):
@@ -101,6 +115,8 @@ class NonceProcessingQueueItem:
 
 
 class NonceProcessingQueue(ProcessingQueue):
+    event = SchedulerEvents.NONCE_QUEUED
+
     def __init__(self):
         self.queue = {}
         self.last_popped = ""
@@ -109,6 +125,7 @@ class NonceProcessingQueue(ProcessingQueue):
         if (item.id, item.nonce) == self.last_popped:
             return
         self.queue.setdefault((item.id, item.nonce), item)
+        self.wake()
         return True
 
     def pop(self):
@@ -0,0 +1,102 @@
+"""
+Background task scheduler, tasks run when an event they listen to is
+raised and on a fallback period in case an event was missed
+"""
+
+from logging import getLogger
+from time import time
+from traceback import format_exc
+
+from tornado.ioloop import IOLoop, PeriodicCallback
+
+from yadacoin.core.metrics import Histogram
+
+
+class SchedulerEvents:
+    TXN_QUEUED = "txn_queued"
+    BLOCK_QUEUED = "block_queued"
+    NONCE_QUEUED = "nonce_queued"
+    NEW_BLOCK = "new_block"
+
+
+class ScheduledTask:
+    def __init__(self, func, interval, events, concurrency):
+        self.func = func
+        self.name = func.__name__
+        self.interval = interval
+        self.events = events
+        self.concurrency = concurrency
+        self.running = 0
+        # woken while at its concurrency limit, runs again once a run ends
+        self.pending = False
+        self.runs = 0
+        self.wakeups = 0
+        self.last_run = 0
+        self.last_duration = 0
+        self.durations = Histogram()
+
+    def to_dict(self):
+        return {
+            "interval": self.interval,
+            "events": list(self.events),
+            "running": self.running,
+            "runs": self.runs,
+            "wakeups": self.wakeups,
+            "last_run": int(self.last_run),
+            "last_duration": "%.4f" % self.last_duration,
+            "durations": self.durations.to_dict(),
+        }
+
+
+class Scheduler:
+    def __init__(self):
+        self.app_log = getLogger("tornado.application")
+        self.tasks = {}
+        self.listeners = {}
+        self.callbacks = []
+
+    def add(self, func, interval, events=(), concurrency=1):
+        """Runs func on every event in events, and every interval seconds as a fallback"""
+        task = ScheduledTask(func, interval, events, concurrency)
+        self.tasks[task.name] = task
+        for event in events:
+            self.listeners.setdefault(event, []).append(task)
+        callback = PeriodicCallback(lambda: self.run(task), interval * 1000)
+        callback.start()
+        self.callbacks.append(callback)
+        return task
+
+    def wake(self, event):
+        for task in self.listeners.get(event, []):
+            task.wakeups += 1
+            self.run(task)
+
+    def run(self, task):
+        if task.running >= task.concurrency:
+            task.pending = True
+            return
+        task.running += 1
+        IOLoop.current().spawn_callback(self.execute, task)
+
+    async def execute(self, task):
+        start = time()
+        try:
+            await task.func()
+        except Exception:
+            self.app_log.error(format_exc())
+        task.running -= 1
+        task.runs += 1
+        task.last_run = start
+        task.last_duration = time() - start
+        task.durations.observe(task.last_duration)
+        if task.pending:
+            # wakeups during the run are coalesced into one more run
+            task.pending = False
+            self.run(task)
+
+    def stop(self):
+        for callback in self.callbacks:
+            callback.stop()
+
+    def to_dict(self):
+        return {name: task.to_dict() for name, task in self.tasks.items()}
@@ -0,0 +1,118 @@
+"""
+In memory rolling share counters used for pool and miner hashrates
+"""
+
+from time import time
+
+from yadacoin.core.config import Config
+
+
+class ShareWindow:
+    """Time bucketed ring buffer of share counts"""
+
+    bucket_seconds = 10
+
+    def __init__(self, window_seconds):
+        self.window_seconds = window_seconds
+        self.num_buckets = window_seconds // self.bucket_seconds + 1
+        self.counts = [0] * self.num_buckets
+        self.bucket_ids = [-1] * self.num_buckets
+        self.last_share_time = 0
+
+    def add(self, share_time, count=1):
+        bucket_id = int(share_time) // self.bucket_seconds
+        slot = bucket_id % self.num_buckets
+        if self.bucket_ids[slot] != bucket_id:
+            if self.bucket_ids[slot] > bucket_id:
+                # older than what the buffer still holds
+                return
+            self.bucket_ids[slot] = bucket_id
+            self.counts[slot] = 0
+        self.counts[slot] += count
+        self.last_share_time = max(self.last_share_time, int(share_time))
+
+    def count(self, since):
+        """Number of shares newer than since, at bucket resolution"""
+        first_bucket_id = int(since) // self.bucket_seconds
+        return sum(
+            count
+            for bucket_id, count in zip(self.bucket_ids, self.counts)
+            if bucket_id >= first_bucket_id
+        )
+
+
+class ShareWindows:
+    """Pool wide, per address and per worker share windows, fed as shares are accepted"""
+
+    pool_interval = 600
+
+    def __init__(self):
+        self.config = Config()
+        self.miner_interval = getattr(self.config, "miner_hashrate_seconds", 1200)
+        self.window_seconds = max(self.pool_interval, self.miner_interval)
+        self.pool = ShareWindow(self.window_seconds)
+        self.addresses = {}
+        self.workers = {}
+        self.last_prune = time()
+
+    @classmethod
+    async def init_async(cls):
+        self = cls()
+        # cold start, every later share is recorded as it is accepted
+        async for share in self.config.mongo.async_db.shares.find(
+            {"time": {"$gte": time() - self.window_seconds}},
+            {"_id": 0, "address": 1, "address_only": 1, "time": 1},
+        ):
+            if share.get("address"):
+                self.add(
+                    share["address"],
+                    share.get("address_only") or share["address"],
+                    share["time"],
+                )
+        return self
+
+    def add(self, address, address_only, share_time):
+        self.pool.add(share_time)
+        self.addresses.setdefault(address_only, ShareWindow(self.window_seconds)).add(
+            share_time
+        )
+        self.workers.setdefault(address, ShareWindow(self.window_seconds)).add(
+            share_time
+        )
+
+    def record(self, miner, share_time=None):
+        share_time = share_time or int(time())
+        self.add(miner.address, miner.address_only, share_time)
+        if share_time - self.last_prune > self.window_seconds:
+            self.prune(share_time)
+
+    def prune(self, now):
+        """Drops miners without a share in the window so idle workers do not pile up"""
+        for windows in (self.addresses, self.workers):
+            for address, window in list(windows.items()):
+                if now - window.last_share_time > self.window_seconds:
+                    del windows[address]
+        self.last_prune = now
+
+    def pool_hash_rate(self):
+        shares_count = self.pool.count(time() - self.pool_interval)
+        return (shares_count * self.config.pool_diff) / self.pool_interval
+
+    def miner_hash_rate(self, address):
+        """Hashrate over the window ending at the last share of the address or worker,
+        None when the address has no share in memory"""
+        if "." in address:
+            window = self.workers.get(address)
+        else:
+            window = self.addresses.get(address)
+        if not window:
+            return None
+        number_of_shares = window.count(window.last_share_time - self.miner_interval)
+        return (number_of_shares * self.config.pool_diff) / self.miner_interval
+
+    def to_dict(self):
+        return {
+            "hashes_per_second": self.pool_hash_rate(),
+            "addresses": len(self.addresses),
+            "workers": len(self.workers),
+        }
@@ -67,6 +67,65 @@ class TransactionConsts(Enum):
 
 
 class Transaction(object):
+    # Memory optimization
+    __slots__ = (
+        "_config",
+        "_contract_generated",
+        "_hash",
+        "time",
+        "rid",
+        "transaction_signature",
+        "relationship",
+        "relationship_hash",
+        "public_key",
+        "dh_public_key",
+        "fee",
+        "masternode_fee",
+        "requester_rid",
+        "requested_rid",
+        "hash",
+        "inputs",
+        "outputs",
+        "extra_blocks",
+        "seed_gateway_rid",
+        "seed_rid",
+        "version",
+        "coinbase",
+        "miner_signature",
+        "never_expire",
+        "private",
+        "exact_match",
+        # only set by generate
+        "username_signature",
+        "username",
+        "private_key",
+        "dh_private_key",
+        "value",
+        "to",
+        "no_relationship",
+    )
+
+    app_log = getLogger("tornado.application")
+
+    # read by get_hash_preimage, setting one of them drops the cached hash
+    hashed_attributes = frozenset(
+        (
+            "public_key",
+            "time",
+            "dh_public_key",
+            "rid",
+            "relationship",
+            "relationship_hash",
+            "fee",
+            "masternode_fee",
+            "requester_rid",
+            "requested_rid",
+            "inputs",
+            "outputs",
+            "version",
+        )
+    )
+
     def __init__(
         self,
         txn_time=0,
@@ -94,9 +153,8 @@ class Transaction(object):
         masternode_fee=0.0,
         exact_match=False,
     ):
-        self.app_log = getLogger("tornado.application")
-        self.config = Config()
-        self.mongo = self.config.mongo
+        self._hash = None
+        self._config = None
         if not txn_time:
             txn_time = 0
         self.time = txn_time if isinstance(txn_time, int) else int(txn_time)
@@ -151,6 +209,27 @@ class Transaction(object):
         self.private = private
         self.exact_match = exact_match
 
+    @property
+    def config(self):
+        # the current Config unless one was set, not looked up per instance
+        if self._config is None:
+            return Config()
+        return self._config
+
+    @config.setter
+    def config(self, value):
+        self._config = value
+
+    @property
+    def mongo(self):
+        return self.config.mongo
+
+    def __setattr__(self, name, value):
+        # inputs and outputs changed in place are not seen, assign a new list
+        super().__setattr__(name, value)
+        if name in self.hashed_attributes:
+            super().__setattr__("_hash", None)
+
     @classmethod
     async def generate(
         cls,
@@ -183,9 +262,6 @@ class Transaction(object):
         masternode_fee=0.0,
     ):
         cls_inst = cls()
-        cls_inst.config = Config()
-        cls_inst.mongo = cls_inst.config.mongo
-        cls_inst.app_log = getLogger("tornado.application")
         cls_inst.username_signature = username_signature
         cls_inst.username = username
         cls_inst.rid = rid
@@ -631,7 +707,8 @@ class Transaction(object):
                     )
                 )
 
-    async def generate_hash(self):
+    async def get_hash_preimage(self):
+        """The string generate_hash hashes, only its hash is kept"""
         from yadacoin.contracts.base import Contract
 
         inputs_concat = await self.get_input_hashes()
@@ -647,25 +724,19 @@ class Transaction(object):
                     raise InvalidRelationshipHashException()
             else:
                 relationship_hash = self.relationship_hash
-            hashout = (
-                hashlib.sha256(
-                    (
-                        self.public_key
-                        + str(self.time)
-                        + self.dh_public_key
-                        + self.rid
-                        + relationship_hash
-                        + "{0:.8f}".format(self.fee)
-                        + "{0:.8f}".format(self.masternode_fee)
-                        + self.requester_rid
-                        + self.requested_rid
-                        + inputs_concat
-                        + outputs_concat
-                        + str(self.version)
-                    ).encode("utf-8")
-                )
-                .digest()
-                .hex()
+            preimage = (
+                self.public_key
+                + str(self.time)
+                + self.dh_public_key
+                + self.rid
+                + relationship_hash
+                + "{0:.8f}".format(self.fee)
+                + "{0:.8f}".format(self.masternode_fee)
+                + self.requester_rid
+                + self.requested_rid
+                + inputs_concat
+                + outputs_concat
+                + str(self.version)
             )
         elif self.version == 4:
             if relationship:
@@ -674,82 +745,64 @@ class Transaction(object):
                     raise InvalidRelationshipHashException()
             else:
                 relationship_hash = self.relationship_hash
-            hashout = (
-                hashlib.sha256(
-                    (
-                        self.public_key
-                        + str(self.time)
-                        + self.dh_public_key
-                        + self.rid
-                        + relationship_hash
-                        + "{0:.8f}".format(self.fee)
-                        + self.requester_rid
-                        + self.requested_rid
-                        + inputs_concat
-                        + outputs_concat
-                        + str(self.version)
-                    ).encode("utf-8")
-                )
-                .digest()
-                .hex()
+            preimage = (
+                self.public_key
+                + str(self.time)
+                + self.dh_public_key
+                + self.rid
+                + relationship_hash
+                + "{0:.8f}".format(self.fee)
+                + self.requester_rid
+                + self.requested_rid
+                + inputs_concat
+                + outputs_concat
+                + str(self.version)
             )
         elif self.version == 3:
-            hashout = (
-                hashlib.sha256(
-                    (
-                        self.public_key
-                        + str(self.time)
-                        + self.dh_public_key
-                        + self.rid
-                        + relationship
-                        + "{0:.8f}".format(self.fee)
-                        + self.requester_rid
-                        + self.requested_rid
-                        + inputs_concat
-                        + outputs_concat
-                        + str(self.version)
-                    ).encode("utf-8")
-                )
-                .digest()
-                .hex()
+            preimage = (
+                self.public_key
+                + str(self.time)
+                + self.dh_public_key
+                + self.rid
+                + relationship
+                + "{0:.8f}".format(self.fee)
+                + self.requester_rid
+                + self.requested_rid
+                + inputs_concat
+                + outputs_concat
+                + str(self.version)
             )
         elif self.version == 2:
-            hashout = (
-                hashlib.sha256(
-                    (
-                        self.public_key
-                        + str(self.time)
-                        + self.dh_public_key
-                        + self.rid
-                        + relationship
-                        + "{0:.8f}".format(self.fee)
-                        + self.requester_rid
-                        + self.requested_rid
-                        + inputs_concat
-                        + outputs_concat
-                    ).encode("utf-8")
-                )
-                .digest()
-                .hex()
+            preimage = (
+                self.public_key
+                + str(self.time)
+                + self.dh_public_key
+                + self.rid
+                + relationship
+                + "{0:.8f}".format(self.fee)
+                + self.requester_rid
+                + self.requested_rid
+                + inputs_concat
+                + outputs_concat
             )
         else:
-            hashout = (
-                hashlib.sha256(
-                    (
-                        self.dh_public_key
-                        + self.rid
-                        + self.relationship
-                        + "{0:.8f}".format(self.fee)
-                        + self.requester_rid
-                        + self.requested_rid
-                        + inputs_concat
-                        + outputs_concat
-                    ).encode("utf-8")
-                )
-                .digest()
-                .hex()
+            preimage = (
+                self.dh_public_key
+                + self.rid
+                + self.relationship
+                + "{0:.8f}".format(self.fee)
+                + self.requester_rid
+                + self.requested_rid
+                + inputs_concat
+                + outputs_concat
             )
-        return hashout
+        return preimage
+
+    async def generate_hash(self):
+        if self._hash is None:
+            preimage = await self.get_hash_preimage()
+            self._hash = hashlib.sha256(preimage.encode("utf-8")).digest().hex()
+        return self._hash
 
     async def get_input_hashes(self):
         return "".join(
@@ -935,6 +988,8 @@ class Transaction(object):
 
 
 class Input(object):
+    __slots__ = ("id",)
+
     def __init__(self, signature):
         self.id = signature
 
@@ -949,17 +1004,17 @@ class Input(object):
 
 
 class ExternalInput(Input):
+    __slots__ = ("public_key", "address", "signature")
+
     def __init__(self, public_key, address, txn_id, signature):
         # TODO: error, superclass init missing
-        self.config = Config()
-        self.mongo = self.config.mongo
         self.public_key = public_key
         self.id = txn_id
         self.signature = signature
         self.address = address
 
     async def verify(self):
-        txn = await self.config.BU.get_transaction_by_id(self.id, instance=True)
+        txn = await Config().BU.get_transaction_by_id(self.id, instance=True)
         result = verify_signature(
             base64.b64decode(self.signature),
             self.id.encode("utf-8"),
@@ -988,6 +1043,8 @@ class ExternalInput(Input):
 
 
 class Output(object):
+    __slots__ = ("to", "value")
+
     def __init__(self, to, value):
         self.to = to
         self.value = value
@@ -131,10 +131,10 @@ class TU(object):  # Transaction Utilities
             await config.mongo.async_db.miner_transactions.insert_one(
                 transaction.to_dict()
             )
+            # one message for every peer, it is serialized on each write
+            params = {"transaction": transaction.to_dict()}
             async for peer_stream in config.peer.get_sync_peers():
-                await config.nodeShared.write_params(
-                    peer_stream, "newtxn", {"transaction": transaction.to_dict()}
-                )
+                await config.nodeShared.write_params(peer_stream, "newtxn", params)
                 if peer_stream.peer.protocol_version > 1:
                     config.nodeClient.retry_messages[
                         (
@@ -142,7 +142,7 @@ class TU(object):  # Transaction Utilities
                             "newtxn",
                             transaction.transaction_signature,
                         )
-                    ] = {"transaction": transaction.to_dict()}
+                    ] = params
         return transaction.to_dict()
 
     @classmethod
@@ -16,8 +16,13 @@ from yadacoin.enums.modes import MODES
 class BaseHandler(RequestHandler):
     """Common ancestor for all route handlers"""
 
+    # seconds a GET response is served from the response cache, 0 disables it.
+    # Only for handlers whose json does not depend on anything but the tip and arguments
+    cache_ttl = 0
+
     def initialize(self):
         self.timed_out = False
+        self.cache_key = None
         """Common init for every request"""
         origin = self.get_query_argument("origin", "*")
         if origin[-1] == "/":
@@ -74,6 +79,9 @@ class BaseHandler(RequestHandler):
                 "https://" + self.request.host + self.request.uri, permanent=False
             )
 
+        if self.cache_ttl and not self._finished:
+            self.write_cached()
+
         # if 'Authorization' in self.request.headers:
         #     try:
         #         data = json.loads(base64.b64decode(self.request.headers['Authorization']))
@@ -95,6 +103,24 @@ class BaseHandler(RequestHandler):
         #     except:
         #         i=0
 
+    def write_cached(self):
+        """Finishes the request from the response cache when the tip did not move"""
+        response_cache = getattr(self.config, "response_cache", None)
+        if not response_cache or self.request.method != "GET":
+            return
+        self.cache_key = response_cache.make_key(self.request)
+        cached = response_cache.get(self.cache_key)
+        if not cached:
+            return
+        body, etag = cached
+        self.set_header("Content-Type", "application/json")
+        self.set_header("Etag", etag)
+        if self.check_etag_header():
+            self.set_status(304)
+        else:
+            self.write(body)
+        self.finish()
+
     def finish(self, *args, **kwargs):
         if self.timed_out:
             return super().finish()
@@ -143,10 +169,41 @@ class BaseHandler(RequestHandler):
             return self.finish()
         IOLoop.current().remove_timeout(self.timeout_handle)
         json_result = json.dumps(data, indent=indent, default=json_util.default)
+        if self.cache_key and self.get_status() == 200:
+            self.config.response_cache.set(self.cache_key, json_result, self.cache_ttl)
         self.write(json_result)
         self.finish()
         return True
 
+    async def stream_as_json(self, key, items, head=None, tail=None, chunk_size=100):
+        """Streams out {**head, key: [items], **tail()} as chunked json,
+        items is an async iterable and tail is called once it is exhausted"""
+        self.set_header("Content-Type", "application/json")
+        if self.timed_out:
+            return self.render_as_json({})
+        IOLoop.current().remove_timeout(self.timeout_handle)
+        self.write("{")
+        for name, value in (head or {}).items():
+            self.write(f"{json.dumps(name)}: ")
+            self.write(json.dumps(value, default=json_util.default))
+            self.write(", ")
+        self.write(f"{json.dumps(key)}: [")
+        count = 0
+        async for item in items:
+            if count:
+                self.write(", ")
+            self.write(json.dumps(item, default=json_util.default))
+            count += 1
+            if count % chunk_size == 0:
+                await self.flush()
+        self.write("]")
+        for name, value in (tail() if tail else {}).items():
+            self.write(f", {json.dumps(name)}: ")
+            self.write(json.dumps(value, default=json_util.default))
+        self.write("}")
+        self.finish()
+        return True
+
     def render_already_json(self, data, indent=None):
         """Streams out provided json"""
         json_result = json.dumps(data, indent=indent)
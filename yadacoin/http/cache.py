@@ -0,0 +1,93 @@
+"""
+Response cache for handlers whose result only changes with the chain tip
+"""
+
+from collections import OrderedDict
+from hashlib import sha1
+from time import time
+
+from yadacoin.core.config import Config
+
+
+class ResponseCache:
+    """LRU of rendered json responses keyed by route, arguments and tip hash.
+    Every entry is dropped as soon as a new block becomes the tip."""
+
+    def __init__(self):
+        self.config = Config()
+        self.max_entries = getattr(self.config, "http_cache_entries", 1000)
+        self.max_bytes = getattr(self.config, "http_cache_bytes", 16 * 1024 * 1024)
+        self.entries = OrderedDict()
+        self.size = 0
+        self.tip = None
+        self.hits = 0
+        self.misses = 0
+
+    def get_tip(self):
+        latest_block = self.config.LatestBlock.block
+        return latest_block.hash if latest_block else None
+
+    def check_tip(self):
+        tip = self.get_tip()
+        if tip != self.tip:
+            self.clear()
+            self.tip = tip
+        return tip
+
+    def make_key(self, request):
+        tip = self.check_tip()
+        if tip is None:
+            return None
+        arguments = tuple(
+            sorted((name, tuple(values)) for name, values in request.arguments.items())
+        )
+        return (request.path, arguments, tip)
+
+    def get(self, key):
+        """Returns (body, etag) or None"""
+        if key is None or key[2] != self.check_tip():
+            return None
+        entry = self.entries.get(key)
+        if entry is None or entry["expires"] < time():
+            if entry is not None:
+                self.remove(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry["body"], entry["etag"]
+
+    def set(self, key, body, ttl):
+        if key is None or key[2] != self.check_tip():
+            # the tip moved while the response was computed
+            return
+        body = body.encode() if isinstance(body, str) else body
+        if len(body) > self.max_bytes:
+            return
+        if key in self.entries:
+            self.remove(key)
+        self.entries[key] = {
+            "body": body,
+            # same value tornado computes, so a cached and a fresh response match
+            "etag": '"%s"' % sha1(body).hexdigest(),
+            "expires": time() + ttl,
+        }
+        self.size += len(body)
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            self.remove(next(iter(self.entries)))
+
+    def remove(self, key):
+        entry = self.entries.pop(key)
+        self.size -= len(entry["body"])
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def to_dict(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -9,9 +9,12 @@ import time
 from yadacoin.core.chain import CHAIN
 from yadacoin.core.common import changetime
 from yadacoin.http.base import BaseHandler
+from yadacoin.http.pagination import KeysetPage
 
 
 class HashrateAPIHandler(BaseHandler):
+    cache_ttl = 600
+
     async def refresh(self):
         from yadacoin.core.block import Block
 
@@ -55,422 +58,149 @@ class ExplorerHandler(BaseHandler):
         )
 
 
-class ExplorerSearchHandler(BaseHandler):
-    async def get_wallet_balance(self, term):
-        re.search(r"[A-Fa-f0-9]+", term).group(0)
-        res = await self.config.mongo.async_db.blocks.count_documents(
-            {"transactions.outputs.to": term}
-        )
-        if res:
-            balance = await self.config.BU.get_wallet_balance(term)
-            return self.render_as_json(
-                {
-                    "balance": "{0:.8f}".format(balance),
-                    "resultType": "txn_outputs_to",
-                    "result": [
-                        changetime(x)
-                        async for x in self.config.mongo.async_db.blocks.find(
-                            {"transactions.outputs.to": term}, {"_id": 0}
-                        )
-                        .sort("index", -1)
-                        .limit(10)
-                    ],
-                }
-            )
-
-    async def get(self):
-        term = self.get_argument("term", False)
-        if not term:
-            self.render_as_json({})
-            return
-
-        result_type = self.get_argument("result_type", False)
-        if result_type == "get_wallet_balance":
-            try:
-                return await self.get_wallet_balance(term)
-            except Exception:
-                raise
-
-        try:
-            res = await self.config.mongo.async_db.blocks.count_documents(
-                {"index": int(term)}
-            )
-            if res:
-                return self.render_as_json(
-                    {
-                        "resultType": "block_height",
-                        "result": [
-                            changetime(x)
-                            async for x in self.config.mongo.async_db.blocks.find(
-                                {"index": int(term)}, {"_id": 0}
-                            )
-                        ],
-                    }
-                )
-        except:
-            pass
-        try:
-            res = await self.config.mongo.async_db.blocks.count_documents(
-                {"public_key": term}
-            )
-            if res:
-                return self.render_as_json(
-                    {
-                        "resultType": "block_height",
-                        "result": [
-                            changetime(x)
-                            async for x in self.config.mongo.async_db.blocks.find(
-                                {"public_key": term}, {"_id": 0}
-                            )
-                        ],
-                    }
-                )
-        except:
-            pass
-        try:
-            res = await self.config.mongo.async_db.blocks.count_documents(
-                {"transactions.public_key": term}
-            )
-            if res:
-                return self.render_as_json(
-                    {
-                        "resultType": "block_height",
-                        "result": [
-                            changetime(x)
-                            async for x in self.config.mongo.async_db.blocks.find(
-                                {"transactions.public_key": term}, {"_id": 0}
-                            )
-                        ],
-                    }
-                )
-        except:
-            pass
-        try:
-            re.search(r"[A-Fa-f0-9]{64}", term).group(0)
-            res = await self.config.mongo.async_db.blocks.count_documents(
-                {"hash": term}
-            )
-            if res:
-                return self.render_as_json(
-                    {
-                        "resultType": "block_hash",
-                        "result": [
-                            changetime(x)
-                            async for x in self.config.mongo.async_db.blocks.find(
-                                {"hash": term}, {"_id": 0}
-                            )
-                        ],
-                    }
-                )
-        except:
-            pass
-
-        try:
-            base64.b64decode(term.replace(" ", "+"))
-            res = await self.config.mongo.async_db.blocks.count_documents(
-                {"id": term.replace(" ", "+")}
-            )
-            if res:
-                return self.render_as_json(
-                    {
-                        "resultType": "block_id",
-                        "result": [
-                            changetime(x)
-                            async for x in self.config.mongo.async_db.blocks.find(
-                                {"id": term.replace(" ", "+")}, {"_id": 0}
-                            )
-                        ],
-                    }
-                )
-        except:
-            pass
-
+def classify_search_term(term):
+    """Guesses what a search term is from its format alone"""
+    if re.fullmatch(r"[0-9]{1,12}", term):
+        return "height"
+    if re.fullmatch(r"[A-Fa-f0-9]{64}", term):
+        return "hash"
+    if re.fullmatch(r"0[23][A-Fa-f0-9]{64}|04[A-Fa-f0-9]{128}", term):
+        return "public_key"
+    if re.fullmatch(r"[1-9A-HJ-NP-Za-km-z]{25,35}", term):
+        return "address"
+    if re.fullmatch(r"[A-Za-z0-9+/]{40,}={0,2}", term):
         try:
-            re.search(r"[A-Fa-f0-9]{64}", term).group(0)
-            res = await self.config.mongo.async_db.blocks.count_documents(
-                {"transactions.hash": term}
-            )
-            if res:
-                return self.render_as_json(
-                    {
-                        "resultType": "txn_hash",
-                        "result": [
-                            changetime(x)
-                            async for x in self.config.mongo.async_db.blocks.find(
-                                {"transactions.hash": term}, {"_id": 0}
-                            )
-                        ],
-                    }
-                )
-        except:
+            base64.b64decode(term)
+            return "signature"
+        except Exception:
             pass
+    return None
 
-        try:
-            re.search(r"[A-Fa-f0-9]{64}", term).group(0)
-            res = await self.config.mongo.async_db.blocks.count_documents(
-                {"transactions.rid": term}
-            )
-            if res:
-                return self.render_as_json(
-                    {
-                        "resultType": "txn_rid",
-                        "result": [
-                            changetime(x)
-                            async for x in self.config.mongo.async_db.blocks.find(
-                                {"transactions.rid": term}, {"_id": 0}
-                            )
-                        ],
-                    }
-                )
-        except:
-            pass
 
-        try:
-            base64.b64decode(term.replace(" ", "+"))
-            res = await self.config.mongo.async_db.blocks.count_documents(
-                {
-                    "$or": [
-                        {"transactions.id": term.replace(" ", "+")},
-                        {"transactions.inputs.id": term.replace(" ", "+")},
-                    ]
-                }
-            )
-            if res:
-                return self.render_as_json(
-                    {
-                        "resultType": "txn_id",
-                        "result": [
-                            changetime(x)
-                            async for x in self.config.mongo.async_db.blocks.find(
-                                {
-                                    "$or": [
-                                        {"transactions.id": term.replace(" ", "+")},
-                                        {
-                                            "transactions.inputs.id": term.replace(
-                                                " ", "+"
-                                            )
-                                        },
-                                    ]
-                                },
-                                {"_id": 0},
-                            )
-                        ],
-                    }
-                )
-        except:
-            pass
+async def prepend(first, items):
+    yield first
+    async for item in items:
+        yield item
 
-        try:
-            res = await self.get_wallet_balance(term)
-            if res:
-                return res
-        except Exception:
-            pass
 
-        try:
-            base64.b64decode(term.replace(" ", "+"))
-            res = await self.config.mongo.async_db.miner_transactions.count_documents(
-                {"id": term.replace(" ", "+")}
-            )
-            if res:
-                return self.render_as_json(
-                    {
-                        "resultType": "mempool_id",
-                        "result": [
-                            changetime(x)
-                            async for x in self.config.mongo.async_db.miner_transactions.find(
-                                {"id": term.replace(" ", "+")}, {"_id": 0}
-                            )
-                        ],
-                    }
-                )
-        except:
-            pass
+class ExplorerSearchHandler(BaseHandler):
+    # (result type, collection, field or fields of the query, streamed) per term
+    # class, tried in order, the first one with a match answers the search
+    lookups = {
+        "height": [("block_height", "blocks", "index", False)],
+        "hash": [
+            ("block_hash", "blocks", "hash", False),
+            ("txn_hash", "blocks", "transactions.hash", False),
+            ("txn_rid", "blocks", "transactions.rid", True),
+            ("mempool_hash", "miner_transactions", "hash", False),
+            ("mempool_rid", "miner_transactions", "rid", False),
+            ("failed_hash", "failed_transactions", "txn.hash", False),
+            ("failed_rid", "failed_transactions", "txn.rid", False),
+        ],
+        "public_key": [
+            ("block_height", "blocks", "public_key", True),
+            ("block_height", "blocks", "transactions.public_key", True),
+            ("mempool_public_key", "miner_transactions", "public_key", False),
+            ("failed_public_key", "failed_transactions", "txn.public_key", False),
+        ],
+        "address": [
+            ("txn_outputs_to", "blocks", "transactions.outputs.to", True),
+            ("mempool_outputs_to", "miner_transactions", "outputs.to", False),
+            ("failed_outputs_to", "failed_transactions", "txn.outputs.to", False),
+        ],
+        "signature": [
+            ("block_id", "blocks", "id", False),
+            (
+                "txn_id",
+                "blocks",
+                ("transactions.id", "transactions.inputs.id"),
+                False,
+            ),
+            ("mempool_id", "miner_transactions", "id", False),
+            ("failed_id", "failed_transactions", "txn.id", False),
+        ],
+    }
 
-        try:
-            re.search(r"[A-Fa-f0-9]{64}", term).group(0)
-            res = await self.config.mongo.async_db.miner_transactions.count_documents(
-                {"hash": term}
-            )
-            if res:
-                return self.render_as_json(
-                    {
-                        "resultType": "mempool_hash",
-                        "result": [
-                            changetime(x)
-                            async for x in self.config.mongo.async_db.miner_transactions.find(
-                                {"hash": term}, {"_id": 0}
-                            )
-                        ],
-                    }
-                )
-        except:
-            pass
+    async def get_wallet_balance(self, term):
+        async def balance():
+            balance = await self.config.BU.get_wallet_balance(term)
+            return {"balance": "{0:.8f}".format(balance)}
 
-        try:
-            re.search(r"[A-Fa-f0-9]+", term).group(0)
-            res = await self.config.mongo.async_db.miner_transactions.count_documents(
-                {"outputs.to": term}
-            )
-            if res:
-                return self.render_as_json(
-                    {
-                        "resultType": "mempool_outputs_to",
-                        "result": [
-                            changetime(x)
-                            async for x in self.config.mongo.async_db.miner_transactions.find(
-                                {"outputs.to": term}, {"_id": 0}
-                            )
-                            .sort("index", -1)
-                            .limit(10)
-                        ],
-                    }
-                )
-        except:
-            pass
+        return await self.stream_blocks(
+            "txn_outputs_to",
+            {"transactions.outputs.to": term},
+            default_limit=10,
+            head=balance,
+        )
 
+    async def stream_blocks(self, result_type, query, default_limit=None, head=None):
+        """Streams the matching blocks newest first, a page at a time when a limit is set.
+        Returns None without writing anything when the page is empty"""
         try:
-            res = await self.config.mongo.async_db.miner_transactions.count_documents(
-                {"public_key": term}
-            )
-            if res:
-                return self.render_as_json(
-                    {
-                        "resultType": "mempool_public_key",
-                        "result": [
-                            changetime(x)
-                            async for x in self.config.mongo.async_db.miner_transactions.find(
-                                {"public_key": term}, {"_id": 0}
-                            )
-                        ],
-                    }
-                )
-        except:
-            pass
-
+            page = KeysetPage.from_handler(self, default_limit)
+        except ValueError as e:
+            self.set_status(400)
+            return self.render_as_json({"status": False, "message": str(e)})
+        blocks = page.blocks(page.find_blocks(self.config.mongo.async_db.blocks, query))
         try:
-            res = await self.config.mongo.async_db.miner_transactions.count_documents(
-                {"rid": term}
-            )
-            if res:
-                return self.render_as_json(
-                    {
-                        "resultType": "mempool_rid",
-                        "result": [
-                            changetime(x)
-                            async for x in self.config.mongo.async_db.miner_transactions.find(
-                                {"rid": term}, {"_id": 0}
-                            )
-                        ],
-                    }
-                )
-        except:
-            pass
+            blocks = prepend(await blocks.__anext__(), blocks)
+        except StopAsyncIteration:
+            return None
+        return await self.stream_as_json(
+            "result",
+            (changetime(x) async for x in blocks),
+            head={**(await head() if head else {}), "resultType": result_type},
+            tail=lambda: {"next_cursor": page.next_cursor},
+        )
 
-        try:
-            base64.b64decode(term.replace(" ", "+"))
-            res = await self.config.mongo.async_db.failed_transactions.count_documents(
-                {"txn.id": term.replace(" ", "+")}
-            )
-            if res:
-                return self.render_as_json(
-                    {
-                        "resultType": "failed_id",
-                        "result": [
-                            changetime(x)
-                            async for x in self.config.mongo.async_db.failed_transactions.find(
-                                {"txn.id": term.replace(" ", "+")},
-                                {"_id": 0, "txn._id": 0},
-                            )
-                        ],
-                    }
-                )
-        except:
-            pass
+    async def find(self, collection, query, limit=None):
+        if collection == "failed_transactions":
+            projection = {"_id": 0, "txn._id": 0}
+        else:
+            projection = {"_id": 0}
+        cursor = self.config.mongo.async_db[collection].find(query, projection)
+        if limit:
+            cursor = cursor.sort("index", -1).limit(limit)
+        return [changetime(x) async for x in cursor]
 
-        try:
-            re.search(r"[A-Fa-f0-9]{64}", term).group(0)
-            res = await self.config.mongo.async_db.failed_transactions.count_documents(
-                {"txn.hash": term}
-            )
-            if res:
-                return self.render_as_json(
-                    {
-                        "resultType": "failed_hash",
-                        "result": [
-                            changetime(x)
-                            async for x in self.config.mongo.async_db.failed_transactions.find(
-                                {"txn.hash": term},
-                                {"_id": 0, "txn._id": 0},
-                            )
-                        ],
-                    }
-                )
-        except:
-            pass
+    async def get(self):
+        term = self.get_argument("term", False)
+        if not term:
+            self.render_as_json({})
+            return
 
-        try:
-            re.search(r"[A-Fa-f0-9]+", term).group(0)
-            res = await self.config.mongo.async_db.failed_transactions.count_documents(
-                {"txn.outputs.to": term}
-            )
-            if res:
-                return self.render_as_json(
-                    {
-                        "resultType": "failed_outputs_to",
-                        "result": [
-                            changetime(x)
-                            async for x in self.config.mongo.async_db.failed_transactions.find(
-                                {"txn.outputs.to": term},
-                                {"_id": 0, "txn._id": 0},
-                            )
-                            .sort("index", -1)
-                            .limit(10)
-                        ],
-                    }
+        result_type = self.get_argument("result_type", False)
+        if result_type == "get_wallet_balance":
+            return await self.get_wallet_balance(term) or self.render_as_json({})
+
+        term_class = classify_search_term(term.replace(" ", "+"))
+        if term_class == "signature":
+            term = term.replace(" ", "+")
+        elif term_class == "height":
+            term = int(term)
+
+        for result_type, collection, fields, streamed in self.lookups.get(
+            term_class, []
+        ):
+            if isinstance(fields, tuple):
+                query = {"$or": [{field: term} for field in fields]}
+            else:
+                query = {fields: term}
+            if result_type == "txn_outputs_to":
+                res = await self.get_wallet_balance(term)
+            elif streamed:
+                res = await self.stream_blocks(result_type, query)
+            else:
+                result = await self.find(
+                    collection,
+                    query,
+                    limit=10 if result_type.endswith("outputs_to") else None,
                 )
-        except:
-            pass
-
-        try:
-            res = await self.config.mongo.async_db.failed_transactions.count_documents(
-                {"txn.public_key": term}
-            )
-            if res:
-                return self.render_as_json(
-                    {
-                        "resultType": "failed_public_key",
-                        "result": [
-                            changetime(x)
-                            async for x in self.config.mongo.async_db.failed_transactions.find(
-                                {"txn.public_key": term},
-                                {"_id": 0, "txn._id": 0},
-                            )
-                        ],
-                    }
+                res = result and self.render_as_json(
+                    {"resultType": result_type, "result": result}
                 )
-        except:
-            pass
-
-        try:
-            res = await self.config.mongo.async_db.failed_transactions.count_documents(
-                {"txn.rid": term}
-            )
             if res:
-                return self.render_as_json(
-                    {
-                        "resultType": "failed_rid",
-                        "result": [
-                            changetime(x)
-                            async for x in self.config.mongo.async_db.failed_transactions.find(
-                                {"txn.rid": term},
-                                {"_id": 0, "txn._id": 0},
-                            )
-                        ],
-                    }
-                )
-        except:
-            pass
+                return res
 
         return self.render_as_json({})
 
@@ -486,6 +216,8 @@ class ExplorerGetBalance(BaseHandler):
 
 
 class ExplorerLatestHandler(BaseHandler):
+    cache_ttl = 600
+
     async def get(self):
         """Returns abstract of the latest 10 blocks"""
         res = (
@@ -501,6 +233,8 @@ class ExplorerLatestHandler(BaseHandler):
 
 
 class ExplorerLast50(BaseHandler):
+    cache_ttl = 600
+
     async def get(self):
         """Returns abstract of the latest 50 blocks miners"""
         latest = self.config.LatestBlock.block
@@ -182,15 +182,18 @@ class GraphTransactionHandler(BaseGraphHandler):
     async def get(self):
         rid = self.request.args.get("rid")
         if rid:
-            transactions = GU().get_transactions_by_rid(
-                rid,
-                self.config.get_identity().get("username_signature"),
-                rid=True,
-                raw=True,
-            )
+            transactions = [
+                x
+                async for x in GU().get_transactions_by_rid(
+                    rid,
+                    self.config.get_identity().get("username_signature"),
+                    rid=True,
+                    raw=True,
+                )
+            ]
         else:
             transactions = []
-        self.render_as_json(list(transactions))
+        self.render_as_json(transactions)
 
     async def post(self):
         await self.get_base_graph()  # TODO: did this to set username_signature, refactor this
@@ -463,7 +466,7 @@ class GraphSentMessagesHandler(BaseGraphHandler):
 class GraphGroupMessagesHandler(BaseGraphHandler):
     async def post(self):
         graph = await self.get_base_graph()
-        graph.get_group_messages()
+        await graph.get_group_messages()
         self.render_as_json(graph.to_dict())
 
 
@@ -14,6 +14,8 @@ from yadacoin.http.base import BaseHandler
 
 
 class GetLatestBlockHandler(BaseHandler):
+    cache_ttl = 600
+
     async def get(self):
         """
         :return:
@@ -98,6 +100,17 @@ class GetPeersHandler(BaseHandler):
         )
 
 
+class MetricsHandler(BaseHandler):
+    async def get(self):
+        """
+        :return: rpc metrics in the prometheus text format
+        """
+        self.set_header("Content-Type", "text/plain; version=0.0.4")
+        if self.config.rpc_metrics:
+            self.write(self.config.rpc_metrics.to_prometheus())
+        self.finish()
+
+
 class GetStatusHandler(BaseHandler):
     async def get(self):
         """
@@ -289,6 +302,8 @@ class GetMonitoringHandler(BaseHandler):
                         "_id": 0,
                         "message_sender": 0,
                         "slow_queries": 0,
+                        "query_shapes": 0,
+                        "indexes": 0,
                         "unindexed_queries": 0,
                         "transaction_tracker": 0,
                         "disconnect_tracker": 0,
@@ -324,15 +339,18 @@ class GetMonitoringHandler(BaseHandler):
             else self.config.public_key
         )
         mining_time_interval = 600
-        shares_count = await self.config.mongo.async_db.shares.count_documents(
-            {"time": {"$gte": time.time() - mining_time_interval}}, hint="__time"
-        )
-        if shares_count > 0:
-            pool_hash_rate = (
-                shares_count * self.config.pool_diff
-            ) / mining_time_interval
+        if self.config.mp:
+            pool_hash_rate = self.config.mp.share_windows.pool_hash_rate()
         else:
-            pool_hash_rate = 0
+            shares_count = await self.config.mongo.async_db.shares.count_documents(
+                {"time": {"$gte": time.time() - mining_time_interval}}, hint="__time"
+            )
+            if shares_count > 0:
+                pool_hash_rate = (
+                    shares_count * self.config.pool_diff
+                ) / mining_time_interval
+            else:
+                pool_hash_rate = 0
 
         pool_blocks_found_list = (
             await self.config.mongo.async_db.blocks.find(
@@ -369,6 +387,7 @@ NODE_HANDLERS = [
     (r"/get-peers", GetPeersHandler),
     (r"/newblock", NewBlockHandler),
     (r"/get-status", GetStatusHandler),
+    (r"/metrics", MetricsHandler),
     (r"/get-pending-transaction", GetPendingTransactionHandler),
     (r"/get-pending-transaction-ids", GetPendingTransactionIdsHandler),
     (r"/rebroadcast-transactions", RebroadcastTransactions),
@@ -0,0 +1,118 @@
+"""
+Keyset pagination over the chain with opaque cursors
+"""
+
+import base64
+import json
+
+
+def encode_cursor(height, txn_index=0):
+    return (
+        base64.urlsafe_b64encode(json.dumps([height, txn_index]).encode())
+        .decode()
+        .rstrip("=")
+    )
+
+
+def decode_cursor(cursor):
+    try:
+        height, txn_index = json.loads(
+            base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        )
+        return int(height), int(txn_index)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+class KeysetPage:
+    """One page of blocks or block transactions, newest block first and
+    transactions in block order, continuing after the row a cursor points at.
+
+    Rows are read in index order from mongo and handed out one at a time, so a
+    handler can stream any page size without holding the result."""
+
+    max_limit = 1000
+
+    def __init__(self, cursor=None, limit=None, page=0):
+        self.cursor = decode_cursor(cursor) if cursor else None
+        self.limit = min(int(limit), self.max_limit) if limit else None
+        if self.limit is not None and self.limit < 1:
+            raise ValueError("invalid limit")
+        # legacy page numbers, only without a cursor
+        self.skip = page * self.limit if page and self.limit and not cursor else 0
+        self.next_cursor = None
+
+    @classmethod
+    def from_handler(cls, handler, default_limit=None):
+        return cls(
+            cursor=handler.get_query_argument("cursor", None),
+            limit=handler.get_query_argument("limit", default_limit),
+            page=int(handler.get_query_argument("page", 1)) - 1,
+        )
+
+    def block_query(self, query):
+        if self.cursor:
+            query = {"$and": [query, {"index": {"$lt": self.cursor[0]}}]}
+        return query
+
+    def find_blocks(self, collection, query, projection=None):
+        cursor = collection.find(
+            self.block_query(query), projection or {"_id": 0}
+        ).sort([("index", -1)])
+        if self.skip:
+            cursor = cursor.skip(self.skip)
+        if self.limit:
+            cursor = cursor.limit(self.limit + 1)
+        return cursor
+
+    def transactions_pipeline(self, block_match, txn_match):
+        """Aggregation unwinding the transactions of the matched blocks, the
+        index sort is kept through $unwind so $limit ends the scan early"""
+        if self.cursor:
+            height, txn_index = self.cursor
+            block_match = {"$and": [block_match, {"index": {"$lte": height}}]}
+        pipeline = [
+            {"$match": block_match},
+            {"$sort": {"index": -1}},
+            {"$unwind": {"path": "$transactions", "includeArrayIndex": "txn_index"}},
+            {"$match": txn_match},
+        ]
+        if self.cursor:
+            pipeline.append(
+                {
+                    "$match": {
+                        "$or": [
+                            {"index": {"$lt": height}},
+                            {"txn_index": {"$gt": txn_index}},
+                        ]
+                    }
+                }
+            )
+        if self.skip:
+            pipeline.append({"$skip": self.skip})
+        if self.limit:
+            pipeline.append({"$limit": self.limit + 1})
+        pipeline.append(
+            {"$project": {"_id": 0, "index": 1, "txn_index": 1, "transactions": 1}}
+        )
+        return pipeline
+
+    async def blocks(self, cursor):
+        count = 0
+        async for block in cursor:
+            if self.limit and count == self.limit:
+                self.next_cursor = encode_cursor(last["index"])
+                break
+            last = block
+            count += 1
+            yield block
+
+    async def transactions(self, aggregate):
+        count = 0
+        async for row in aggregate:
+            if self.limit and count == self.limit:
+                self.next_cursor = encode_cursor(last["index"], last["txn_index"])
+                break
+            last = row
+            count += 1
+            yield row["transactions"]
@@ -46,6 +46,12 @@ class PoolPayoutsHandler(BaseHandler):
 class PoolHashRateHandler(BaseHandler):
     async def get(self):
         address = self.get_query_argument("address")
+        if self.config.mp:
+            miner_hashrate = self.config.mp.share_windows.miner_hash_rate(address)
+            if miner_hashrate is not None:
+                return self.render_as_json({"miner_hashrate": int(miner_hashrate)})
+
+        # not in memory, idle miner or no pool running here
         query = {"address": address}
         if "." not in address:
             query = {
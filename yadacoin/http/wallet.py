@@ -19,6 +19,7 @@ from yadacoin.core.transaction import Transaction
 from yadacoin.core.transactionutils import TU
 from yadacoin.decorators.jwtauth import jwtauthwallet
 from yadacoin.http.base import BaseHandler
+from yadacoin.http.pagination import KeysetPage
 
 
 class WalletHandler(BaseHandler):
@@ -109,8 +110,20 @@ class GetAddressesHandler(BaseHandler):
         async for x in self.config.mongo.async_db.child_keys.find():
             addresses.append(x["address"])
         addresses.append(self.config.address)
+        addresses = list(set(addresses))
 
-        return self.render_as_json({"addresses": list(set(addresses))})
+        if self.get_query_argument("balances", None):
+            balances = await self.config.BU.get_wallet_balances(addresses)
+            return self.render_as_json(
+                {
+                    "addresses": addresses,
+                    "balances": {
+                        address: "{0:.8f}".format(balance)
+                        for address, balance in balances.items()
+                    },
+                }
+            )
+        return self.render_as_json({"addresses": addresses})
 
 
 class GetBalanceSum(BaseHandler):
@@ -120,9 +133,8 @@ class GetBalanceSum(BaseHandler):
         if not addresses:
             self.render_as_json({})
             return
-        balance = 0.0
-        for address in addresses:
-            balance += await self.config.BU.get_wallet_balance(address)
+        balances = await self.config.BU.get_wallet_balances(addresses)
+        balance = sum(balances[address] for address in addresses)
         return self.render_as_json("{0:.8f}".format(balance))
 
 
@@ -327,37 +339,26 @@ class SentPendingTransactionsView(BaseHandler):
 class SentTransactionsView(BaseHandler):
     async def get(self):
         public_key = self.get_query_argument("public_key")
-        page = int(self.get_query_argument("page", 1)) - 1
         address = str(P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(public_key)))
+        try:
+            page = KeysetPage.from_handler(self, default_limit=10)
+        except ValueError as e:
+            self.set_status(400)
+            return self.render_as_json({"status": False, "message": str(e)})
+        match = {
+            "transactions.outputs.to": address,
+            "transactions.inputs.0": {"$exists": True},
+            "transactions.public_key": public_key,
+            "transactions.outputs.value": {"$gt": 0},
+        }
         txns = self.config.mongo.async_db.blocks.aggregate(
-            [
-                {
-                    "$match": {
-                        "transactions.outputs.to": address,
-                        "transactions.inputs.0": {"$exists": True},
-                        "transactions.public_key": public_key,
-                        "transactions.outputs.value": {"$gt": 0},
-                    }
-                },
-                {"$unwind": "$transactions"},
-                {
-                    "$match": {
-                        "transactions.outputs.to": address,
-                        "transactions.inputs.0": {"$exists": True},
-                        "transactions.public_key": public_key,
-                        "transactions.outputs.value": {"$gt": 0},
-                    }
-                },
-                {"$sort": {"transactions.time": -1}},
-                {"$skip": page * 10},
-                {"$limit": 10},
-            ]
+            page.transactions_pipeline(match, match)
         )
 
-        return self.render_as_json(
-            {
-                "past_transactions": [x["transactions"] async for x in txns],
-            }
+        return await self.stream_as_json(
+            "past_transactions",
+            page.transactions(txns),
+            tail=lambda: {"next_cursor": page.next_cursor},
         )
 
 
@@ -388,92 +389,108 @@ class ReceivedPendingTransactionsView(BaseHandler):
 class ReceivedTransactionsView(BaseHandler):
     async def get(self):
         public_key = self.get_query_argument("public_key")
-        page = int(self.get_query_argument("page", 1)) - 1
         address = str(P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(public_key)))
+        try:
+            page = KeysetPage.from_handler(self, default_limit=10)
+        except ValueError as e:
+            self.set_status(400)
+            return self.render_as_json({"status": False, "message": str(e)})
 
         txns = self.config.mongo.async_db.blocks.aggregate(
-            [
+            page.transactions_pipeline(
                 {
-                    "$match": {
-                        "transactions.outputs.to": address,
-                        "transactions.outputs.value": {"$gt": 0},
-                        "$or": [
-                            {
-                                "transactions": {
-                                    "$elemMatch": {"public_key": {"$ne": public_key}}
-                                }
-                            },
-                            {
-                                "public_key": public_key,
-                                "transactions.inputs.0": {"$exists": False},
-                            },
-                        ],
-                    }
+                    "transactions.outputs.to": address,
+                    "transactions.outputs.value": {"$gt": 0},
+                    "$or": [
+                        {
+                            "transactions": {
+                                "$elemMatch": {"public_key": {"$ne": public_key}}
+                            }
+                        },
+                        {
+                            "public_key": public_key,
+                            "transactions.inputs.0": {"$exists": False},
+                        },
+                    ],
                 },
-                {"$unwind": "$transactions"},
                 {
-                    "$match": {
-                        "transactions.outputs.to": address,
-                        "transactions.outputs.value": {"$gt": 0},
-                        "$or": [
-                            {"transactions.public_key": {"$ne": public_key}},
-                            {
-                                "public_key": public_key,
-                                "transactions.inputs.0": {"$exists": False},
-                            },
-                        ],
-                    }
+                    "transactions.outputs.to": address,
+                    "transactions.outputs.value": {"$gt": 0},
+                    "$or": [
+                        {"transactions.public_key": {"$ne": public_key}},
+                        {
+                            "public_key": public_key,
+                            "transactions.inputs.0": {"$exists": False},
+                        },
+                    ],
                 },
-                {"$sort": {"transactions.time": -1}},
-                {"$skip": page * 10},
-                {"$limit": 10},
-            ]
+            )
         )
 
-        return self.render_as_json(
-            {
-                "past_transactions": [x["transactions"] async for x in txns],
-            }
+        return await self.stream_as_json(
+            "past_transactions",
+            page.transactions(txns),
+            tail=lambda: {"next_cursor": page.next_cursor},
         )
 
 
 class TransactionConfirmationsHandler(BaseHandler):
+    """Confirmations of one or many transaction ids. With wait=<seconds> the
+    request is held until every id has min_confirmations, or until the next
+    block when min_confirmations is not given"""
+
+    max_wait = 120
+
     async def get(self):
         txn_id = self.get_query_argument("id").replace(" ", "+")
-        result = await self.config.mongo.async_db.blocks.find_one(
-            {"transactions.id": txn_id}, {"_id": 0}, sort=[("transactions.time", -1)]
-        )
-        return self.render_as_json(
-            {
-                "confirmations": (
-                    self.config.LatestBlock.block.index - result["index"]
-                    if result
-                    else 0
-                )
-            }
+        results = await self.wait_confirmations(
+            [txn_id],
+            float(self.get_query_argument("wait", 0)),
+            self.get_query_argument("min_confirmations", None),
         )
+        return self.render_as_json({"confirmations": results[0]["confirmations"]})
 
     async def post(self):
         data = json.loads(self.request.body)
-        results = []
-        for txn_id in data["txn_ids"]:
-            result = await self.config.mongo.async_db.blocks.find_one(
-                {"transactions.id": txn_id},
-                {"_id": 0},
-                sort=[("transactions.time", -1)],
-            )
-            results.append(
-                {
-                    "txn_id": txn_id,
-                    "confirmations": (
-                        self.config.LatestBlock.block.index - result["index"]
-                        if result
-                        else 0
-                    ),
-                }
-            )
+        results = await self.wait_confirmations(
+            data["txn_ids"], float(data.get("wait", 0)), data.get("min_confirmations")
+        )
         return self.render_as_json({"confirmations": results})
 
+    async def get_confirmations(self, txn_ids):
+        heights = await self.config.BU.get_transaction_heights(txn_ids)
+        latest_index = self.config.LatestBlock.block.index
+        return [
+            {
+                "txn_id": txn_id,
+                "confirmations": (
+                    latest_index - heights[txn_id] if heights[txn_id] is not None else 0
+                ),
+                "found": heights[txn_id] is not None,
+            }
+            for txn_id in txn_ids
+        ]
+
+    async def wait_confirmations(self, txn_ids, wait, min_confirmations):
+        deadline = time.time() + min(wait, self.max_wait)
+        tip = self.config.LatestBlock.block.hash
+        while True:
+            results = await self.get_confirmations(txn_ids)
+            if min_confirmations is None:
+                done = self.config.LatestBlock.block.hash != tip
+            else:
+                done = all(
+                    x["found"] and x["confirmations"] >= int(min_confirmations)
+                    for x in results
+                )
+            timeout = deadline - time.time()
+            if done or timeout <= 0:
+                break
+            await self.config.LatestBlock.wait_for_block(timeout)
+        for x in results:
+            del x["found"]
+        return results
+
 
 class PaymentHandler(BaseHandler):
     async def get(self):
@@ -486,30 +503,28 @@ class PaymentHandler(BaseHandler):
             )
         except:
             return self.redirect("/logout")
-        query = [
-            {
-                "$match": {
-                    "$and": [
-                        {"transactions.outputs.to": to_address},
-                        {"transactions.outputs.to": from_address or to_address},
-                    ]
-                }
-            },
-            {"$unwind": "$transactions"},
-            {
-                "$match": {
-                    "$and": [
-                        {"transactions.outputs.to": to_address},
-                        {"transactions.outputs.to": from_address or to_address},
-                    ]
-                }
-            },
-            {"$project": {"_id": 0, "txn": "$transactions"}},
-        ]
+        try:
+            page = KeysetPage.from_handler(self)
+        except ValueError as e:
+            self.set_status(400)
+            return self.render_as_json({"status": False, "message": str(e)})
+        match = {
+            "$and": [
+                {"transactions.outputs.to": to_address},
+                {"transactions.outputs.to": from_address or to_address},
+            ]
+        }
+        txn_match = match
         if newer_than:
-            query.append({"$match": {"txn.time": {"$gt": int(newer_than)}}})
-        query.append({"$sort": {"txn.time": -1}})
-        result = self.config.mongo.async_db.blocks.aggregate(query)
+            txn_match = {
+                "$and": [
+                    *match["$and"],
+                    {"transactions.time": {"$gt": int(newer_than)}},
+                ]
+            }
+        result = self.config.mongo.async_db.blocks.aggregate(
+            page.transactions_pipeline(match, txn_match)
+        )
         pending_query = [
             {
                 "$match": {
@@ -536,21 +551,30 @@ class PaymentHandler(BaseHandler):
             pending_query.append({"$match": {"time": {"$gt": int(newer_than)}}})
         pending_query.append({"$sort": {"time": -1}})
         pending = self.config.mongo.async_db.miner_transactions.aggregate(pending_query)
-        mempool = [
-            x
-            async for x in pending
-            if to_address
-            != str(P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(x["public_key"])))
-        ]
-        blockchain = [
-            x["txn"]
-            async for x in result
-            if to_address
-            != str(
-                P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(x["txn"]["public_key"]))
-            )
-        ]
-        return self.render_as_json({"payments": blockchain + mempool})
+        # the mempool is small and only sent along with the first page
+        mempool = (
+            []
+            if page.cursor
+            else [
+                x
+                async for x in pending
+                if to_address
+                != str(P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(x["public_key"])))
+            ]
+        )
+
+        async def payments():
+            async for txn in page.transactions(result):
+                if to_address != str(
+                    P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(txn["public_key"]))
+                ):
+                    yield txn
+            for txn in mempool:
+                yield txn
+
+        return await self.stream_as_json(
+            "payments", payments(), tail=lambda: {"next_cursor": page.next_cursor}
+        )
 
 
 class ValidateAddressHandler(BaseHandler):
@@ -211,7 +211,7 @@ class TwoFactorAuthHandler(BaseHandler):
         )
         self.set_header("Access-Control-Max-Age", 600)
 
-        shared_secrets = self.config.GU.get_shared_secrets_by_rid(
+        shared_secrets = await self.config.GU.get_shared_secrets_by_rid(
             self.get_secure_cookie("rid").decode()
         )
         authenticated = False
@@ -33,9 +33,38 @@ REQUEST_ONLY = [
 
 
 class BaseRPC:
+    rpc_role = None
+
     def __init__(self):
         self.config = Config()
 
+    def rpc_method_metrics(self, method, stream):
+        rpc_metrics = getattr(self.config, "rpc_metrics", None)
+        if not rpc_metrics:
+            return None
+        peer_type = stream.peer.__class__.__name__ if hasattr(stream, "peer") else None
+        return rpc_metrics.get(
+            self.rpc_role,
+            method if hasattr(self, method or "") else "unknown",
+            peer_type or "unknown",
+        )
+
+    async def dispatch(self, method, body, stream, size):
+        """Calls the handler for method and records its traffic and latency"""
+        method_metrics = self.rpc_method_metrics(method, stream)
+        if not method_metrics:
+            return await getattr(self, method)(body, stream)
+        method_metrics.messages_in += 1
+        method_metrics.bytes_in += size
+        start = time.time()
+        try:
+            await getattr(self, method)(body, stream)
+        except Exception:
+            method_metrics.errors += 1
+            raise
+        finally:
+            method_metrics.latency.observe(time.time() - start)
+
     async def write_result(self, stream, method, data, req_id):
         await self.write_as_json(stream, method, data, "result", req_id)
 
@@ -62,7 +91,12 @@ class BaseRPC:
                 del stream.message_queue[method][queue_key]
             stream.message_queue[method][rpc_data["id"]] = rpc_data
         try:
-            await stream.write("{}\n".format(json.dumps(rpc_data)).encode())
+            message = "{}\n".format(json.dumps(rpc_data)).encode()
+            method_metrics = self.rpc_method_metrics(method, stream)
+            if method_metrics:
+                method_metrics.messages_out += 1
+                method_metrics.bytes_out += len(message)
+            await stream.write(message)
         except StreamClosedError:
             if hasattr(stream, "peer"):
                 self.config.app_log.warning(
@@ -142,6 +176,7 @@ class BaseRPC:
 
 
 class RPCSocketServer(TCPServer, BaseRPC):
+    rpc_role = "server"
     inbound_streams = {}
     inbound_pending = {}
     config = None
@@ -208,7 +243,7 @@ class RPCSocketServer(TCPServer, BaseRPC):
                 if not hasattr(stream, "peer") and method not in ["login", "connect"]:
                     await self.remove_peer(stream)
                     break
-                await getattr(self, method)(body, stream)
+                await self.dispatch(method, body, stream, len(data))
             except StreamClosedError:
                 if hasattr(stream, "peer"):
                     self.config.app_log.warning(
@@ -271,6 +306,7 @@ class DummyStream:
 
 
 class RPCSocketClient(TCPClient):
+    rpc_role = "client"
     outbound_streams = {}
     outbound_pending = {}
     outbound_ignore = {}
@@ -407,7 +443,8 @@ class RPCSocketClient(TCPClient):
     async def wait_for_data(self, stream):
         while True:
             try:
-                body = json.loads(await stream.read_until(b"\n"))
+                data = await stream.read_until(b"\n")
+                body = json.loads(data)
                 if "result" in body:
                     if body["method"] in REQUEST_RESPONSE_MAP:
                         if body["id"] in stream.message_queue.get(
@@ -428,7 +465,7 @@ class RPCSocketClient(TCPClient):
                     stream.close()
                 self.config.health.tcp_client.last_activity = time.time()
                 stream.last_activity = int(time.time())
-                await getattr(self, body.get("method"))(body, stream)
+                await self.dispatch(body.get("method"), body, stream, len(data))
             except StreamClosedError:
                 await self.remove_peer(stream)
                 break
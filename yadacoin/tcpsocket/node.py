@@ -248,6 +248,8 @@ class NodeRPC(BaseRPC):
             for stream in streams:
                 yield stream
 
+        params = {"transaction": txn.to_dict()}
+
         async for peer_stream in self.config.peer.get_inbound_streams():
             if peer_stream.peer.rid == stream.peer.rid:
                 self.config.app_log.debug(
@@ -266,7 +268,7 @@ class NodeRPC(BaseRPC):
             if peer_stream.peer.protocol_version > 1:
                 self.retry_messages[
                     (peer_stream.peer.rid, "newtxn", txn.transaction_signature)
-                ] = {"transaction": txn.to_dict()}
+                ] = params
 
         async for peer_stream in make_gen(
             await self.config.peer.get_outbound_streams()
@@ -288,7 +290,7 @@ class NodeRPC(BaseRPC):
             if peer_stream.peer.protocol_version > 1:
                 self.config.nodeClient.retry_messages[
                     (peer_stream.peer.rid, "newtxn", txn.transaction_signature)
-                ] = {"transaction": txn.to_dict()}
+                ] = params
 
     async def newtxn_confirmed(self, body, stream):
         result = body.get("result", {})
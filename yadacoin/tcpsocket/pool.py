@@ -1,3 +1,5 @@
+import asyncio
+import functools
 import json
 import time
 import traceback
@@ -6,6 +8,7 @@ import uuid
 from tornado.iostream import StreamClosedError
 
 from yadacoin.core.config import Config
+from yadacoin.core.metrics import Histogram
 from yadacoin.core.miner import Miner
 from yadacoin.core.peer import Peer
 from yadacoin.core.processingqueue import NonceProcessingQueueItem
@@ -13,9 +16,25 @@ from yadacoin.core.transactionutils import TU
 from yadacoin.tcpsocket.base import RPCSocketServer
 
 
+def answered_by_node(rpc):
+    """Inside a stratum worker the rpc is sent to the node, which has the chain,
+    the wallet and mongo, and its result is returned"""
+
+    @functools.wraps(rpc)
+    async def wrapper(self, body, stream):
+        client = getattr(StratumServer.config, "stratum_worker_client", None)
+        if client:
+            return await client.request(rpc.__name__, body)
+        return await rpc(self, body, stream)
+
+    return wrapper
+
+
 class StratumServer(RPCSocketServer):
     current_header = ""
     config = None
+    # seconds spent sending a new job to every miner
+    job_broadcasts = Histogram()
 
     def __init__(self):
         super(StratumServer, self).__init__()
@@ -23,34 +42,46 @@ class StratumServer(RPCSocketServer):
 
     @classmethod
     async def block_checker(cls):
+        """Sends a new job to every miner once per header, returns True if it did"""
         if not cls.config:
             cls.config = Config()
 
         if time.time() - cls.config.mp.block_factory.time > 600:
             await cls.config.mp.refresh()
 
-        if cls.current_header != cls.config.mp.block_factory.header:
-            try:
-                await cls.send_jobs()
-            except:
-                cls.config.app_log.warning(traceback.format_exc())
+        header = cls.config.mp.block_factory.header
+        if cls.current_header == header:
+            return False
+        # set before the broadcast so concurrent checks do not send it again
+        cls.current_header = header
+        start = time.time()
+        try:
+            await cls.send_jobs()
+        except:
+            cls.config.app_log.warning(traceback.format_exc())
+        cls.job_broadcasts.observe(time.time() - start)
+        return True
 
     @classmethod
     async def send_jobs(cls):
         if not cls.config:
             cls.config = Config()
-        for miner in list(StratumServer.inbound_streams[Miner.__name__].values()):
-            for stream in miner.values():
-                try:
-                    await cls.send_job(stream)
-                except:
-                    cls.config.app_log.warning(traceback.format_exc())
+        streams = [
+            stream
+            for miner in list(StratumServer.inbound_streams[Miner.__name__].values())
+            for stream in list(miner.values())
+        ]
+        results = await asyncio.gather(
+            *[cls.send_job(stream) for stream in streams], return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                cls.config.app_log.warning(f"send_jobs: {result!r}")
 
     @classmethod
     async def send_job(cls, stream):
         job = await cls.config.mp.block_template(stream.peer.agent, stream.peer.peer_id)
         stream.jobs[job.id] = job
-        cls.current_header = cls.config.mp.block_factory.header
         params = {
             "blob": job.blob,
             "job_id": job.job_id,
@@ -74,6 +105,10 @@ class StratumServer(RPCSocketServer):
     async def update_miner_count(cls):
         if not cls.config:
             cls.config = Config()
+        if getattr(cls.config, "stratum_worker_client", None):
+            # running inside a stratum worker, the node keeps the pool stats
+            await cls.config.stratum_worker_client.send_miner_count()
+            return
         await cls.config.mongo.async_db.pool_stats.update_one(
             {"stat": "worker_count"},
             {
@@ -125,15 +160,18 @@ class StratumServer(RPCSocketServer):
     async def get_info(self, body, stream):
         return await StratumServer.config.mp.block_template(stream.peer.info)
 
+    @answered_by_node
     async def get_balance(self, body, stream):
-        balance = StratumServer.config.BU.get_wallet_balance(
+        balance = await StratumServer.config.BU.get_wallet_balance(
             StratumServer.config.address
         )
         return {"balance": balance, "unlocked_balance": balance}
 
+    @answered_by_node
     async def getheight(self, body, stream):
         return {"height": StratumServer.config.LatestBlock.block.index}
 
+    @answered_by_node
     async def transfer(self, body, stream):
         for x in body.get("params").get("destinations"):
             result = await TU.send(
@@ -145,31 +183,38 @@ class StratumServer(RPCSocketServer):
             result["tx_hash"] = result["hash"]
         return result
 
+    @answered_by_node
     async def get_bulk_payments(self, body, stream):
-        result = []
-        for y in body.get("params").get("payment_ids"):
-            config = Config.generate(prv=y)
-            async for (
-                x
-            ) in StratumServer.config.BU.get_wallet_unspent_transactions_for_spending(
-                config.address, inc_mempool=True
-            ):
-                txn = {"amount": 0}
-                txn["block_height"] = x["height"]
-                for j in x["outputs"]:
-                    if j["to"] == config.address:
-                        txn["amount"] += j["value"]
-                if txn["amount"]:
-                    result.append(txn)
-        return result
+        addresses = [
+            Config.generate(prv=y).address
+            for y in body.get("params").get("payment_ids")
+        ]
+        outputs = await StratumServer.config.BU.get_wallet_unspent_outputs(
+            addresses, inc_mempool=True
+        )
+        payments = {}
+        for x in outputs:
+            payments.setdefault(x["to"], []).append(
+                {"amount": x["value"], "block_height": x["height"]}
+            )
+        return [x for address in addresses for x in payments.get(address, [])]
 
     async def submit(self, body, stream):
         self.config.processing_queues.nonce_queue.add(
             NonceProcessingQueueItem(miner=stream.peer, stream=stream, body=body)
         )
 
+    @classmethod
+    async def accepts_miner(cls):
+        """Whether max_miners allows one more miner, counted on the node
+        across every stratum worker"""
+        client = getattr(cls.config, "stratum_worker_client", None)
+        if client:
+            return await client.request("accepts_miner", {})
+        return len(await Peer.get_miner_streams()) <= cls.config.max_miners
+
     async def login(self, body, stream):
-        if len(await Peer.get_miner_streams()) > self.config.max_miners:
+        if not await StratumServer.accepts_miner():
             await stream.write(
                 "{}\n".format(
                     json.dumps(
@@ -232,6 +277,8 @@ class StratumServer(RPCSocketServer):
 
     @classmethod
     async def status(self):
+        if getattr(StratumServer.config, "stratum_hub", None):
+            return StratumServer.config.stratum_hub.status()
         return {
             "miners": len(
                 list(
@@ -246,4 +293,5 @@ class StratumServer(RPCSocketServer):
                 )
             ),
             "workers": len(await Peer.get_miner_streams()),
+            "job_broadcasts": StratumServer.job_broadcasts.to_dict(),
         }
@@ -0,0 +1,445 @@
+"""
+Stratum worker processes sharing the stratum port with SO_REUSEPORT.
+
+The node keeps the mining pool (templates, Mongo, consensus) and runs a
+StratumWorkerHub on a local port. Every worker process connects to it,
+receives the current template, serves miners on the shared stratum port
+and sends back accepted shares in batches and block candidates right away.
+RPCs that need the chain, the wallet or the miner count of every worker
+are sent to the node as requests and answered by it.
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import time
+from traceback import format_exc
+
+import tornado.ioloop
+import tornado.log
+from tornado.ioloop import PeriodicCallback
+from tornado.iostream import StreamClosedError
+from tornado.netutil import bind_sockets
+from tornado.tcpclient import TCPClient
+from tornado.tcpserver import TCPServer
+
+import yadacoin.core.config
+from yadacoin.core.block import Block
+from yadacoin.core.chain import CHAIN
+from yadacoin.core.config import Config
+from yadacoin.core.health import Health
+from yadacoin.core.job import Job
+from yadacoin.core.miner import Miner
+from yadacoin.core.miningpool import MiningPool
+from yadacoin.core.processingqueue import ProcessingQueues
+from yadacoin.tcpsocket.pool import StratumServer
+
+
+async def write_message(stream, method, params):
+    await stream.write(
+        "{}\n".format(json.dumps({"method": method, "params": params})).encode()
+    )
+
+
+class ShareMiner:
+    """Address of a miner connected to a stratum worker, as seen by the node"""
+
+    def __init__(self, address):
+        self.address = address
+        self.address_only = address.split(".")[0]
+
+
+class StratumWorkerHub(TCPServer):
+    """Node side of the stratum workers"""
+
+    # recent templates, candidates are checked against the one they were found on
+    max_templates = 8
+    # StratumServer rpcs a worker sends to the node, see answered_by_node
+    node_rpcs = ("get_balance", "getheight", "transfer", "get_bulk_payments")
+
+    def __init__(self):
+        super(StratumWorkerHub, self).__init__()
+        self.config = Config()
+        self.streams = {}
+        self.miner_counts = {}
+        self.processes = []
+        self.header = ""
+        self.templates = {}
+
+    def start_workers(self, config_path):
+        context = multiprocessing.get_context("spawn")
+        for worker_id in range(self.config.stratum_workers):
+            process = context.Process(
+                target=run_stratum_worker,
+                args=(worker_id, config_path, self.config.network),
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+        PeriodicCallback(self.template_checker, 1000).start()
+
+    async def handle_stream(self, stream, address):
+        worker_id = None
+        while True:
+            try:
+                data = await stream.read_until(b"\n")
+                body = json.loads(data)
+                method = body.get("method")
+                params = body.get("params", {})
+                if method == "connect":
+                    worker_id = params["worker_id"]
+                    self.streams[worker_id] = stream
+                    await write_message(stream, "template", self.get_template())
+                elif method in ("shares", "candidate", "miner_count"):
+                    await getattr(self, method)(params, worker_id)
+                elif method == "request":
+                    # answered on its own so a slow transfer does not hold shares
+                    asyncio.ensure_future(self.request(params, worker_id, stream))
+            except StreamClosedError:
+                break
+            except:
+                self.config.app_log.warning(format_exc())
+        self.config.app_log.warning(f"Stratum worker {worker_id} disconnected")
+        self.streams.pop(worker_id, None)
+        self.miner_counts.pop(worker_id, None)
+        await self.update_miner_count()
+
+    def get_template(self):
+        block_factory = self.config.mp.block_factory
+        self.header = block_factory.header
+        self.templates[block_factory.header] = (
+            block_factory,
+            self.config.mp.last_block_time,
+        )
+        while len(self.templates) > self.max_templates:
+            del self.templates[next(iter(self.templates))]
+        return {
+            "version": block_factory.version,
+            "time": int(block_factory.time),
+            "index": block_factory.index,
+            "target": int(block_factory.target),
+            "special_min": block_factory.special_min,
+            "special_target": int(block_factory.special_target),
+            "header": block_factory.header,
+            "last_block_time": self.config.mp.last_block_time,
+        }
+
+    async def template_checker(self):
+        mp = self.config.mp
+        try:
+            if mp.block_factory is None or time.time() - mp.block_factory.time > 600:
+                await mp.refresh()
+            if mp.block_factory is None or mp.block_factory.header == self.header:
+                return
+            template = self.get_template()
+            for stream in list(self.streams.values()):
+                try:
+                    await write_message(stream, "template", template)
+                except StreamClosedError:
+                    pass
+        except:
+            self.config.app_log.warning(format_exc())
+
+    async def shares(self, params, worker_id):
+        for share in params["shares"]:
+            await self.config.mp.record_share(
+                ShareMiner(share["address"]),
+                share["index"],
+                share["hash"],
+                share["nonce"],
+                share["weight"],
+                share_time=share["time"],
+            )
+
+    async def candidate(self, params, worker_id):
+        # verified, signed and accepted on the node, exactly as an in process submit,
+        # against the template the worker found it on
+        template = self.templates.get(params["header"])
+        if template is None:
+            self.config.app_log.warning(
+                f"Block candidate from stratum worker {worker_id} on an unknown template"
+            )
+            return
+        block_factory, last_block_time = template
+        result = await self.config.mp.process_nonce(
+            ShareMiner(params["address"]),
+            params["nonce"],
+            await Job.from_dict(params["job"]),
+            block_factory=block_factory,
+            last_block_time=last_block_time,
+        )
+        self.config.app_log.info(
+            f"Block candidate from stratum worker {worker_id}: {result}"
+        )
+
+    async def request(self, params, worker_id, stream):
+        response = {"id": params["id"]}
+        try:
+            if params["method"] == "accepts_miner":
+                response["result"] = self.accepts_miner(worker_id)
+            elif params["method"] in StratumWorkerHub.node_rpcs:
+                result = await getattr(self.config.pool_server, params["method"])(
+                    params["body"], None
+                )
+                # a result that is not json is answered as an error
+                response["result"] = json.loads(json.dumps(result))
+            else:
+                raise Exception(f"Unknown request {params['method']}")
+        except Exception as e:
+            self.config.app_log.warning(format_exc())
+            response["error"] = str(e)
+        try:
+            await write_message(stream, "response", response)
+        except StreamClosedError:
+            pass
+
+    def accepts_miner(self, worker_id):
+        if self.status()["workers"] > self.config.max_miners:
+            return False
+        # counted until the worker reports its miners again
+        count = self.miner_counts.setdefault(worker_id, {"miners": 0, "workers": 0})
+        count["workers"] += 1
+        return True
+
+    async def miner_count(self, params, worker_id):
+        self.miner_counts[worker_id] = params
+        await self.update_miner_count()
+
+    async def update_miner_count(self):
+        status = self.status()
+        await self.config.mongo.async_db.pool_stats.update_one(
+            {"stat": "worker_count"},
+            {"$set": {"value": status["miners"]}},
+            upsert=True,
+        )
+        await self.config.mongo.async_db.pool_stats.update_one(
+            {"stat": "miner_count"},
+            {"$set": {"value": status["workers"]}},
+            upsert=True,
+        )
+
+    def status(self):
+        return {
+            "miners": sum(x["miners"] for x in self.miner_counts.values()),
+            "workers": sum(x["workers"] for x in self.miner_counts.values()),
+            "stratum_workers": len(self.streams),
+        }
+
+
+class StratumWorkerPool(MiningPool):
+    """Mining pool of a stratum worker, shares are checked here against the
+    template sent by the node, storing them and accepting blocks is left to the node"""
+
+    @classmethod
+    async def init_async(cls, client):
+        self = cls()
+        self.config = Config()
+        self.app_log = logging.getLogger("tornado.application")
+        self.client = client
+        self.max_target = CHAIN.MAX_TARGET
+        self.inbound = {}
+        self.connected_ips = {}
+        self.last_block_time = 0
+        self.block_factory = None
+        self.blob_header = ""
+        self.blob_parts = []
+        self.pending_shares = []
+        return self
+
+    async def set_template(self, template):
+        self.last_block_time = template["last_block_time"]
+        self.block_factory = await Block.init_async(
+            version=template["version"],
+            block_time=template["time"],
+            block_index=template["index"],
+            special_min=template["special_min"],
+            header=template["header"],
+            target=template["target"],
+            special_target=template["special_target"],
+        )
+
+    async def refresh(self):
+        """Templates come from the node"""
+        pass
+
+    async def process_nonce(self, miner, nonce, job):
+        block_factory = self.block_factory
+        full_nonce = nonce + job.extra_nonce
+        hash1 = block_factory.generate_hash_from_header(
+            job.index, block_factory.header, full_nonce
+        )
+        test_hash = self.get_test_hash(block_factory.index, hash1)
+
+        is_candidate = (
+            test_hash < int(block_factory.target) or self.config.network == "regnet"
+        )
+        if block_factory.special_min and not is_candidate:
+            special_target = CHAIN.special_target(
+                block_factory.index,
+                block_factory.target,
+                int(block_factory.time) - int(self.last_block_time),
+                self.config.network,
+            )
+            is_candidate = special_target > min(test_hash, int(hash1, 16))
+
+        if is_candidate:
+            # the node stores the share along with the block
+            job_data = job.to_dict()
+            job_data.update(peer_id=job.id, miner_diff=job.miner_diff, extra_nonce="")
+            await self.client.send(
+                "candidate",
+                {
+                    "address": miner.address,
+                    "nonce": full_nonce,
+                    "job": job_data,
+                    "header": block_factory.header,
+                },
+            )
+        elif test_hash < self.get_pool_target():
+            self.pending_shares.append(
+                {
+                    "address": miner.address,
+                    "index": block_factory.index,
+                    "hash": hash1,
+                    "nonce": full_nonce,
+                    "weight": job.miner_diff,
+                    "time": int(time.time()),
+                }
+            )
+        else:
+            return False
+
+        return {
+            "hash": hash1,
+            "nonce": full_nonce,
+            "height": block_factory.index,
+            "id": "",
+        }
+
+    async def flush_shares(self):
+        if not self.pending_shares:
+            return
+        shares, self.pending_shares = self.pending_shares, []
+        await self.client.send("shares", {"shares": shares})
+
+
+class StratumWorkerClient:
+    """Worker side of the connection to the node"""
+
+    # seconds to wait for the node to answer a request
+    request_timeout = 30
+
+    def __init__(self, worker_id):
+        self.config = Config()
+        self.worker_id = worker_id
+        self.stream = None
+        self.busy = False
+        self.requests = {}
+        self.request_id = 0
+
+    async def connect(self):
+        self.stream = await TCPClient().connect(
+            "127.0.0.1", self.config.stratum_ipc_port
+        )
+        await self.send("connect", {"worker_id": self.worker_id})
+        # the stratum port is not opened before the first template
+        await self.read_message()
+
+    async def send(self, method, params):
+        await write_message(self.stream, method, params)
+
+    async def request(self, method, body):
+        """Sends an rpc to the node and returns its result"""
+        self.request_id += 1
+        request_id = self.request_id
+        future = asyncio.get_running_loop().create_future()
+        self.requests[request_id] = future
+        try:
+            await self.send(
+                "request", {"id": request_id, "method": method, "body": body}
+            )
+            return await asyncio.wait_for(future, self.request_timeout)
+        finally:
+            self.requests.pop(request_id, None)
+
+    async def read_message(self):
+        data = await self.stream.read_until(b"\n")
+        body = json.loads(data)
+        if body.get("method") == "template":
+            await self.config.mp.set_template(body["params"])
+            await StratumServer.block_checker()
+        elif body.get("method") == "response":
+            response = body["params"]
+            future = self.requests.get(response["id"])
+            if future is None or future.done():
+                return
+            if "error" in response:
+                future.set_exception(Exception(response["error"]))
+            else:
+                future.set_result(response.get("result"))
+
+    async def read_loop(self):
+        while True:
+            try:
+                await self.read_message()
+            except StreamClosedError:
+                self.config.app_log.error(
+                    f"Stratum worker {self.worker_id} lost the node, exiting"
+                )
+                tornado.ioloop.IOLoop.current().stop()
+                return
+            except:
+                self.config.app_log.warning(format_exc())
+
+    async def send_miner_count(self):
+        status = await StratumServer.status()
+        await self.send("miner_count", status)
+
+    async def background_nonce_processor(self):
+        if self.busy:
+            return
+        self.busy = True
+        try:
+            if self.config.processing_queues.nonce_queue.queue:
+                await self.config.mp.process_nonce_queue()
+            await self.config.mp.flush_shares()
+        except:
+            self.config.app_log.error(format_exc())
+        self.busy = False
+
+
+def run_stratum_worker(worker_id, config_path, network):
+    """Entry point of a stratum worker process"""
+    with open(config_path) as f:
+        config = Config(json.loads(f.read()))
+    yadacoin.core.config.CONFIG = config
+    config.network = network
+    config.app_log = logging.getLogger("tornado.application")
+    tornado.log.enable_pretty_logging(logger=config.app_log)
+    config.health = Health()
+    config.processing_queues = ProcessingQueues()
+
+    StratumServer.inbound_streams[Miner.__name__] = {}
+    StratumServer.config = config
+    # Peer.get_miner_streams looks the miners up on the node server
+    config.nodeServer = StratumServer
+    client = StratumWorkerClient(worker_id)
+    config.stratum_worker_client = client
+
+    ioloop = tornado.ioloop.IOLoop.current()
+    config.mp = ioloop.run_sync(lambda: StratumWorkerPool.init_async(client))
+    ioloop.run_sync(client.connect)
+
+    config.pool_server = StratumServer()
+    config.pool_server.add_sockets(
+        bind_sockets(config.stratum_pool_port, reuse_port=True)
+    )
+    config.app_log.info(
+        f"Stratum worker {worker_id} listening on {config.stratum_pool_port}"
+    )
+    ioloop.spawn_callback(client.read_loop)
+    PeriodicCallback(
+        client.background_nonce_processor, config.nonce_processor_wait * 1000
+    ).start()
+    ioloop.start()